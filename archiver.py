@@ -0,0 +1,220 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from config import (
+    CAPTURE_DIR, CAPTURE_EVERY_N, CAPTURE_PRE_FRAMES, CAPTURE_POST_FRAMES,
+    CAPTURE_QUEUE_SIZE, CAPTURE_QUOTA_MB, CAPTURE_JPEG_QUALITY
+)
+from logger_setup import log_saved
+
+_STOP = object()
+
+
+class CaptureArchiver:
+    """
+    Saves frames to CAPTURE_DIR as JPEG on a background worker.
+
+    Triggers:
+        - every CAPTURE_EVERY_N-th frame (0 = off)
+        - reasons passed by the caller with the frame ("new_label", "error", ...)
+        - trigger(reason): applies to the next offered frame
+    Each trigger also saves the CAPTURE_PRE_FRAMES frames before it (pre-event
+    ring) and the CAPTURE_POST_FRAMES frames after it.
+
+    The frame loop never blocks: a frame needed for archiving is copied once
+    into a preallocated pool slot (source buffers are recycled by the camera
+    ring), and that slot is handed to the worker by reference. When the pool
+    is exhausted the frame is skipped and counted as dropped.
+
+    Saved files are kept under CAPTURE_QUOTA_MB, evicting the oldest first.
+    `on_saved(frame_id, path)` / `on_evicted(frame_id, path)` let the caller
+    link files to frame_event rows; they are only called for frames offered
+    with their own frame_id (frames that were inferred and persisted).
+    """
+
+    def __init__(self, capture_dir: str = CAPTURE_DIR, on_saved=None, on_evicted=None,
+                 every_n: int = CAPTURE_EVERY_N, pre_frames: int = CAPTURE_PRE_FRAMES,
+                 post_frames: int = CAPTURE_POST_FRAMES, quota_mb: float = CAPTURE_QUOTA_MB):
+        self.capture_dir = capture_dir
+        self.on_saved = on_saved
+        self.on_evicted = on_evicted
+        self.every_n = every_n
+        self.pre_frames = pre_frames
+        self.post_frames = post_frames
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+
+        self._slots = None                         # allocated on the first frame
+        self._free = deque()
+        self._pre = deque()                        # (slot, meta) oldest first
+        self._pending_reason = None
+        self._post_remaining = 0
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+
+        self.saved = 0
+        self.dropped = 0
+        self.evicted = 0
+        self.errors = 0
+
+        os.makedirs(self.capture_dir, exist_ok=True)
+        self._files = deque()                      # (path, size, frame_id) oldest first
+        self._total_bytes = 0
+        self._scan_existing()
+
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    # ---------------- frame loop side ----------------
+
+    def _allocate(self, frame):
+        count = self.pre_frames + self.post_frames + CAPTURE_QUEUE_SIZE
+        self._slots = [np.empty_like(frame) for _ in range(max(1, count))]
+        self._free.extend(range(len(self._slots)))
+
+    def _take_slot(self, frame):
+        if not self._free:
+            self.dropped += 1
+            return None
+        slot = self._free.popleft()
+        np.copyto(self._slots[slot], frame)
+        return slot
+
+    def trigger(self, reason: str):
+        """Archive the next offered frame (plus its pre/post frames)."""
+        with self._lock:
+            self._pending_reason = reason
+
+    def offer(self, frame_number: int, frame, frame_id=None, reasons=()):
+        """
+        Called for every processed frame; decides whether it must be kept.
+        `frame_id` is this frame's frame_event row, None if it has none.
+        """
+        with self._lock:
+            if self._slots is None:
+                self._allocate(frame)
+
+            reasons = list(reasons)
+            if self._pending_reason:
+                reasons.append(self._pending_reason)
+                self._pending_reason = None
+            if self.every_n and frame_number % self.every_n == 0:
+                reasons.append("every_n")
+
+            meta = (frame_number, frame_id, time.time())
+            if reasons:
+                # Flush the pre-event ring, then the triggering frame itself
+                while self._pre:
+                    slot, pre_meta = self._pre.popleft()
+                    self._jobs.put((slot, pre_meta, "pre"))
+                slot = self._take_slot(frame)
+                if slot is not None:
+                    self._jobs.put((slot, meta, "+".join(reasons)))
+                self._post_remaining = self.post_frames
+            elif self._post_remaining > 0:
+                self._post_remaining -= 1
+                slot = self._take_slot(frame)
+                if slot is not None:
+                    self._jobs.put((slot, meta, "post"))
+            elif self.pre_frames > 0:
+                # Keep a rolling window of recent frames; recycle the oldest slot
+                if len(self._pre) >= self.pre_frames:
+                    old_slot, _ = self._pre.popleft()
+                    self._free.append(old_slot)
+                slot = self._take_slot(frame)
+                if slot is not None:
+                    self._pre.append((slot, meta))
+
+    def close(self, timeout: float = 10.0):
+        self._jobs.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "errors": self.errors,
+            "queued": self._jobs.qsize(),
+            "disk_mb": round(self._total_bytes / (1024 * 1024), 1),
+        }
+
+    # ---------------- worker side ----------------
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            slot, (frame_number, frame_id, ts), reason = job
+            try:
+                path = self._write(self._slots[slot], frame_number, frame_id, ts, reason)
+            except Exception:
+                # Disk full, encoder missing, ...: archiving must never stop the loop
+                self.errors += 1
+                path = None
+            finally:
+                with self._lock:
+                    self._free.append(slot)
+
+            if path is None:
+                continue
+            self.saved += 1
+            log_saved(path)
+            if self.on_saved is not None and frame_id is not None:
+                self.on_saved(frame_id, path)
+            self._enforce_quota()
+
+    def _write(self, frame, frame_number: int, frame_id, ts: float, reason: str) -> str:
+        from PIL import Image
+
+        stamp = datetime.fromtimestamp(ts)
+        day_dir = os.path.join(self.capture_dir, stamp.strftime("%Y%m%d"))
+        os.makedirs(day_dir, exist_ok=True)
+        name = f"{stamp.strftime('%H%M%S_%f')}_{frame_id if frame_id is not None else 'x'}_{frame_number}_{reason}.jpg"
+        path = os.path.join(day_dir, name)
+
+        # Frames are BGR-ordered (Picamera2 "RGB888"); JPEG wants RGB
+        Image.fromarray(frame[..., ::-1]).save(path, quality=CAPTURE_JPEG_QUALITY)
+        size = os.path.getsize(path)
+        self._files.append((path, size, frame_id))
+        self._total_bytes += size
+        return path
+
+    def _enforce_quota(self):
+        while self._total_bytes > self.quota_bytes and len(self._files) > 1:
+            path, size, frame_id = self._files.popleft()
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.evicted += 1
+            if self.on_evicted is not None and frame_id is not None:
+                self.on_evicted(frame_id, path)
+
+    def _scan_existing(self):
+        """Account for captures from earlier runs so the quota covers them too."""
+        found = []
+        for root, _, files in os.walk(self.capture_dir):
+            for name in files:
+                if not name.endswith(".jpg"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                # File names carry the frame_event id: <time>_<frame_id>_<frame_number>_<reason>.jpg
+                parts = name.split("_")
+                frame_id = int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+                found.append((st.st_mtime, path, st.st_size, frame_id))
+
+        for _, path, size, frame_id in sorted(found):
+            self._files.append((path, size, frame_id))
+            self._total_bytes += size
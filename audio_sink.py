@@ -0,0 +1,249 @@
+"""
+Where synthesized speech goes. Every utterance is
+
+    sink.start(rate, channels, sampwidth)  ->  sink.write(pcm) ...  ->  sink.finish()
+
+with raw little-endian PCM written as it arrives, so playback begins with the
+first chunk. stop() may be called from any thread; the next write() returns
+False and finish() discards what is still buffered.
+
+- AlsaSink:  in-process playback through pyalsaaudio (optional dependency)
+- AplaySink: one `aplay -t raw` pipe per utterance (fallback, logged as a warning)
+- NullSink:  discards the audio, optionally taking as long as playing it would
+- FileSink:  one WAV file per utterance in a directory (headless checks)
+"""
+import os
+import subprocess
+import threading
+import time
+import wave
+
+from config import AUDIO_SINK, AUDIO_DEVICE
+from logger_setup import log_audio_sink
+
+
+class AudioSink:
+    name = "none"
+
+    def __init__(self):
+        self.rate = 0
+        self.channels = 1
+        self.sampwidth = 2
+        self._stopped = threading.Event()
+
+    def start(self, rate: int, channels: int = 1, sampwidth: int = 2):
+        self.rate, self.channels, self.sampwidth = rate, channels, sampwidth
+        self._stopped.clear()
+
+    def write(self, pcm: bytes) -> bool:
+        """Queue `pcm` for playback; False once stop() was called."""
+        return not self._stopped.is_set()
+
+    def finish(self):
+        """Block until everything written has played (or was discarded by stop())."""
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def frame_bytes(self) -> int:
+        return self.channels * self.sampwidth
+
+    def seconds(self, nbytes: int) -> float:
+        return nbytes / float(self.rate * self.frame_bytes()) if self.rate else 0.0
+
+
+class AlsaSink(AudioSink):
+    name = "alsa"
+    PERIOD_FRAMES = 512  # ~23 ms at 22.05 kHz: how quickly stop() takes effect
+
+    def __init__(self, device: str = AUDIO_DEVICE):
+        import alsaaudio
+
+        super().__init__()
+        self._alsa = alsaaudio
+        self.device = device
+        self.pcm = None
+        self._format = None
+
+    def start(self, rate: int, channels: int = 1, sampwidth: int = 2):
+        if sampwidth != 2:
+            raise ValueError(f"Unsupported sample width: {sampwidth}")
+        # Keep the device open between utterances of the same format
+        if self.pcm is None or self._format != (rate, channels):
+            self.close()
+            self.pcm = self._alsa.PCM(
+                type=self._alsa.PCM_PLAYBACK, mode=self._alsa.PCM_NORMAL, device=self.device,
+                rate=rate, channels=channels, format=self._alsa.PCM_FORMAT_S16_LE,
+                periodsize=self.PERIOD_FRAMES,
+            )
+            self._format = (rate, channels)
+        super().start(rate, channels, sampwidth)
+
+    def write(self, pcm: bytes) -> bool:
+        period = self.PERIOD_FRAMES * self.frame_bytes()
+        view = memoryview(pcm)
+        for i in range(0, len(view), period):
+            if self.stopped:
+                return False
+            self.pcm.write(view[i:i + period])
+        return not self.stopped
+
+    def finish(self):
+        if self.pcm is None:
+            return
+        if self.stopped:
+            self.pcm.drop()
+        else:
+            self.pcm.drain()
+
+    def close(self):
+        if self.pcm is not None:
+            self.pcm.close()
+        self.pcm = None
+
+
+class AplaySink(AudioSink):
+    name = "aplay"
+
+    def __init__(self, device: str = AUDIO_DEVICE):
+        super().__init__()
+        self.device = device
+        self.proc = None
+        self._lock = threading.Lock()
+
+    def start(self, rate: int, channels: int = 1, sampwidth: int = 2):
+        super().start(rate, channels, sampwidth)
+        proc = subprocess.Popen(
+            ["aplay", "-q", "-D", self.device, "-t", "raw", "-f", f"S{8 * sampwidth}_LE",
+             "-r", str(rate), "-c", str(channels), "-"],
+            stdin=subprocess.PIPE,
+        )
+        with self._lock:
+            self.proc = proc
+
+    def write(self, pcm: bytes) -> bool:
+        if self.stopped:
+            return False
+        try:
+            self.proc.stdin.write(pcm)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # aplay was terminated by stop()
+            return False
+        return not self.stopped
+
+    def finish(self):
+        with self._lock:
+            proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        proc.wait()
+
+    def stop(self):
+        super().stop()
+        with self._lock:
+            if self.proc is not None and self.proc.poll() is None:
+                self.proc.terminate()
+
+
+class NullSink(AudioSink):
+    """Discards the audio. realtime=True paces writes like a sound card would."""
+
+    name = "null"
+
+    def __init__(self, realtime: bool = False):
+        super().__init__()
+        self.realtime = realtime
+        self.utterances = 0
+        self.bytes_written = 0
+        self._play_until = 0.0
+
+    def start(self, rate: int, channels: int = 1, sampwidth: int = 2):
+        super().start(rate, channels, sampwidth)
+        self.utterances += 1
+        self._play_until = time.monotonic()
+
+    def write(self, pcm: bytes) -> bool:
+        if self.stopped:
+            return False
+        self.bytes_written += len(pcm)
+        if self.realtime:
+            # Block once more than ~one chunk is queued, like a full device buffer
+            now = time.monotonic()
+            self._play_until = max(self._play_until, now) + self.seconds(len(pcm))
+            self._stopped.wait(max(0.0, self._play_until - now - 0.05))
+        return not self.stopped
+
+    def finish(self):
+        if self.realtime and not self.stopped:
+            self._stopped.wait(max(0.0, self._play_until - time.monotonic()))
+
+
+class FileSink(AudioSink):
+    """Writes utterance N to `<directory>/utt_<N>.wav`."""
+
+    name = "file"
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.utterances = 0
+        self.wav = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, rate: int, channels: int = 1, sampwidth: int = 2):
+        super().start(rate, channels, sampwidth)
+        self.utterances += 1
+        self.wav = wave.open(os.path.join(self.directory, f"utt_{self.utterances:05d}.wav"), "wb")
+        self.wav.setnchannels(channels)
+        self.wav.setsampwidth(sampwidth)
+        self.wav.setframerate(rate)
+
+    def write(self, pcm: bytes) -> bool:
+        if self.stopped:
+            return False
+        self.wav.writeframes(pcm)
+        return True
+
+    def finish(self):
+        if self.wav is not None:
+            self.wav.close()
+        self.wav = None
+
+
+def make_sink(spec: str = AUDIO_SINK) -> AudioSink:
+    """
+    Sink from a spec string: "auto" (pyalsaaudio if installed, else aplay),
+    "alsa", "aplay", "null", "null:realtime" or "file:<directory>".
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "auto":
+        try:
+            sink = AlsaSink()
+        except ImportError:
+            sink = AplaySink()
+            log_audio_sink(sink.name, "pyalsaaudio is not installed: one aplay process per utterance;"
+                                      " pip install -r requirements.txt")
+            return sink
+    elif kind == "alsa":
+        sink = AlsaSink(arg or AUDIO_DEVICE)
+    elif kind == "aplay":
+        sink = AplaySink(arg or AUDIO_DEVICE)
+    elif kind == "null":
+        sink = NullSink(realtime=(arg == "realtime"))
+    elif kind == "file":
+        if not arg:
+            raise ValueError("file sink needs a directory: file:<dir>")
+        sink = FileSink(arg)
+    else:
+        raise ValueError(f"Unknown audio sink: {spec}")
+    log_audio_sink(sink.name)
+    return sink
@@ -0,0 +1,320 @@
+"""
+Offline replay benchmark for the detect -> dedupe -> speak -> persist loop.
+
+Replays recorded frames through the real vision / tracker / DedupeSpeaker /
+SpeechScheduler / VADatabase code with a stub TTS sink, then reports per-stage
+latency percentiles, throughput and peak RSS as JSON.
+
+Usage:
+    python benchmark.py FRAMES_DIR [--limit N] [--out results.json] [--compare old.json]
+                                   [--workers N [--threads T]]
+
+--workers also pushes the frames through an InferencePool of N processes
+(T intra-op threads each) and reports its throughput and submit -> result
+latency under "inference_pool", next to the single-process "detect" stage.
+
+FRAMES_DIR holds images (.jpg/.png) or .npy arrays, replayed in name order,
+or is a .vafr recording made with VA_RECORD_PATH (memory-mapped, no decode).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(PROJECT_ROOT, "db_scripts", "VAv1_DB_SQLitev3.sql")
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_frames(path: str, limit: int | None = None) -> list:
+    """Decode every frame up front so decoding is not part of the measurement."""
+    if path.endswith(".vafr"):
+        from frame_source import RecordingSource
+        frames = RecordingSource(path).frames
+        return list(frames[:limit] if limit else frames)
+
+    names = sorted(f for f in os.listdir(path) if f.lower().endswith(_IMAGE_EXTS + (".npy",)))
+    if limit:
+        names = names[:limit]
+
+    frames = []
+    for name in names:
+        full = os.path.join(path, name)
+        if name.endswith(".npy"):
+            frames.append(np.load(full))
+        else:
+            from PIL import Image
+            # PIL decodes RGB; the camera delivers BGR-ordered "RGB888"
+            frames.append(np.ascontiguousarray(np.asarray(Image.open(full).convert("RGB"))[..., ::-1]))
+    return frames
+
+
+def percentiles(samples_ms: list) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "count": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+        )
+        return out.stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_db(path: str):
+    import sqlite3
+    con = sqlite3.connect(path)
+    try:
+        with open(SCHEMA_PATH, encoding="utf-8") as f:
+            con.executescript(f.read())
+    finally:
+        con.close()
+
+
+def run(frames: list, db_path: str, write_behind: bool) -> dict:
+    # Imported late so model loading is not counted as replay time
+    from vision import detect_array, labels_of
+    from tracker import IoUTracker
+    from dedupe import DedupeSpeaker
+    from speech_scheduler import SpeechScheduler
+    from scene_description import describe
+    from va_db import VADatabase
+    from config import SPEECH_COALESCE
+
+    spoken = []
+
+    def stub_speak(text: str) -> bool:
+        """Stand-in for tts_piper.speak: no synthesis, no audio device."""
+        spoken.append(text)
+        return True
+
+    db = VADatabase(db_path, write_behind=write_behind)
+    session_id = db.create_session("benchmark", None, "offline replay")
+    tracker = IoUTracker()
+    dedupe = DedupeSpeaker()
+    scheduler = SpeechScheduler()
+
+    stages = {name: [] for name in ("detect", "track", "persist", "dedupe", "speak", "frame")}
+
+    def timed(name: str, t0: float) -> float:
+        t1 = time.perf_counter()
+        stages[name].append((t1 - t0) * 1000.0)
+        return t1
+
+    wall0 = time.perf_counter()
+    for number, frame in enumerate(frames, start=1):
+        t_frame = t = time.perf_counter()
+
+        dets = detect_array(frame)
+        labels = labels_of(dets)
+        t = timed("detect", t)
+
+        tracker.update(dets)
+        t = timed("track", t)
+
+        frame_id = db.insert_frame(session_id, number, int(stages["detect"][-1]), dets, labels)
+        t = timed("persist", t)
+
+        current = set(labels)
+        track_ids = dets["track_id"].tolist()
+        scheduler.update_present({(lb, tid) for lb, tid in zip(labels, track_ids) if tid >= 0})
+        boxes = zip(dets["box_x"].tolist(), dets["box_y"].tolist(), dets["box_w"].tolist(), dets["box_h"].tolist())
+        for label, track_id, box in zip(labels, track_ids, boxes):
+            if track_id >= 0 and not scheduler.is_queued((label, track_id)) \
+                    and dedupe.should_speak(label, current, track_id):
+                scheduler.submit(label, track_id, frame_id, box)
+        t = timed("dedupe", t)
+
+        # Drain the scheduler synchronously, as the speech stage would
+        while True:
+            batch = scheduler.next_batch(timeout=0, limit=None if SPEECH_COALESCE else 1)
+            if not batch:
+                break
+            lead = batch[0]
+            text = describe([(ann.label, ann.box) for ann in batch]) if SPEECH_COALESCE else lead.label
+            message_id = db.insert_spoken_message(session_id, lead.frame_id, text)
+            audio_id = db.start_audio_event(session_id, message_id, "stub",
+                                            queue_ms=lead.queue_ms(), dropped_count=lead.dropped_before)
+            stub_speak(text)
+            for ann in batch:
+                dedupe.mark_spoken(ann.label, ann.track_id)
+            db.finish_audio_event(audio_id, was_successful=1)
+            scheduler.done_batch(batch)
+        t = timed("speak", t)
+
+        timed("frame", t_frame)
+
+    t_flush = time.perf_counter()
+    db.end_session(session_id)
+    db.close()
+    flush_ms = (time.perf_counter() - t_flush) * 1000.0
+    wall_s = time.perf_counter() - wall0
+
+    return {
+        "frames": len(frames),
+        "wall_s": round(wall_s, 3),
+        "fps": round(len(frames) / wall_s, 3) if wall_s > 0 else 0.0,
+        "utterances": len(spoken),
+        "db_final_flush_ms": round(flush_ms, 3),
+        "stages": {name: percentiles(samples) for name, samples in stages.items()},
+    }
+
+
+def run_pool(frames: list, workers: int, threads: int) -> dict:
+    """Detection only, through worker processes: as many frames in flight as there are slots."""
+    from inference_pool import InferencePool
+
+    t_start = time.perf_counter()
+    pool = InferencePool(workers=workers, threads=threads, shape=frames[0].shape)
+    start_s = time.perf_counter() - t_start
+
+    latency, infer = [], []
+    try:
+        # Warm every worker (untimed)
+        for number, frame in enumerate(frames[:pool.slots], start=1):
+            pool.submit(number, frame)
+        for _ in frames[:pool.slots]:
+            pool.next_result().release()
+
+        def drain(block: bool):
+            while True:
+                res = pool.next_result(timeout=None if block else 0)
+                if res is None:
+                    return
+                latency.append(res.latency_ms)
+                infer.append(res.infer_ms)
+                res.release()
+                if block:
+                    return
+
+        wall0 = time.perf_counter()
+        for number, frame in enumerate(frames, start=1):
+            while pool.in_flight() >= pool.slots:
+                drain(block=True)
+            pool.submit(number, frame)
+            drain(block=False)
+        while pool.in_flight():
+            drain(block=True)
+        wall_s = time.perf_counter() - wall0
+    finally:
+        pool.close()
+
+    return {
+        "workers": pool.workers,
+        "threads": pool.threads,
+        "start_s": round(start_s, 3),
+        "frames": len(frames),
+        "fps": round(len(frames) / wall_s, 3) if wall_s > 0 else 0.0,
+        "latency": percentiles(latency),
+        "infer": percentiles(infer),
+    }
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """Per-stage p50/p95 change versus a previous results file (positive = slower)."""
+    lines = [f"baseline commit={baseline.get('commit')}  current commit={current.get('commit')}"]
+    for name, cur in current["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if not old or not old.get("count") or not cur.get("count"):
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms"):
+            delta = (cur[key] - old[key]) / old[key] * 100.0 if old[key] else 0.0
+            parts.append(f"{key}={old[key]:.2f}->{cur[key]:.2f} ({delta:+.1f}%)")
+        lines.append(f"{name:8s} " + "  ".join(parts))
+    pool = current.get("inference_pool")
+    if pool:
+        lines.append(f"pool {pool['workers']}x{pool['threads']}: fps={pool['fps']}  "
+                     f"latency p50={pool['latency'].get('p50_ms')} p95={pool['latency'].get('p95_ms')}  "
+                     f"(single-process detect p50={current['stages']['detect'].get('p50_ms')})")
+    lines.append(f"fps={baseline.get('fps')}->{current.get('fps')}  "
+                 f"peak_rss_mb={baseline.get('peak_rss_mb')}->{current.get('peak_rss_mb')}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline replay benchmark")
+    parser.add_argument("frames", help="directory of recorded frames or a .vafr recording")
+    parser.add_argument("--limit", type=int, default=None, help="replay at most N frames")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed frames run first")
+    parser.add_argument("--sync-db", action="store_true", help="disable write-behind persistence")
+    parser.add_argument("--out", default=None, help="write JSON results to this file")
+    parser.add_argument("--compare", default=None, help="previous JSON results to compare against")
+    parser.add_argument("--workers", type=int, default=0, help="also measure an inference pool of N processes")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per pool worker (0 = engine default)")
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        parser.error(f"no frames found in {args.frames}")
+
+    import vision
+    import metrics
+    t_load = time.perf_counter()
+    vision.get_model()
+    model_load_s = time.perf_counter() - t_load
+
+    for frame in frames[:args.warmup]:
+        vision.detect_array(frame)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        create_db(db_path)
+        result = run(frames, db_path, write_behind=not args.sync_db)
+
+    if args.workers:
+        result["inference_pool"] = run_pool(frames, args.workers, args.threads)
+
+    result.update({
+        "commit": git_commit(),
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "engine": vision.model.name,
+        "model_load_s": round(model_load_s, 3),
+        "write_behind": not args.sync_db,
+        # Cost of one latency span, to judge the instrumentation in "stages"
+        "span_overhead_ns": metrics.measure_overhead(),
+        # ru_maxrss is reported in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    })
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(baseline, result)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,9 @@
-from picamera2 import Picamera2
-from config import FRAME_WIDTH, FRAME_HEIGHT
+import threading
+import time
+
+import numpy as np
+from picamera2 import Picamera2, MappedArray
+from config import FRAME_WIDTH, FRAME_HEIGHT, CAPTURE_RING_SLOTS
 
 
 def open_camera():
@@ -19,3 +23,151 @@ def open_camera():
 def get_frame(picam2):
     """Capture and return the current camera frame as an RGB NumPy array."""
     return picam2.capture_array()
+
+
+class Frame:
+    """
+    A leased slot of the FrameRing. `array` is the ring buffer itself (no copy),
+    so it is only valid until release() is called.
+    """
+
+    __slots__ = ("seq", "timestamp", "array", "_ring", "_slot")
+
+    def __init__(self, ring, slot: int, seq: int, timestamp: float):
+        self._ring = ring
+        self._slot = slot
+        self.seq = seq
+        self.timestamp = timestamp
+        self.array = ring._buffers[slot]
+
+    def downscaled(self, step: int):
+        """Strided view of the same buffer (every `step`-th pixel, no copy)."""
+        return self.array[::step, ::step]
+
+    def release(self):
+        if self._ring is not None:
+            self._ring._release(self._slot)
+            self._ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameRing:
+    """
+    Background capture into a small pool of preallocated frame buffers.
+
+    A capture thread copies each camera buffer into a free slot (never the
+    newest one and never a slot a consumer still holds) and publishes it as
+    the latest frame. Consumers lease the newest frame without copying.
+    Frames replaced before anyone leased them are counted as dropped.
+    """
+
+    def __init__(self, picam2, slots: int = CAPTURE_RING_SLOTS):
+        self.picam2 = picam2
+        # One slot for the newest frame, one being written, the rest for consumers
+        slots = max(3, int(slots))
+        self._buffers = [np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) for _ in range(slots)]
+        self._seqs = [0] * slots
+        self._times = [0.0] * slots
+        self._leases = [0] * slots
+        self._latest = -1
+        self._latest_taken = True
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.captured = 0
+        self.dropped = 0       # published frames nobody consumed
+        self.overruns = 0      # camera frames discarded because every slot was busy
+        self.wait_s = 0.0      # consumer time spent waiting for a new frame
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _free_slot(self):
+        candidates = [
+            i for i in range(len(self._buffers))
+            if i != self._latest and self._leases[i] == 0
+        ]
+        if not candidates:
+            return None
+        # Reuse the oldest frame first
+        return min(candidates, key=lambda i: self._seqs[i])
+
+    def _run(self):
+        seq = 0
+        while self._running:
+            with self._cond:
+                slot = self._free_slot()
+
+            request = self.picam2.capture_request()
+            try:
+                seq += 1
+                if slot is None:
+                    self.overruns += 1
+                    continue
+                # Single copy out of the camera's DMA buffer into our preallocated slot
+                with MappedArray(request, "main") as m:
+                    np.copyto(self._buffers[slot], m.array[:FRAME_HEIGHT, :FRAME_WIDTH, :3])
+            finally:
+                request.release()
+
+            with self._cond:
+                if not self._latest_taken:
+                    self.dropped += 1
+                self._seqs[slot] = seq
+                self._times[slot] = time.monotonic()
+                self._latest = slot
+                self._latest_taken = False
+                self.captured += 1
+                self._cond.notify_all()
+
+    def acquire(self, after_seq: int = 0, timeout: float | None = None) -> Frame | None:
+        """
+        Lease the newest frame with a sequence number greater than `after_seq`.
+        Returns None on timeout. The caller must release() the frame.
+        """
+        t0 = time.monotonic()
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: not self._running or (self._latest >= 0 and self._seqs[self._latest] > after_seq),
+                timeout=timeout,
+            )
+            self.wait_s += time.monotonic() - t0
+            if not ready or not self._running:
+                return None
+            slot = self._latest
+            self._leases[slot] += 1
+            self._latest_taken = True
+            return Frame(self, slot, self._seqs[slot], self._times[slot])
+
+    def depth(self) -> int:
+        """Frames published and not leased yet (0 or 1: the newest frame wins)."""
+        with self._cond:
+            return int(self._latest >= 0 and not self._latest_taken)
+
+    def _release(self, slot: int):
+        with self._cond:
+            self._leases[slot] -= 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "captured": self.captured,
+                "dropped": self.dropped,
+                "overruns": self.overruns,
+                "wait_s": round(self.wait_s, 3),
+            }
@@ -22,7 +22,24 @@ CAPTURE_DIR = f"{BASE_DIR}/captures"
 # --------------------------------------------------
 # Models
 # --------------------------------------------------
-MODEL_PATH = f"{MODELS_DIR}/yolov8n.pt"
+# VA_MODEL_PATH also wins over the file_path of the `model` table row
+MODEL_PATH = os.getenv("VA_MODEL_PATH", f"{MODELS_DIR}/yolov8n.pt")
+MODEL_PATH_EXPLICIT = "VA_MODEL_PATH" in os.environ
+
+# Inference engine: "auto" picks it from the `model` table (DEFAULT_MODEL_ID)
+# or from the model file, otherwise "ultralytics" (.pt / NCNN / TFLite),
+# "onnxruntime" (.onnx) or "openvino" (OpenVINO export directory)
+INFER_BACKEND = os.getenv("VA_INFER_BACKEND", "auto")
+INFER_IMGSZ = 640
+# Intra-op CPU threads for the engine (0 = engine default)
+INFER_THREADS = int(os.getenv("VA_INFER_THREADS", "0"))
+# Worker processes, each with its own model (inference_pool.py); frames go
+# through shared memory and results come back in frame order.
+# 0 = run inference in the main process. With workers, INFER_THREADS is per
+# worker: e.g. 2 workers x 2 threads on a Pi 5.
+INFER_WORKERS = int(os.getenv("VA_INFER_WORKERS", "0"))
+INFER_POOL_SLOTS = 2  # shared frame slots per worker (in flight + being handled)
+IOU_THRES = 0.7
 
 # --------------------------------------------------
 # Camera configuration
@@ -30,12 +47,159 @@ MODEL_PATH = f"{MODELS_DIR}/yolov8n.pt"
 FRAME_WIDTH = 640
 FRAME_HEIGHT = 480
 
+# --------------------------------------------------
+# Frame source
+# --------------------------------------------------
+# "picamera" (live camera), an image directory, a video file or a .vafr
+# recording made with VA_RECORD_PATH (see frame_source.py)
+FRAME_SOURCE = os.getenv("VA_FRAME_SOURCE", "picamera")
+# File sources: "1" = pace by recorded timestamps, "0" = as fast as possible
+REPLAY_REALTIME = os.getenv("VA_REPLAY_REALTIME", "1") == "1"
+# Record every processed frame to this .vafr file (empty = off)
+RECORD_PATH = os.getenv("VA_RECORD_PATH", "")
+
 # --------------------------------------------------
 # Detection / performance
 # --------------------------------------------------
 # Run inference every N frames to improve FPS on embedded hardware
 INFER_EVERY_N_FRAMES = 3
 CONF_THRES = 0.35
+# float32 confidences are rounded to this many decimals when they leave numpy
+# (stored as 0.9, not 0.8999999761581421)
+CONF_DECIMALS = 4
+
+# Scene-change gate: skip YOLO while the scene is static and reuse the
+# last detections. When enabled it replaces the fixed INFER_EVERY_N_FRAMES cadence.
+# Optional: VA_GATE=1 turns it on
+GATE_ENABLED = os.getenv("VA_GATE", "0") == "1"
+GATE_DOWNSCALE = 8            # compare every 8th pixel in each direction
+GATE_PIXEL_DELTA = 12         # per-pixel gray change that counts as "changed"
+GATE_CHANGED_FRACTION = 0.02  # fraction of changed pixels that triggers inference
+GATE_MAX_STALE_S = 2.0        # always re-run inference after this many seconds
+
+# Adaptive inference (vision.AdaptiveDetector): the input size follows recent
+# latency, and between periodic full-frame passes only crops around the last
+# detections are inferred (boxes are mapped back to full-frame coordinates).
+# Runs in the main process only (not with INFER_WORKERS).
+ADAPTIVE_INFER = os.getenv("VA_ADAPTIVE_INFER", "0") == "1"
+ADAPTIVE_BUDGET_MS = 120.0          # target inference time per frame
+ADAPTIVE_IMGSZ = (320, 416, 512, 640)  # candidate sizes (engines with a dynamic input only)
+ADAPTIVE_FULL_EVERY = 5             # full-frame pass every N inferences (new objects appear here)
+ADAPTIVE_ROI_MARGIN = 0.3           # crop = box grown by this fraction of its size per side
+ADAPTIVE_ROI_MAX_AREA = 0.5         # crops covering more of the frame than this -> full frame
+
+# Closed-loop inference controller (inference_controller.py): every
+# CONTROL_INTERVAL_S it moves the inference stride (base: INFER_EVERY_N_FRAMES,
+# or 1 with the scene gate) and the input size to hold CONTROL_TARGET_DETECT_MS,
+# backing off when the CPU is hot or throttled. The target is the p90 detect
+# time: the part of frame -> speech latency these two knobs move (speech-side
+# delay is bounded by SPEECH_MAX_AGE_S, preemption and coalescing instead).
+# Optional: VA_CONTROL=1 turns it on
+CONTROL_ENABLED = os.getenv("VA_CONTROL", "0") == "1"
+CONTROL_INTERVAL_S = 2.0
+CONTROL_TARGET_DETECT_MS = 250.0
+CONTROL_HEADROOM = 0.6              # p90 under target * this -> spend the spare time
+CONTROL_MAX_STRIDE = 8
+CONTROL_TEMP_HOT_C = 80.0           # Pi 5 firmware starts throttling at 85 C
+CONTROL_TEMP_COOL_C = 70.0
+CONTROL_THROTTLE_FREQ_RATIO = 0.9   # cur/max CPU clock below this while warm = throttled
+CONTROL_IDLE_ACTIVITY = 0.05        # fraction of frames with a scene change below which it is idle
+CONTROL_SYSFS_ROOT = os.getenv("VA_SYSFS_ROOT", "/")
+
+# --------------------------------------------------
+# Pipeline (capture -> inference -> speech threads)
+# --------------------------------------------------
+# Latest-frame-wins: a capture thread fills a ring of preallocated frame
+# buffers and inference always leases the newest one
+CAPTURE_RING_SLOTS = 4
+# Pending announcements; the lowest-priority one is dropped when full
+SPEECH_QUEUE_SIZE = 4
+# Announcements older than this are stale and never spoken
+SPEECH_MAX_AGE_S = 3.0
+# Cut the current playback when a waiting announcement is this many times more important
+SPEECH_PREEMPT_RATIO = 2.0
+# Speak everything pending as one sentence ("two people and a chair on your left"):
+# one synth/playback and one spoken_message row per scene update. Off = one label
+# per utterance; VA_SPEECH_COALESCE=1 turns it on
+SPEECH_COALESCE = os.getenv("VA_SPEECH_COALESCE", "0") == "1"
+# Class importance for announcement ranking (unlisted labels = 1.0)
+CLASS_PRIORITY = {
+    "person": 3.0, "car": 3.0, "bus": 3.0, "truck": 3.0, "train": 3.0,
+    "motorcycle": 2.5, "bicycle": 2.5, "dog": 2.0, "horse": 2.0,
+    "stop sign": 2.0, "traffic light": 2.0, "fire hydrant": 1.5,
+    "chair": 1.5, "bench": 1.5, "couch": 1.2, "bed": 1.2, "dining table": 1.2,
+}
+# How often the main thread logs per-stage queue depth / stall time
+# (also the window of each latency_summary row)
+STATS_LOG_SECONDS = 30
+
+# --------------------------------------------------
+# Startup
+# --------------------------------------------------
+STARTUP_WARMUP_RUNS = 1          # dummy inferences before the first real frame
+STARTUP_READY_TEXT = "Ready"     # spoken once startup is done ("" = silent)
+
+# --------------------------------------------------
+# Latency metrics (per-stage histograms)
+# --------------------------------------------------
+METRICS_ENABLED = os.getenv("VA_METRICS", "0") == "1"   # optional: VA_METRICS=1 turns it on
+METRICS_HOST = "127.0.0.1"    # localhost only
+METRICS_PORT = int(os.getenv("VA_METRICS_PORT", "9108"))   # 0 = no HTTP endpoint
+
+# --------------------------------------------------
+# Event feed for observers (framework/observer.py)
+# --------------------------------------------------
+EVENT_BUS_ENABLED = os.getenv("VA_EVENT_BUS", "0") == "1"   # optional: VA_EVENT_BUS=1 turns it on
+EVENT_SOCKET_PATH = os.getenv("VA_EVENT_SOCKET", "/tmp/visual_assistant_events.sock")
+EVENT_BUS_MAX_BUFFER_KB = 256   # a subscriber further behind than this is disconnected
+OBSERVER_POLL_SECONDS = 0.25    # SQLite fallback: how often PRAGMA data_version is checked
+OBSERVER_BACKLOG_ROWS = 50      # newest rows per table replayed when the observer starts
+
+# --------------------------------------------------
+# Object tracking (stable ids between inference frames)
+# --------------------------------------------------
+TRACK_IOU_THRES = 0.3     # min IoU between predicted track and new box
+TRACK_MAX_MISSES = 3      # inference frames a track may go unmatched
+TRACK_MIN_HITS = 2        # matches before a track is confirmed (and announced)
+TRACK_MAX_AGE_S = 5.0     # drop tracks not seen for this long
+
+# --------------------------------------------------
+# Frame capture archive (JPEG files under CAPTURE_DIR)
+# --------------------------------------------------
+CAPTURE_ENABLED = os.getenv("VA_CAPTURE", "0") == "1"   # optional: VA_CAPTURE=1 turns it on
+CAPTURE_EVERY_N = 0           # also save every Nth frame (0 = only on events)
+CAPTURE_ON_NEW_LABEL = True   # save when a label appears that was not in the last frame
+CAPTURE_PRE_FRAMES = 2        # frames kept from before each event
+CAPTURE_POST_FRAMES = 2       # frames saved after each event
+CAPTURE_QUEUE_SIZE = 8        # extra frame buffers for frames waiting to be encoded
+CAPTURE_QUOTA_MB = 512        # oldest captures are deleted above this size
+CAPTURE_JPEG_QUALITY = 85
+
+# --------------------------------------------------
+# Speech audio cache
+# --------------------------------------------------
+# Synthesized speech is cached in memory (LRU); labels / one-object sentences
+# (the prewarm vocabulary) are also kept on disk, one directory per voice
+# fingerprint (directories of older voices / settings are deleted at startup)
+TTS_CACHE_DIR = f"{BASE_DIR}/cache/tts"
+TTS_CACHE_MAX_ITEMS = 256
+TTS_CACHE_DISK_MB = 32   # least recently used files are deleted above this size
+# Synthesize common phrases in the background at startup (every YOLO label,
+# or with SPEECH_COALESCE the one-object sentences of the CLASS_PRIORITY labels)
+TTS_PREWARM = True
+
+# --------------------------------------------------
+# Speech playback (tts_piper.py -> audio_sink.py)
+# --------------------------------------------------
+# Stream Piper's raw PCM (--output_raw) into the sink while it synthesizes:
+# playback starts with the first chunk. Optional: VA_TTS_STREAM=1 turns it on
+# (default: synthesize the whole WAV first)
+TTS_STREAM = os.getenv("VA_TTS_STREAM", "0") == "1"
+# "auto" (pyalsaaudio if installed, else an aplay pipe), "alsa", "aplay",
+# "null" / "null:realtime" (headless, audio discarded), "file:<dir>" (one WAV per utterance)
+AUDIO_SINK = os.getenv("VA_AUDIO_SINK", "auto")
+AUDIO_DEVICE = os.getenv("VA_AUDIO_DEVICE", "default")   # ALSA PCM name
+AUDIO_CHUNK_MS = 40   # cached audio is written to the sink in chunks this long
 
 # --------------------------------------------------
 # Anti-repeat logic
@@ -57,6 +221,24 @@ DB_PATH = os.getenv(
     f"{BASE_DIR}/visual_assistant_v1.db"
 )
 
+# Write-behind: one background writer commits queued rows in batches
+# (flushed every DB_BATCH_SIZE statements or DB_FLUSH_MS milliseconds).
+# Part of the core persistence path, so on by default; VA_DB_WRITE_BEHIND=0
+# writes synchronously instead
+DB_WRITE_BEHIND = os.getenv("VA_DB_WRITE_BEHIND", "1") == "1"
+DB_BATCH_SIZE = 200
+DB_FLUSH_MS = 500
+# Compiled statements kept per connection (db_access: one persistent connection per thread)
+DB_STATEMENT_CACHE = 128
+
+# Maintenance (db_maintenance.py): per-minute rollups, retention, vacuum.
+# Optional: VA_DB_MAINTENANCE=1 runs it inside the assistant
+DB_MAINTENANCE_ENABLED = os.getenv("VA_DB_MAINTENANCE", "0") == "1"
+DB_MAINTENANCE_INTERVAL_S = 300   # how often a maintenance pass is attempted
+DB_RETENTION_DAYS = 7             # raw detection / frame_event rows older than this are pruned
+DB_MAINTENANCE_CHUNK_ROWS = 2000  # rows per short transaction (keeps the live writer unblocked)
+DB_VACUUM_PAGES = 256             # pages released per incremental_vacuum step
+
 # --------------------------------------------------
 # Application metadata
 # --------------------------------------------------
@@ -0,0 +1,235 @@
+"""
+Shared SQLite access for the headless assistant (va_db.VADatabase) and the
+Tk framework (framework/va_core/db.py).
+
+- connect(): every connection gets the same PRAGMAs (the ones the schema
+  script sets, which are per connection except journal_mode)
+- DataAccess: one persistent connection per thread and database file,
+  opened on first use; sqlite3 keeps compiled statements per connection
+  (DB_STATEMENT_CACHE), keyed by SQL text, so the shared statements below
+  are prepared once per thread
+- insert_frame(): a frame_event row and its detections in one transaction
+
+Usage:
+    python db_access.py --frames 2000     # persistent vs per-call connect
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from config import DB_PATH, DB_STATEMENT_CACHE
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# ---------------- statements used by both wrappers ----------------
+# Placeholders for `id` let write-behind callers pass pre-allocated ids
+# (None = let SQLite pick one).
+
+SQL_INSERT_SESSION = (
+    "INSERT INTO run_session(id, start_time_utc, app_version, model_id, device_notes) VALUES(?,?,?,?,?)"
+)
+SQL_END_SESSION = "UPDATE run_session SET end_time_utc=? WHERE id=?"
+SQL_SELECT_MODEL = "SELECT model_format, file_path FROM model WHERE id=?"
+SQL_INSERT_FRAME = (
+    "INSERT INTO frame_event(id, session_id, frame_number, captured_at_utc, detect_ms, objects_found)"
+    " VALUES(?,?,?,?,?,?)"
+)
+SQL_INSERT_DETECTION = (
+    "INSERT INTO detection(session_id, frame_id, object_label, confidence_0_1,"
+    " box_x, box_y, box_w, box_h, track_id) VALUES(?,?,?,?,?,?,?,?,?)"
+)
+
+
+def utc_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def connect(db_path: str = DB_PATH, readonly: bool = False, **kwargs) -> sqlite3.Connection:
+    """
+    New connection with the shared PRAGMAs applied. readonly=True opens the
+    file with mode=ro and leaves journal_mode (a property of the file) alone.
+    """
+    kwargs.setdefault("timeout", 30)
+    kwargs.setdefault("cached_statements", DB_STATEMENT_CACHE)
+    if readonly:
+        db_path, kwargs["uri"] = f"file:{db_path}?mode=ro", True
+    con = sqlite3.connect(db_path, **kwargs)
+    for pragma in PRAGMAS:
+        if not (readonly and pragma.startswith("PRAGMA journal_mode")):
+            con.execute(pragma)
+    return con
+
+
+class DataAccess:
+    """
+    Per-thread persistent connections to one database file. Safe to share
+    between threads: each thread transparently gets (and keeps) its own.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._all = []              # every connection opened, for close()
+        self._lock = threading.Lock()
+
+    @property
+    def con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # check_same_thread=False only so close() can run from another thread;
+            # each connection is still used by the thread that opened it
+            con = connect(self.db_path, check_same_thread=False)
+            self._local.con = con
+            with self._lock:
+                self._all.append(con)
+        return con
+
+    def close(self):
+        """Close every thread's connection (at shutdown, once the threads are done)."""
+        with self._lock:
+            connections, self._all = self._all, []
+        for con in connections:
+            con.close()
+        self._local = threading.local()
+
+    # ---------------- statements ----------------
+
+    def insert(self, sql: str, params: tuple) -> int:
+        """One INSERT in its own transaction; returns the row id."""
+        con = self.con
+        with con:
+            return con.execute(sql, params).lastrowid
+
+    def execute(self, sql: str, params: tuple = ()):
+        con = self.con
+        with con:
+            con.execute(sql, params)
+
+    def executemany(self, sql: str, rows: list):
+        if not rows:
+            return
+        con = self.con
+        with con:
+            con.executemany(sql, rows)
+
+    def query_one(self, sql: str, params: tuple = ()):
+        return self.con.execute(sql, params).fetchone()
+
+    def query_all(self, sql: str, params: tuple = ()) -> list:
+        return self.con.execute(sql, params).fetchall()
+
+    # ---------------- bulk writes ----------------
+
+    def insert_frame(self, frame: tuple, detections: list = ()) -> int:
+        """
+        frame_event row plus its detection rows in one transaction.
+        `frame` is SQL_INSERT_FRAME's parameters (id may be None); detection
+        rows are SQL_INSERT_DETECTION's without frame_id, which is filled in.
+        """
+        con = self.con
+        with con:
+            frame_id = con.execute(SQL_INSERT_FRAME, frame).lastrowid
+            if detections:
+                con.executemany(SQL_INSERT_DETECTION, [(r[0], frame_id, *r[1:]) for r in detections])
+        return frame_id
+
+    def insert_frames(self, frames: list) -> list:
+        """Many (frame, detections) pairs from insert_frame() in a single transaction."""
+        con = self.con
+        ids = []
+        with con:
+            for frame, detections in frames:
+                frame_id = con.execute(SQL_INSERT_FRAME, frame).lastrowid
+                if detections:
+                    con.executemany(SQL_INSERT_DETECTION, [(r[0], frame_id, *r[1:]) for r in detections])
+                ids.append(frame_id)
+        return ids
+
+
+# ==================================================
+# Benchmark: persistent connection vs connect per call
+# ==================================================
+
+def _per_call(db_path: str, session_id: int, frames: int, dets: int):
+    """The pattern both wrappers used: connect, insert, commit, close for every row."""
+    for n in range(frames):
+        con = sqlite3.connect(db_path, timeout=30)
+        try:
+            cur = con.execute(SQL_INSERT_FRAME, (None, session_id, n, utc_iso(), 10, dets))
+            con.commit()
+            frame_id = cur.lastrowid
+        finally:
+            con.close()
+        for _ in range(dets):
+            con = sqlite3.connect(db_path, timeout=30)
+            try:
+                con.execute(SQL_INSERT_DETECTION, (session_id, frame_id, "person", 0.9, 1, 2, 3, 4, None))
+                con.commit()
+            finally:
+                con.close()
+
+
+def _persistent(dal: DataAccess, session_id: int, frames: int, dets: int):
+    for n in range(frames):
+        dal.insert_frame((None, session_id, n, utc_iso(), 10, dets),
+                         [(session_id, "person", 0.9, 1, 2, 3, 4, None)] * dets)
+
+
+def _bulk(dal: DataAccess, session_id: int, frames: int, dets: int, batch: int = 50):
+    for start in range(0, frames, batch):
+        dal.insert_frames([
+            ((None, session_id, n, utc_iso(), 10, dets), [(session_id, "person", 0.9, 1, 2, 3, 4, None)] * dets)
+            for n in range(start, min(start + batch, frames))
+        ])
+
+
+def benchmark(frames: int = 1000, dets: int = 3, schema: str | None = None) -> dict:
+    """Frames (+ `dets` detections each) per second for each write pattern, on a scratch database."""
+    schema = schema or os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_scripts", "VAv1_DB_SQLitev3.sql")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("per_call_connect", "persistent", "persistent_bulk"):
+            db_path = os.path.join(tmp, f"{name}.db")
+            con = sqlite3.connect(db_path)
+            with open(schema, encoding="utf-8") as f:
+                con.executescript(f.read())
+            session_id = con.execute(SQL_INSERT_SESSION, (None, utc_iso(), "bench", None, None)).lastrowid
+            con.commit()
+            con.close()
+
+            dal = DataAccess(db_path)
+            t0 = time.perf_counter()
+            if name == "per_call_connect":
+                _per_call(db_path, session_id, frames, dets)
+            elif name == "persistent":
+                _persistent(dal, session_id, frames, dets)
+            else:
+                _bulk(dal, session_id, frames, dets)
+            elapsed = time.perf_counter() - t0
+            dal.close()
+            results[name] = {"frames_per_s": round(frames / elapsed, 1),
+                             "us_per_frame": round(elapsed / frames * 1e6, 1)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent vs per-call SQLite connections")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--detections", type=int, default=3, help="detections per frame")
+    args = parser.parse_args(argv)
+    for name, result in benchmark(args.frames, args.detections).items():
+        print(f"{name:18s} {result['frames_per_s']:>10.1f} frames/s  {result['us_per_frame']:>9.1f} us/frame")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
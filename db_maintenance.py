@@ -0,0 +1,313 @@
+"""
+Background maintenance for the edge database.
+
+    rollup     detection rows -> detection_minute (per session, minute, label)
+    summaries  frame_event / audio_event -> session_summary, session_detect_ms
+               (read by report.py; also refreshed by VADatabase.end_session)
+    retention  raw detection / frame_event rows older than DB_RETENTION_DAYS are
+               deleted once rolled up (rollups, messages and sessions are kept)
+    vacuum     PRAGMA incremental_vacuum (needs auto_vacuum = INCREMENTAL)
+    checkpoint PRAGMA wal_checkpoint(PASSIVE)
+
+Work is split into short transactions of DB_MAINTENANCE_CHUNK_ROWS rows on a
+separate connection, and a pass stops as soon as the assistant is busy, so
+the write-behind writer is never held up for long.
+
+Usage (one pass, e.g. from cron while the assistant is stopped):
+    python db_maintenance.py [--db PATH] [--enable-incremental-vacuum]
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import (
+    DB_PATH, DB_MAINTENANCE_INTERVAL_S, DB_RETENTION_DAYS,
+    DB_MAINTENANCE_CHUNK_ROWS, DB_VACUUM_PAGES
+)
+from db_access import connect
+
+_ROLLUP_SQL = """
+    INSERT INTO detection_minute(session_id, minute_utc, object_label, detections, conf_sum, conf_max)
+    SELECT d.session_id, substr(f.captured_at_utc, 1, 16), d.object_label,
+           COUNT(*), SUM(d.confidence_0_1), MAX(d.confidence_0_1)
+    FROM detection d JOIN frame_event f ON f.id = d.frame_id
+    WHERE d.id > ? AND d.id <= ?
+    GROUP BY 1, 2, 3
+    ON CONFLICT(session_id, minute_utc, object_label) DO UPDATE SET
+        detections = detections + excluded.detections,
+        conf_sum   = conf_sum + excluded.conf_sum,
+        conf_max   = MAX(conf_max, excluded.conf_max)
+"""
+
+_DETECT_MS_SQL = """
+    INSERT INTO session_detect_ms(session_id, detect_ms, frames)
+    SELECT session_id, detect_ms, COUNT(*) FROM frame_event
+    WHERE id > ? AND id <= ?
+    GROUP BY 1, 2
+    ON CONFLICT(session_id, detect_ms) DO UPDATE SET frames = frames + excluded.frames
+"""
+
+_FRAMES_SQL = """
+    INSERT INTO session_summary(session_id, frames, objects, detect_ms_sum, detect_ms_max, updated_at_utc)
+    SELECT session_id, COUNT(*), SUM(objects_found), SUM(detect_ms), MAX(detect_ms), ?
+    FROM frame_event
+    WHERE id > ? AND id <= ?
+    GROUP BY 1
+    ON CONFLICT(session_id) DO UPDATE SET
+        frames         = frames + excluded.frames,
+        objects        = objects + excluded.objects,
+        detect_ms_sum  = detect_ms_sum + excluded.detect_ms_sum,
+        detect_ms_max  = MAX(detect_ms_max, excluded.detect_ms_max),
+        updated_at_utc = excluded.updated_at_utc
+"""
+
+# Index-only over ix_audio_event_outcome
+_AUDIO_SQL = """
+    INSERT INTO session_summary(session_id, audio_events, audio_failures, audio_preempted, queue_ms_sum, updated_at_utc)
+    SELECT ?, COUNT(*), COALESCE(SUM(was_successful = 0), 0), COALESCE(SUM(was_preempted), 0),
+           COALESCE(SUM(queue_ms), 0), ?
+    FROM audio_event WHERE session_id = ?
+    ON CONFLICT(session_id) DO UPDATE SET
+        audio_events    = excluded.audio_events,
+        audio_failures  = excluded.audio_failures,
+        audio_preempted = excluded.audio_preempted,
+        queue_ms_sum    = excluded.queue_ms_sum,
+        updated_at_utc  = excluded.updated_at_utc
+"""
+
+
+def _state(con, name: str) -> int:
+    (value,) = con.execute("SELECT value FROM maintenance_state WHERE name=?", (name,)).fetchone()
+    return value
+
+
+def _chunked(con, name: str, table: str, chunk_rows: int, step, pause=None) -> int:
+    """
+    Run step(lower, upper) over ids (state[name], MAX(table.id)] in chunks,
+    one short transaction each. The watermark is read and advanced inside
+    the write transaction, so concurrent passes (maintenance thread,
+    end_session, report.py --refresh) never fold the same rows twice.
+    """
+    processed = 0
+    while True:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            done = _state(con, name)
+            (top,) = con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+            if top < done:
+                # Ids restarted after an older version pruned every row: all rows left are new
+                done = 0
+            upper = min(done + chunk_rows, top)
+            if upper > done:
+                step(done, upper)
+            con.execute("UPDATE maintenance_state SET value=? WHERE name=?", (max(upper, done), name))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        if upper <= done:
+            return processed
+        processed += upper - done
+        if pause is not None:
+            pause()
+
+
+def rollup_detections(con, chunk_rows: int = DB_MAINTENANCE_CHUNK_ROWS, pause=None) -> int:
+    """Fold new detection rows into detection_minute; returns rows rolled up."""
+    return _chunked(con, "rolled_detection_id", "detection", chunk_rows,
+                    lambda lo, hi: con.execute(_ROLLUP_SQL, (lo, hi)), pause)
+
+
+def refresh_summaries(con, chunk_rows: int = DB_MAINTENANCE_CHUNK_ROWS, pause=None, session_id=None) -> int:
+    """
+    Fold new frame_event rows into session_summary / session_detect_ms and
+    recount audio outcomes of every session touched (plus `session_id`).
+    Returns frames summarized.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    touched = set() if session_id is None else {session_id}
+
+    def step(lo, hi):
+        con.execute(_DETECT_MS_SQL, (lo, hi))
+        con.execute(_FRAMES_SQL, (now, lo, hi))
+        touched.update(row[0] for row in con.execute(
+            "SELECT DISTINCT session_id FROM frame_event WHERE id > ? AND id <= ?", (lo, hi)))
+
+    frames = _chunked(con, "summarized_frame_id", "frame_event", chunk_rows, step, pause)
+
+    # audio_event rows are updated after insert (playback result), so recount per session
+    for sid in sorted(touched):
+        con.execute(_AUDIO_SQL, (sid, now, sid))
+    return frames
+
+
+class Busy(Exception):
+    """The assistant needs the database (or the disk); try again later."""
+
+
+class DatabaseMaintenance(threading.Thread):
+    def __init__(self, db_path: str = DB_PATH, is_idle=None,
+                 interval_s: float = DB_MAINTENANCE_INTERVAL_S,
+                 retention_days: float = DB_RETENTION_DAYS,
+                 chunk_rows: int = DB_MAINTENANCE_CHUNK_ROWS,
+                 vacuum_pages: int = DB_VACUUM_PAGES):
+        super().__init__(name="db-maintenance", daemon=True)
+        self.db_path = db_path
+        self.is_idle = is_idle or (lambda: True)
+        self.interval_s = interval_s
+        self.retention_days = retention_days
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.vacuum_pages = max(1, int(vacuum_pages))
+        self._stop_event = threading.Event()
+
+        self.passes = 0
+        self.interrupted = 0
+        self.rolled = 0
+        self.pruned_detections = 0
+        self.pruned_frames = 0
+        self.vacuumed_pages = 0
+        self.last_error = None
+
+    # ---------------- thread ----------------
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            if self.is_idle():
+                self.run_once()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "passes": self.passes,
+            "interrupted": self.interrupted,
+            "rolled": self.rolled,
+            "pruned_detections": self.pruned_detections,
+            "pruned_frames": self.pruned_frames,
+            "vacuumed_pages": self.vacuumed_pages,
+            "last_error": self.last_error,
+        }
+
+    # ---------------- one pass ----------------
+
+    def run_once(self) -> dict:
+        """Rollup, prune, vacuum, checkpoint; stops early when the assistant gets busy."""
+        con = connect(self.db_path, timeout=1.0, isolation_level=None)
+        try:
+            self.rolled += rollup_detections(con, self.chunk_rows, self._yield)
+            refresh_summaries(con, self.chunk_rows, self._yield)
+            self._prune(con)
+            self._vacuum(con)
+            con.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            self.passes += 1
+        except Busy:
+            self.interrupted += 1
+        except sqlite3.OperationalError as e:
+            # "database is locked": the live writer had it; next pass continues
+            self.interrupted += 1
+            self.last_error = str(e)
+        finally:
+            con.close()
+        return self.stats()
+
+    def _yield(self):
+        """Between chunks: give the writer a turn and bail out if no longer idle."""
+        time.sleep(0.01)
+        if self._stop_event.is_set() or not self.is_idle():
+            raise Busy()
+
+    def _prune(self, con):
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat()
+        (last_frame,) = con.execute(
+            "SELECT MAX(id) FROM frame_event WHERE captured_at_utc < ?", (cutoff,)
+        ).fetchone()
+        if last_frame is None:
+            return
+        rolled = _state(con, "rolled_detection_id")
+        # Never drop frames that are not in session_summary yet
+        last_frame = min(last_frame, _state(con, "summarized_frame_id"))
+
+        # detection / frame_event ids are plain rowids: SQLite hands out MAX(id) + 1,
+        # so the newest row of each table is never deleted (ids must not restart
+        # below the rollup / summary watermarks)
+
+        # Detections first (only rows already in detection_minute) ...
+        while True:
+            cur = con.execute(
+                """DELETE FROM detection WHERE id IN (
+                       SELECT id FROM detection WHERE id <= ? AND frame_id <= ?
+                         AND id < (SELECT MAX(id) FROM detection)
+                       ORDER BY id LIMIT ?)""",
+                (rolled, last_frame, self.chunk_rows),
+            )
+            self.pruned_detections += cur.rowcount
+            if cur.rowcount < self.chunk_rows:
+                break
+            self._yield()
+
+        # ... then frames that no longer have detections
+        while True:
+            cur = con.execute(
+                """DELETE FROM frame_event WHERE id IN (
+                       SELECT f.id FROM frame_event f
+                       WHERE f.id <= ? AND f.id < (SELECT MAX(id) FROM frame_event)
+                         AND NOT EXISTS (SELECT 1 FROM detection d WHERE d.frame_id = f.id)
+                       ORDER BY f.id LIMIT ?)""",
+                (last_frame, self.chunk_rows),
+            )
+            self.pruned_frames += cur.rowcount
+            if cur.rowcount < self.chunk_rows:
+                break
+            self._yield()
+
+    def _vacuum(self, con):
+        (mode,) = con.execute("PRAGMA auto_vacuum").fetchone()
+        if mode != 2:
+            return  # not INCREMENTAL: see enable_incremental_vacuum()
+        while True:
+            (free,) = con.execute("PRAGMA freelist_count").fetchone()
+            if not free:
+                return
+            pages = min(free, self.vacuum_pages)
+            # execute() would stop after the first step (one page); executescript runs it to the end
+            con.executescript(f"PRAGMA incremental_vacuum({pages});")
+            self.vacuumed_pages += pages
+            self._yield()
+
+
+def enable_incremental_vacuum(db_path: str = DB_PATH):
+    """
+    Switch an existing database to auto_vacuum = INCREMENTAL. Needs a full
+    VACUUM (rewrites the file), so run it while the assistant is stopped.
+    """
+    con = connect(db_path, isolation_level=None)
+    try:
+        con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        con.execute("VACUUM")
+    finally:
+        con.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One maintenance pass over the edge database")
+    parser.add_argument("--db", default=DB_PATH, help="database file")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="convert the file to auto_vacuum=INCREMENTAL first (full VACUUM)")
+    args = parser.parse_args(argv)
+
+    # Make sure the rollup tables exist (VADatabase creates them on first use)
+    from va_db import VADatabase
+    VADatabase(args.db, write_behind=False)
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+    print(DatabaseMaintenance(args.db).run_once())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -16,8 +16,12 @@
    5. spoken_message → Text generated to describe detections
    6. audio_event    → Audio playback result
    7. app_error      → Centralized error log
+   8. latency_summary → Periodic per-stage latency percentiles
+   9. detection_minute → Per-minute, per-label rollup of detection
+  10. session_summary / session_detect_ms → Per-session report totals
    ============================================================ */
 
+PRAGMA auto_vacuum  = INCREMENTAL;   -- only effective before the first table is created
 PRAGMA journal_mode = WAL;
 PRAGMA synchronous  = NORMAL;
 PRAGMA foreign_keys = ON;
@@ -45,7 +49,9 @@ CREATE TABLE IF NOT EXISTS run_session (
   app_version    TEXT NOT NULL,   -- e.g., "1.0.0"
   model_id       INTEGER REFERENCES model(id)
                      ON UPDATE CASCADE ON DELETE SET NULL,
-  device_notes   TEXT             -- e.g., "Pi5, Cam OK, Speaker OK"
+  device_notes   TEXT,            -- e.g., "Pi5, Cam OK, Speaker OK"
+  startup_ms     INTEGER,         -- process start to ready (imports + startup phase)
+  startup_phases TEXT             -- JSON: per-phase ms (imports, db, model, camera, tts, total)
 );
 
 /* -----------------------------------------------
@@ -58,6 +64,7 @@ CREATE TABLE IF NOT EXISTS frame_event (
   captured_at_utc TEXT    NOT NULL,
   detect_ms       INTEGER NOT NULL,       -- inference time
   objects_found   INTEGER DEFAULT 0,      -- count of detections
+  capture_path    TEXT,                   -- archived JPEG (NULL if not saved or evicted)
   UNIQUE(session_id, frame_number)
 );
 CREATE INDEX IF NOT EXISTS ix_frame_event_time
@@ -75,7 +82,8 @@ CREATE TABLE IF NOT EXISTS detection (
   box_x          INTEGER,
   box_y          INTEGER,
   box_w          INTEGER,
-  box_h          INTEGER
+  box_h          INTEGER,
+  track_id       INTEGER             -- stable per-object id from the tracker (NULL = untracked)
 );
 CREATE INDEX IF NOT EXISTS ix_detection_frame
   ON detection(frame_id);
@@ -95,6 +103,8 @@ CREATE TABLE IF NOT EXISTS spoken_message (
 );
 CREATE INDEX IF NOT EXISTS ix_message_time
   ON spoken_message(session_id, created_at_utc);
+CREATE INDEX IF NOT EXISTS ix_message_frame
+  ON spoken_message(frame_id);          -- frame pruning (ON DELETE SET NULL)
 
 /* -----------------------------------------------
    6) SPEAK → Audio playback outcome
@@ -107,10 +117,17 @@ CREATE TABLE IF NOT EXISTS audio_event (
   ended_at_utc   TEXT,
   was_successful INTEGER NOT NULL DEFAULT 1 CHECK(was_successful IN (0,1)),
   error_text     TEXT,                   -- only if failed
-  output_device  TEXT                    -- e.g., "USB Speaker"
+  output_device  TEXT,                   -- e.g., "USB Speaker"
+  queue_ms       INTEGER,                -- time the announcement waited before playback
+  dropped_count  INTEGER,                -- announcements dropped while it waited
+  was_preempted  INTEGER NOT NULL DEFAULT 0 CHECK(was_preempted IN (0,1)),
+  first_audio_ms INTEGER                 -- speak() start to the first audio handed to the sink
 );
 CREATE INDEX IF NOT EXISTS ix_audio_event_time
   ON audio_event(session_id, started_at_utc);
+-- Covering index: per-session TTS outcome counts without touching the table
+CREATE INDEX IF NOT EXISTS ix_audio_event_outcome
+  ON audio_event(session_id, was_successful, was_preempted, queue_ms);
 
 /* --------------------------------------------
    7) SUPPORT → Error log for any component
@@ -129,6 +146,72 @@ CREATE INDEX IF NOT EXISTS ix_error_time
 CREATE INDEX IF NOT EXISTS ix_error_severity
   ON app_error(severity);
 
+/* --------------------------------------------
+   8) SUPPORT → Per-stage latency, one row per stage per window
+   -------------------------------------------- */
+CREATE TABLE IF NOT EXISTS latency_summary (
+  id             INTEGER PRIMARY KEY,
+  session_id     INTEGER NOT NULL REFERENCES run_session(id) ON DELETE CASCADE,
+  created_at_utc TEXT    NOT NULL,
+  window_s       REAL    NOT NULL,   -- length of the measurement window
+  stage          TEXT    NOT NULL,   -- "detect","persist","tts_play",...
+  sample_count   INTEGER NOT NULL,
+  mean_ms        REAL,
+  p50_ms         REAL,
+  p95_ms         REAL,
+  p99_ms         REAL,
+  max_ms         REAL
+);
+CREATE INDEX IF NOT EXISTS ix_latency_summary_time
+  ON latency_summary(session_id, created_at_utc);
+
+/* --------------------------------------------
+   9) MAINTENANCE → Per-minute rollup of detection (kept after raw rows are pruned)
+   -------------------------------------------- */
+CREATE TABLE IF NOT EXISTS detection_minute (
+  session_id   INTEGER NOT NULL REFERENCES run_session(id) ON DELETE CASCADE,
+  minute_utc   TEXT    NOT NULL,   -- "YYYY-MM-DDTHH:MM" of frame_event.captured_at_utc
+  object_label TEXT    NOT NULL,
+  detections   INTEGER NOT NULL,
+  conf_sum     REAL    NOT NULL,   -- mean confidence = conf_sum / detections
+  conf_max     REAL    NOT NULL,
+  PRIMARY KEY(session_id, minute_utc, object_label)
+) WITHOUT ROWID;
+
+-- Progress of db_maintenance.py (last detection.id already rolled up)
+CREATE TABLE IF NOT EXISTS maintenance_state (
+  name  TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO maintenance_state(name, value) VALUES ('rolled_detection_id', 0);
+INSERT OR IGNORE INTO maintenance_state(name, value) VALUES ('summarized_frame_id', 0);
+
+/* --------------------------------------------
+   10) REPORTS → Per-session totals, maintained incrementally
+       (db_maintenance.refresh_summaries: at end_session, by the maintenance
+        pass, or with report.py --refresh) and kept after raw rows are pruned
+   -------------------------------------------- */
+CREATE TABLE IF NOT EXISTS session_summary (
+  session_id      INTEGER PRIMARY KEY REFERENCES run_session(id) ON DELETE CASCADE,
+  frames          INTEGER NOT NULL DEFAULT 0,
+  objects         INTEGER NOT NULL DEFAULT 0,
+  detect_ms_sum   INTEGER NOT NULL DEFAULT 0,
+  detect_ms_max   INTEGER NOT NULL DEFAULT 0,
+  audio_events    INTEGER NOT NULL DEFAULT 0,
+  audio_failures  INTEGER NOT NULL DEFAULT 0,
+  audio_preempted INTEGER NOT NULL DEFAULT 0,
+  queue_ms_sum    INTEGER NOT NULL DEFAULT 0,
+  updated_at_utc  TEXT
+);
+
+-- detect_ms histogram (exact percentiles: detect_ms is an integer)
+CREATE TABLE IF NOT EXISTS session_detect_ms (
+  session_id INTEGER NOT NULL REFERENCES run_session(id) ON DELETE CASCADE,
+  detect_ms  INTEGER NOT NULL,
+  frames     INTEGER NOT NULL,
+  PRIMARY KEY(session_id, detect_ms)
+) WITHOUT ROWID;
+
 /* -----------------------------------
    Seed: minimal model metadata, to test the db.
    ----------------------------------- */
@@ -6,18 +6,25 @@ class DedupeSpeaker:
     """
     Controls how often detected labels are allowed to be spoken,
     preventing excessive repetition through count limits and cooldowns.
+
+    When a track id is given, rules apply per tracked object instead of per
+    label, so a second person is announced even if "person" was just spoken.
     """
 
     def __init__(self):
-        # Track how many times each label was spoken and the last time it occurred
-        self.state = {}  # label -> {"count": int, "last": float}
+        # Track how many times each label/object was spoken and the last time it occurred
+        self.state = {}  # label or (label, track_id) -> {"count": int, "last": float}
+
+    @staticmethod
+    def _key(label: str, track_id):
+        return label if track_id is None else (label, track_id)
 
-    def should_speak(self, label: str, current_labels: set) -> bool:
+    def should_speak(self, label: str, current_labels: set, track_id=None) -> bool:
         """
         Determine whether a label should be spoken based on repetition rules.
         """
         now = time.time()
-        s = self.state.get(label, {"count": 0, "last": 0})
+        s = self.state.get(self._key(label, track_id), {"count": 0, "last": 0})
 
         # Block speech if the label exceeded repeat limit and is still in cooldown
         if s["count"] >= MAX_REPEAT and (now - s["last"]) < COOLDOWN_SECONDS:
@@ -28,12 +35,20 @@ class DedupeSpeaker:
 
         return True
 
-    def mark_spoken(self, label: str):
+    def mark_spoken(self, label: str, track_id=None):
         """
         Update internal state after a label has been spoken.
         """
         now = time.time()
-        s = self.state.get(label, {"count": 0, "last": 0})
+        key = self._key(label, track_id)
+        s = self.state.get(key, {"count": 0, "last": 0})
         s["count"] += 1
         s["last"] = now
-        self.state[label] = s
+        self.state[key] = s
+
+        # Per-object entries accumulate; forget the ones whose cooldown is over
+        if track_id is not None:
+            self.state = {
+                k: v for k, v in self.state.items()
+                if not isinstance(k, tuple) or (now - v["last"]) < COOLDOWN_SECONDS
+            }
@@ -0,0 +1,206 @@
+"""
+Local event feed: the assistant publishes detection / speech / error events
+on a Unix socket, observers subscribe and receive them as they happen.
+
+Wire format: one JSON object per line, e.g.
+    {"type": "detection", "seq": 17, "ts": 1712345678.9, "frame_id": 42, "objects": [...]}
+
+`seq` increases by one per published event, so a subscriber can tell when it
+missed events (slow subscribers are disconnected rather than slowing the
+assistant down).
+"""
+import json
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+
+from config import EVENT_SOCKET_PATH, EVENT_BUS_MAX_BUFFER_KB
+
+_STOP = object()
+
+
+class EventBus(threading.Thread):
+    """
+    Unix-socket publisher. publish() only enqueues; this thread accepts
+    subscribers and writes to them with non-blocking sends.
+    """
+
+    def __init__(self, path: str = EVENT_SOCKET_PATH, max_buffer_kb: int = EVENT_BUS_MAX_BUFFER_KB):
+        super().__init__(name="event-bus", daemon=True)
+        self.path = path
+        self.max_buffer = max_buffer_kb * 1024
+        self.published = 0
+        self.dropped_subscribers = 0
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._subs = {}                   # socket -> pending bytearray
+
+        # A stale socket file from a crashed run would make bind() fail
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        self._server.listen(8)
+        self._server.setblocking(False)
+
+        # publish() wakes the selector through this pair
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self._server, selectors.EVENT_READ, "accept")
+        self._sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subs)
+
+    def publish(self, kind: str, payload: dict):
+        """Queue an event for every subscriber (never blocks)."""
+        with self._seq_lock:
+            self._seq += 1
+            seq = self._seq
+        self._queue.put({"type": kind, "seq": seq, "ts": time.time(), **payload})
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass   # a wake-up is already pending
+
+    def close(self):
+        self._queue.put(_STOP)
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass
+        self.join(timeout=2)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subs),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+    # ---------------- bus thread ----------------
+
+    def run(self):
+        try:
+            while True:
+                for key, events in self._sel.select():
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        try:
+                            while self._wake_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    elif events & selectors.EVENT_READ:
+                        self._check_closed(key.fileobj)
+                    if key.data == "sub" and key.fileobj in self._subs and events & selectors.EVENT_WRITE:
+                        self._send(key.fileobj)
+
+                if not self._drain():
+                    return
+        finally:
+            self._shutdown()
+
+    def _accept(self):
+        try:
+            conn, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self._subs[conn] = bytearray()
+        self._sel.register(conn, selectors.EVENT_READ, "sub")
+
+    def _drain(self) -> bool:
+        """Move queued events into subscriber buffers; False once stopped."""
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return True
+            if event is _STOP:
+                return False
+            self.published += 1
+            if not self._subs:
+                continue
+            line = (json.dumps(event, separators=(",", ":")) + "\n").encode()
+            for conn in list(self._subs):
+                buf = self._subs[conn]
+                buf += line
+                if len(buf) > self.max_buffer:
+                    self._drop(conn)   # subscriber cannot keep up
+                else:
+                    self._send(conn)
+
+    def _send(self, conn):
+        buf = self._subs[conn]
+        try:
+            sent = conn.send(buf)
+            del buf[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(conn)
+            return
+        # Only ask for writability while data is pending
+        mask = selectors.EVENT_READ | (selectors.EVENT_WRITE if buf else 0)
+        self._sel.modify(conn, mask, "sub")
+
+    def _check_closed(self, conn):
+        try:
+            if not conn.recv(4096):
+                self._drop(conn, counted=False)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(conn, counted=False)
+
+    def _drop(self, conn, counted: bool = True):
+        self._subs.pop(conn, None)
+        try:
+            self._sel.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+        if counted:
+            self.dropped_subscribers += 1
+
+    def _shutdown(self):
+        for conn in list(self._subs):
+            self._drop(conn, counted=False)
+        self._sel.close()
+        self._server.close()
+        self._wake_r.close()
+        self._wake_w.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def subscribe(path: str = EVENT_SOCKET_PATH):
+    """
+    Connect to a running EventBus and return an iterator of events (dicts)
+    that ends when the publisher goes away. Raises OSError if nothing is listening.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return _read_events(sock)
+
+
+def _read_events(sock):
+    with sock, sock.makefile("rb") as stream:
+        for line in stream:
+            yield json.loads(line)
@@ -0,0 +1,326 @@
+"""
+Frame sources: where the assistant gets its frames from.
+
+Every source exposes the same interface as camera.FrameRing:
+
+    source.start()
+    frame = source.acquire(after_seq, timeout)   # newest frame with seq > after_seq
+    ... frame.seq, frame.timestamp, frame.array ...
+    frame.release()
+    source.stop()
+
+Sources:
+    PicameraSource   -> live Raspberry Pi camera (camera.FrameRing)
+    ImageDirSource   -> directory of .jpg/.png/.npy files
+    VideoFileSource  -> any video OpenCV can decode
+    RecordingSource  -> memory-mapped recording written by FrameRecorder
+
+File-based sources replay either at maximum speed (every frame, in order)
+or in real time (paced by the recorded timestamps, newest frame wins).
+"""
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import FRAME_WIDTH, FRAME_HEIGHT
+
+# Recording layout: fixed header, then frames back to back with a fixed stride.
+# Timestamps (float64 seconds) live in a sidecar "<path>.idx" file.
+RECORDING_MAGIC = b"VAFRAME1"
+_HEADER = struct.Struct("<8sIIII")     # magic, version, height, width, channels
+HEADER_SIZE = 64
+RECORDING_VERSION = 1
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class SourceFrame:
+    """Frame handed out by file-based sources (release() is a no-op)."""
+
+    __slots__ = ("seq", "timestamp", "array")
+
+    def __init__(self, seq: int, timestamp: float, array):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.array = array
+
+    def downscaled(self, step: int):
+        return self.array[::step, ::step]
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FrameSource:
+    """Base class for sequential, file-backed sources."""
+
+    def __init__(self, realtime: bool = False):
+        self.realtime = realtime
+        self.finished = False
+        self.delivered = 0
+        self.dropped = 0
+        self.wait_s = 0.0
+        self._t0 = None
+        self._last_index = -1
+
+    # Implemented by subclasses
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _load(self, index: int):
+        raise NotImplementedError
+
+    def _timestamp(self, index: int) -> float:
+        return float(index)
+
+    def start(self):
+        self._t0 = time.monotonic()
+
+    def stop(self):
+        self.finished = True
+
+    def acquire(self, after_seq: int = 0, timeout: float | None = None) -> SourceFrame | None:
+        if self._t0 is None:
+            self.start()
+        n = len(self)
+        index = max(after_seq, self._last_index + 1)   # seq = index + 1
+        if index >= n:
+            self.finished = True
+            return None
+
+        if self.realtime:
+            # Sleep until frame `index` is due, then jump to the newest due frame
+            base = self._timestamp(0)
+            due = self._t0 + (self._timestamp(index) - base)
+            wait = due - time.monotonic()
+            if wait > 0:
+                if timeout is not None and wait > timeout:
+                    time.sleep(timeout)
+                    self.wait_s += timeout
+                    return None
+                time.sleep(wait)
+                self.wait_s += wait
+            elapsed = time.monotonic() - self._t0
+            while index + 1 < n and self._timestamp(index + 1) - base <= elapsed:
+                index += 1
+                self.dropped += 1
+
+        self._last_index = index
+        self.delivered += 1
+        return SourceFrame(index + 1, self._timestamp(index), self._load(index))
+
+    def depth(self) -> int:
+        """Frames not delivered yet (paced replay: only those already due)."""
+        n = len(self)
+        first = self._last_index + 1
+        if not self.realtime:
+            return max(0, n - first)
+        if self._t0 is None:
+            return 0
+        base, elapsed = self._timestamp(0), time.monotonic() - self._t0
+        due = first
+        while due < n and self._timestamp(due) - base <= elapsed:
+            due += 1
+        return due - first
+
+    def stats(self) -> dict:
+        return {
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "wait_s": round(self.wait_s, 3),
+            "finished": self.finished,
+        }
+
+
+class ImageDirSource(FrameSource):
+    """Images (or .npy arrays) in name order, nominally `fps` frames per second."""
+
+    def __init__(self, path: str, realtime: bool = False, fps: float = 30.0):
+        super().__init__(realtime)
+        self.path = path
+        self.fps = fps
+        self.names = sorted(f for f in os.listdir(path) if f.lower().endswith(_IMAGE_EXTS + (".npy",)))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _timestamp(self, index: int) -> float:
+        return index / self.fps
+
+    def _load(self, index: int):
+        full = os.path.join(self.path, self.names[index])
+        if full.endswith(".npy"):
+            return np.load(full)
+        from PIL import Image
+        # PIL decodes RGB; the camera delivers BGR-ordered "RGB888"
+        return np.ascontiguousarray(np.asarray(Image.open(full).convert("RGB"))[..., ::-1])
+
+
+class VideoFileSource(FrameSource):
+    """Video decoded sequentially with OpenCV (frames come out BGR, like the camera)."""
+
+    def __init__(self, path: str, realtime: bool = False):
+        import cv2
+
+        super().__init__(realtime)
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise OSError(f"Cannot open video: {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # Streams report no frame count; read until the decoder runs dry
+        self.count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 2 ** 31
+        self._pos = 0
+
+    def __len__(self):
+        return self.count
+
+    def _timestamp(self, index: int) -> float:
+        return index / self.fps
+
+    def _load(self, index: int):
+        # Decode forward only (skipped frames are grabbed, not decoded)
+        while self._pos < index:
+            self.cap.grab()
+            self._pos += 1
+        ok, frame = self.cap.read()
+        self._pos += 1
+        if not ok:
+            self.finished = True
+            self.count = index
+            raise EOFError("End of video")
+        return frame
+
+    def acquire(self, after_seq: int = 0, timeout: float | None = None):
+        try:
+            return super().acquire(after_seq, timeout)
+        except EOFError:
+            return None
+
+    def stop(self):
+        super().stop()
+        self.cap.release()
+
+
+class RecordingSource(FrameSource):
+    """Replay of a FrameRecorder file; frames are read straight from the memory map."""
+
+    def __init__(self, path: str, realtime: bool = False):
+        super().__init__(realtime)
+        with open(path, "rb") as f:
+            magic, version, height, width, channels = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"Not a frame recording: {path}")
+
+        stride = height * width * channels
+        count = (os.path.getsize(path) - HEADER_SIZE) // stride
+        self.timestamps = np.fromfile(f"{path}.idx", dtype=np.float64) if os.path.exists(f"{path}.idx") else None
+        if self.timestamps is not None:
+            count = min(count, len(self.timestamps))
+
+        if count:
+            self.frames = np.memmap(path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                    shape=(count, height, width, channels))
+        else:
+            self.frames = np.empty((0, height, width, channels), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _timestamp(self, index: int) -> float:
+        if self.timestamps is None:
+            return float(index)
+        return float(self.timestamps[index])
+
+    def _load(self, index: int):
+        return self.frames[index]   # view into the mapping, no decode or copy
+
+
+class FrameRecorder:
+    """
+    Append frames to a fixed-stride recording (see RecordingSource).
+    Frames are written from their own buffer (no intermediate copy).
+    """
+
+    def __init__(self, path: str, height: int = FRAME_HEIGHT, width: int = FRAME_WIDTH, channels: int = 3):
+        self.path = path
+        self.shape = (height, width, channels)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._data = open(path, "wb")
+        self._index = open(f"{path}.idx", "wb")
+
+        header = _HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, height, width, channels)
+        self._data.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def write(self, frame, timestamp: float):
+        if frame.shape != self.shape or frame.dtype != np.uint8:
+            raise ValueError(f"Frame shape {frame.shape} does not match recording {self.shape}")
+        with self._lock:
+            self._data.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+            self._index.write(struct.pack("<d", timestamp))
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+
+
+class PicameraSource:
+    """Live camera: Picamera2 feeding camera.FrameRing."""
+
+    def __init__(self):
+        from camera import open_camera, FrameRing
+
+        self.picam2 = open_camera()
+        self.ring = FrameRing(self.picam2)
+        self.finished = False
+
+    def start(self):
+        self.ring.start()
+
+    def acquire(self, after_seq: int = 0, timeout: float | None = None):
+        return self.ring.acquire(after_seq, timeout)
+
+    def stop(self):
+        self.ring.stop()
+        try:
+            self.picam2.stop()
+        except Exception:
+            pass
+
+    @property
+    def dropped(self) -> int:
+        return self.ring.dropped
+
+    def depth(self) -> int:
+        return self.ring.depth()
+
+    def stats(self) -> dict:
+        return self.ring.stats()
+
+
+def open_source(spec: str = "picamera", realtime: bool = True):
+    """
+    Build a frame source from a spec:
+        "picamera"           -> live camera
+        "<dir>"              -> image directory
+        "<file>.vafr"        -> FrameRecorder recording
+        "<file>.mp4|.avi..." -> video file
+    """
+    if spec == "picamera":
+        return PicameraSource()
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, realtime=realtime)
+    if spec.endswith(".vafr"):
+        return RecordingSource(spec, realtime=realtime)
+    return VideoFileSource(spec, realtime=realtime)
@@ -1,6 +1,14 @@
 # app.py
+import sys
+from pathlib import Path
+
+# --- raíz del proyecto en el PYTHONPATH (db_access.py y config.py compartidos) ---
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+# ---------------------------------------------------------------------------------
+
 from va_ui.main_window import run_app
 
 if __name__ == "__main__":
     run_app()
-
@@ -1,6 +1,6 @@
+import os
 import sys
 import time
-import sqlite3
 from pathlib import Path
 
 # --- add project root to PYTHONPATH ---
@@ -8,45 +8,152 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(PROJECT_ROOT))
 # -------------------------------------
 
-from config import DB_PATH
+from config import DB_PATH, EVENT_SOCKET_PATH, OBSERVER_POLL_SECONDS, OBSERVER_BACKLOG_ROWS
+from db_access import connect
+from event_bus import subscribe
+
+
+def print_event(event):
+    kind = event["type"]
+    if kind == "detection":
+        for obj in event["objects"]:
+            print(f"[DETECTION] frame={event['frame_id']} label={obj['label']} "
+                  f"conf={obj['conf']} track={obj['track_id']}")
+    elif kind == "speech":
+        print(f"[SPOKEN] id={event['message_id']} text={event['text']}")
+    elif kind == "error":
+        print(f"[ERROR] {event['component']}: {event['message']} {event.get('details') or ''}")
+
+
+class DatabaseFeed:
+    """
+    Fallback when the assistant's event socket is not available: one
+    persistent read-only connection, re-queried only when PRAGMA data_version
+    says another connection committed. The first poll() replays only the
+    newest `backlog_rows` rows of each table.
+    """
+
+    def __init__(self, db_path=DB_PATH, backlog_rows: int = OBSERVER_BACKLOG_ROWS):
+        self.con = connect(db_path, readonly=True)
+        self.data_version = None
+        self.last_det_id = self._backlog_start("detection", backlog_rows)
+        self.last_msg_id = self._backlog_start("spoken_message", backlog_rows)
+        self.last_err_id = self._backlog_start("app_error", backlog_rows)
+        self.last_frame_id = 0   # newest frame printed from the database
+
+    def _backlog_start(self, table: str, rows: int) -> int:
+        """Id just before the newest `rows` rows of `table`."""
+        if rows <= 0:
+            sql = f"SELECT COALESCE(MAX(id), 0) FROM {table}"
+            return self.con.execute(sql).fetchone()[0]
+        sql = f"SELECT COALESCE(MIN(id) - 1, 0) FROM (SELECT id FROM {table} ORDER BY id DESC LIMIT ?)"
+        return self.con.execute(sql, (rows,)).fetchone()[0]
+
+    def close(self):
+        self.con.close()
+
+    def resume_after(self, frame_id, message_id):
+        """Continue after the last events already seen on the socket."""
+        if frame_id is not None:
+            (det_id,) = self.con.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM detection WHERE frame_id <= ?", (frame_id,)
+            ).fetchone()
+            self.last_det_id = max(self.last_det_id, det_id)
+        if message_id is not None:
+            self.last_msg_id = max(self.last_msg_id, message_id)
+        (err_id,) = self.con.execute("SELECT COALESCE(MAX(id), 0) FROM app_error").fetchone()
+        self.last_err_id = max(self.last_err_id, err_id)
+
+    def poll(self) -> int:
+        """Print everything committed since the last call; returns the row count."""
+        (version,) = self.con.execute("PRAGMA data_version").fetchone()
+        if version == self.data_version:
+            return 0
+        self.data_version = version
+
+        count = 0
+        for rid, frame_id, label, conf, track_id in self.con.execute(
+            "SELECT id, frame_id, object_label, confidence_0_1, track_id "
+            "FROM detection WHERE id > ? ORDER BY id", (self.last_det_id,)
+        ):
+            print(f"[DETECTION] frame={frame_id} label={label} conf={conf} track={track_id}")
+            self.last_det_id = rid
+            self.last_frame_id = max(self.last_frame_id, frame_id)
+            count += 1
+
+        for rid, text, lang in self.con.execute(
+            "SELECT id, text_content, language_code "
+            "FROM spoken_message WHERE id > ? ORDER BY id", (self.last_msg_id,)
+        ):
+            print(f"[SPOKEN] id={rid} lang={lang} text={text}")
+            self.last_msg_id = rid
+            count += 1
+
+        for rid, component, short, details in self.con.execute(
+            "SELECT id, component_name, short_message, long_details "
+            "FROM app_error WHERE id > ? ORDER BY id", (self.last_err_id,)
+        ):
+            print(f"[ERROR] {component}: {short} {details or ''}")
+            self.last_err_id = rid
+            count += 1
+        return count
+
+
+def _already_printed(event, frame_id: int, message_id: int) -> bool:
+    """True for socket events the database catch-up has printed already."""
+    if event["type"] == "detection":
+        return event["frame_id"] is not None and event["frame_id"] <= frame_id
+    if event["type"] == "speech":
+        return event["message_id"] is not None and event["message_id"] <= message_id
+    return False
+
+
+def follow_socket(feed) -> bool:
+    """Print live events until the publisher goes away (or drops us)."""
+    try:
+        events = subscribe(EVENT_SOCKET_PATH)
+    except OSError:
+        return False   # stale socket file: nobody is publishing
+
+    print(f"[observer] following {EVENT_SOCKET_PATH}")
+    # Subscribed first, then caught up from the database: events published
+    # meanwhile are buffered on the socket, and those already printed from
+    # the database are skipped below
+    feed.poll()
+    seen_frame_id, seen_msg_id = feed.last_frame_id, feed.last_msg_id
+    last_frame_id = None
+    last_msg_id = None
+    try:
+        for event in events:
+            if _already_printed(event, seen_frame_id, seen_msg_id):
+                continue
+            print_event(event)
+            if event["type"] == "detection" and event["frame_id"] is not None:
+                last_frame_id = event["frame_id"]
+            elif event["type"] == "speech" and event["message_id"] is not None:
+                last_msg_id = event["message_id"]
+    except OSError:
+        pass
+    finally:
+        feed.resume_after(last_frame_id, last_msg_id)
+    return True
 
 
 def main():
     print(f"[observer] using DB_PATH={DB_PATH}")
-    last_det_id = 0
-    last_msg_id = 0
-
-    while True:
-        con = sqlite3.connect(DB_PATH, timeout=30)
-        try:
-            cur = con.cursor()
-
-            cur.execute(
-                "SELECT id, object_label, confidence_0_1 "
-                "FROM detection WHERE id > ? ORDER BY id ASC LIMIT 20",
-                (last_det_id,)
-            )
-            rows = cur.fetchall()
-            for rid, label, conf in rows:
-                print(f"[DETECTION] id={rid} label={label} conf={conf}")
-                last_det_id = max(last_det_id, rid)
-
-            cur.execute(
-                "SELECT id, text_content, language_code "
-                "FROM spoken_message WHERE id > ? ORDER BY id ASC LIMIT 20",
-                (last_msg_id,)
-            )
-            rows = cur.fetchall()
-            for rid, text, lang in rows:
-                print(f"[SPOKEN] id={rid} lang={lang} text={text}")
-                last_msg_id = max(last_msg_id, rid)
-
-        finally:
-            con.close()
-
-        time.sleep(1.0)
+    feed = DatabaseFeed()
+    try:
+        # Recent backlog and live events (follow_socket catches up itself)
+        while True:
+            if os.path.exists(EVENT_SOCKET_PATH) and follow_socket(feed):
+                print("[observer] event socket closed, following the database")
+            feed.poll()
+            time.sleep(OBSERVER_POLL_SECONDS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
 
 
 if __name__ == "__main__":
     main()
-
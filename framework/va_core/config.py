@@ -1,11 +1,24 @@
 # va_core/config.py
+import os
 from pathlib import Path
 
-# Ruta a la base de datos SQLite (la que generaste con VAv1_DB_SQLitev3.sql)
+# Ruta a la base de datos SQLite (la que generaste con VAv1_DB_SQLitev3.sql).
+# Archivo propio, no el de main.py: el escritor write-behind de va_db asigna
+# los ids desde MAX(id) y debe ser el único proceso que inserta en su base.
 BASE_DIR = Path(__file__).resolve().parent.parent
-DB_PATH = BASE_DIR / "visual_assistant_v1.db"
+DB_PATH = Path(os.getenv("VA_FRAMEWORK_DB_PATH", str(BASE_DIR / "visual_assistant_v1.db")))
 
 APP_VERSION = "1.0.0"
-DEFAULT_MODEL_ID = 1      # Asumimos que el modelo YOLOv8-nano tiene id=1 en la tabla model
+# Asumimos que el modelo YOLOv8-nano tiene id=1 en la tabla model. La fila debe
+# existir (VAv1_DB_SQLitev3.sql la crea): db_access activa foreign_keys=ON y
+# run_session.model_id la referencia. Usar None si la tabla model está vacía.
+DEFAULT_MODEL_ID = 1
 DEVICE_NOTES = "Dev laptop demo / Raspberry Pi target"
 
+# Bucle principal (va_services/runtime.py): corre en un hilo de trabajo, no en Tk
+MAIN_LOOP_INTERVAL_MS = 1000   # periodo entre ciclos; admite valores de pocos ms
+UPDATE_QUEUE_MAXSIZE = 1000    # cola hilo -> UI; si se llena se descartan los más viejos
+
+# UI: cada cuánto vacía la cola y cuántos mensajes como máximo por pasada
+UI_POLL_MS = 50
+UI_BATCH_MAX = 200
@@ -1,22 +1,29 @@
 # va_core/db.py
-import sqlite3
 from pathlib import Path
-from datetime import datetime, timezone
 from typing import Optional
 
+from db_access import DataAccess, utc_iso, SQL_INSERT_SESSION, SQL_END_SESSION
+
 from .config import DB_PATH
 from .logging_config import get_logger
 
 logger = get_logger(__name__)
 
 class Database:
-    """Pequeño wrapper para la base de datos Visual Assistant V1 (SQLite 3)."""
+    """
+    Pequeño wrapper para la base de datos Visual Assistant V1 (SQLite 3).
+
+    Usa la capa compartida db_access (la misma que va_db.VADatabase): una
+    conexión persistente por hilo, los mismos PRAGMAs y las mismas sentencias.
+    """
 
     def __init__(self, db_path: Path | str = DB_PATH) -> None:
         self.db_path = Path(db_path)
+        self._dal = DataAccess(self.db_path)
 
-    def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+    def close(self) -> None:
+        """Cierra las conexiones abiertas por cada hilo."""
+        self._dal.close()
 
     # ========== RUN_SESSION ==========
 
@@ -27,41 +34,16 @@ class Database:
         device_notes: Optional[str] = None,
     ) -> int:
         """Crea un registro en run_session cuando el asistente se inicia."""
-        conn = self._connect()
-        try:
-            cur = conn.cursor()
-            now_utc = datetime.now(timezone.utc).isoformat()
-
-            cur.execute(
-                """
-                INSERT INTO run_session(
-                    start_time_utc, app_version, model_id, device_notes
-                )
-                VALUES (?, ?, ?, ?)
-                """,
-                (now_utc, app_version, model_id, device_notes),
-            )
-            session_id = cur.lastrowid
-            conn.commit()
-            logger.info("Nueva run_session creada con id=%s", session_id)
-            return session_id
-        finally:
-            conn.close()
+        session_id = self._dal.insert(
+            SQL_INSERT_SESSION, (None, utc_iso(), app_version, model_id, device_notes)
+        )
+        logger.info("Nueva run_session creada con id=%s", session_id)
+        return session_id
 
     def finish_run_session(self, session_id: int) -> None:
         """Marca el fin de una run_session."""
-        conn = self._connect()
-        try:
-            cur = conn.cursor()
-            now_utc = datetime.now(timezone.utc).isoformat()
-            cur.execute(
-                "UPDATE run_session SET end_time_utc=? WHERE id=?",
-                (now_utc, session_id),
-            )
-            conn.commit()
-            logger.info("run_session id=%s finalizada", session_id)
-        finally:
-            conn.close()
+        self._dal.execute(SQL_END_SESSION, (utc_iso(), session_id))
+        logger.info("run_session id=%s finalizada", session_id)
 
     # ========== FRAME_EVENT ==========
 
@@ -71,35 +53,23 @@ class Database:
         frame_number: int,
         detect_ms: int,
         objects_found: int,
+        detections: list = (),
     ) -> int:
         """
-        Inserta un frame_event mínimo, enlazado con la sesión.
-        Tabla según VAv1_DB_SQLitev3.sql:
+        Inserta un frame_event, enlazado con la sesión, y sus detecciones en la
+        misma transacción. Tabla según VAv1_DB_SQLitev3.sql:
           id, session_id, frame_number, captured_at_utc, detect_ms, objects_found
+        `detections`: filas (session_id, object_label, confidence_0_1,
+        box_x, box_y, box_w, box_h, track_id), sin frame_id.
         """
-        conn = self._connect()
-        try:
-            cur = conn.cursor()
-            now_utc = datetime.now(timezone.utc).isoformat()
-            cur.execute(
-                """
-                INSERT INTO frame_event(
-                    session_id, frame_number, captured_at_utc, detect_ms, objects_found
-                )
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (session_id, frame_number, now_utc, detect_ms, objects_found),
-            )
-            frame_id = cur.lastrowid
-            conn.commit()
-            logger.debug(
-                "frame_event insertado (session_id=%s, frame_number=%s, id=%s)",
-                session_id,
-                frame_number,
-                frame_id,
-            )
-            return frame_id
-        finally:
-            conn.close()
-
-
+        frame_id = self._dal.insert_frame(
+            (None, session_id, frame_number, utc_iso(), detect_ms, objects_found),
+            list(detections),
+        )
+        logger.debug(
+            "frame_event insertado (session_id=%s, frame_number=%s, id=%s)",
+            session_id,
+            frame_number,
+            frame_id,
+        )
+        return frame_id
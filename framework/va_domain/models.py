@@ -28,3 +28,16 @@ class FrameEvent:
     detect_ms: int
     objects_found: int
 
+@dataclass
+class StatusUpdate:
+    """Cambio de estado del asistente publicado por el hilo de trabajo."""
+    is_running: bool
+    session_id: Optional[int]
+    message: str = ""
+
+@dataclass
+class CycleResult:
+    """Resultado de un ciclo (un frame procesado)."""
+    frame_number: int
+    frame_id: Optional[int]
+    cycle_ms: float
@@ -1,9 +1,14 @@
-# va_services/runtime.py
+import queue
+import threading
+import time
 from typing import Optional
 
 from va_core.db import Database
-from va_core.config import APP_VERSION, DEFAULT_MODEL_ID, DEVICE_NOTES
+from va_core.config import (
+    APP_VERSION, DEFAULT_MODEL_ID, DEVICE_NOTES, MAIN_LOOP_INTERVAL_MS, UPDATE_QUEUE_MAXSIZE
+)
 from va_core.logging_config import get_logger
+from va_domain.models import StatusUpdate, CycleResult
 
 logger = get_logger(__name__)
 
@@ -13,42 +18,109 @@ class VisualAssistantApplication:
     - start()
     - stop()
     - runSingleCycle()
+
+    Los ciclos corren en un hilo de trabajo propio; start() y stop() no
+    bloquean. Los resultados (StatusUpdate / CycleResult) se publican en
+    `updates`, una cola thread-safe que la UI vacía por lotes.
     """
 
-    def __init__(self, db: Optional[Database] = None) -> None:
+    def __init__(
+        self,
+        db: Optional[Database] = None,
+        interval_ms: int = MAIN_LOOP_INTERVAL_MS,
+        updates: Optional[queue.Queue] = None,
+    ) -> None:
         self.db = db or Database()
         self.is_running: bool = False
-        self.main_loop_interval_ms: int = 1000   # 1 segundo (puedes cambiarlo)
+        self.main_loop_interval_ms: int = interval_ms
         self.current_session_id: Optional[int] = None
         self._frame_counter: int = 0
 
-    def start(self) -> None:
-        """Crea la sesión en la BD y marca el asistente como 'en ejecución'."""
-        if self.is_running:
-            logger.info("El asistente ya está en ejecución.")
-            return
+        self.updates: queue.Queue = updates or queue.Queue(maxsize=UPDATE_QUEUE_MAXSIZE)
+        self.dropped_updates: int = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
-        self.current_session_id = self.db.create_run_session(
-            app_version=APP_VERSION,
-            model_id=DEFAULT_MODEL_ID,
-            device_notes=DEVICE_NOTES,
-        )
-        self._frame_counter = 0
+    # ================== Control (llamado desde la UI) ==================
+
+    def start(self) -> bool:
+        """Lanza el hilo de trabajo (crea la sesión allí); vuelve enseguida."""
+        if self._thread is not None and self._thread.is_alive():
+            logger.info("El asistente ya está en ejecución (o deteniéndose).")
+            return False
+
+        self._stop_event.clear()
         self.is_running = True
-        logger.info("Asistente iniciado con session_id=%s", self.current_session_id)
+        self._thread = threading.Thread(target=self._run, name="va-runtime", daemon=True)
+        self._thread.start()
+        return True
 
     def stop(self) -> None:
-        """Detiene el asistente y cierra la sesión en la BD."""
+        """Pide al hilo que termine tras el ciclo en curso; vuelve enseguida."""
         if not self.is_running:
             logger.info("El asistente ya estaba detenido.")
             return
+        self._stop_event.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Espera a que el hilo cierre la sesión (p. ej. al salir de la app)."""
+        if self._thread is not None:
+            self._thread.join(timeout)
 
-        if self.current_session_id is not None:
-            self.db.finish_run_session(self.current_session_id)
+    # ================== Hilo de trabajo ==================
 
-        logger.info("Asistente detenido.")
-        self.is_running = False
-        self.current_session_id = None
+    def _publish(self, item) -> None:
+        """Encola sin bloquear nunca el hilo; si la UI va atrasada se pierde lo más viejo."""
+        while True:
+            try:
+                self.updates.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.updates.get_nowait()
+                    self.dropped_updates += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self) -> None:
+        try:
+            self.current_session_id = self.db.create_run_session(
+                app_version=APP_VERSION,
+                model_id=DEFAULT_MODEL_ID,
+                device_notes=DEVICE_NOTES,
+            )
+            self._frame_counter = 0
+            logger.info("Asistente iniciado con session_id=%s", self.current_session_id)
+            self._publish(StatusUpdate(True, self.current_session_id))
+
+            # Ritmo fijo: el siguiente ciclo se programa desde el inicio del anterior;
+            # si un ciclo se pasa del intervalo no se acumulan ciclos atrasados
+            next_at = time.monotonic()
+            while not self._stop_event.is_set():
+                t0 = time.monotonic()
+                frame_id = self.run_single_cycle()
+                self._publish(CycleResult(self._frame_counter, frame_id, (time.monotonic() - t0) * 1000.0))
+
+                next_at = max(next_at + self.main_loop_interval_ms / 1000.0, time.monotonic())
+                self._stop_event.wait(next_at - time.monotonic())
+            message = ""
+        except Exception as e:
+            logger.exception("El ciclo del asistente falló")
+            message = f"error: {e}"
+        finally:
+            self._finish()
+
+        self._publish(StatusUpdate(False, None, message))
+
+    def _finish(self) -> None:
+        """Cierra la sesión en la BD y marca el asistente como detenido."""
+        try:
+            if self.current_session_id is not None:
+                self.db.finish_run_session(self.current_session_id)
+        finally:
+            logger.info("Asistente detenido.")
+            self.is_running = False
+            self.current_session_id = None
 
     def run_single_cycle(self) -> Optional[int]:
         """
@@ -76,4 +148,3 @@ class VisualAssistantApplication:
 
         logger.debug("Ciclo ejecutado: frame #%s -> id=%s", self._frame_counter, frame_id)
         return frame_id
-
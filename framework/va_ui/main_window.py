@@ -1,8 +1,11 @@
 # va_ui/main_window.py
+import queue
+import time
 import tkinter as tk
 from tkinter import ttk
-from typing import Optional
 
+from va_core.config import UI_POLL_MS, UI_BATCH_MAX
+from va_domain.models import StatusUpdate, CycleResult
 from va_services.runtime import VisualAssistantApplication
 
 
@@ -20,13 +23,21 @@ class MainWindow(tk.Tk):
         self.status_var = tk.StringVar(value="Estado: detenido")
         self.session_var = tk.StringVar(value="Sesión actual: -")
         self.last_frame_var = tk.StringVar(value="Último frame almacenado: -")
+        self.rate_var = tk.StringVar(value="Ciclos por segundo: -")
 
-        # Flag interno para saber si el loop está activo
-        self._loop_running: bool = False
+        # Conteo de ciclos para la tasa mostrada
+        self._cycles: int = 0
+        self._rate_since: float = time.monotonic()
 
         # Construir los controles
         self._build_widgets()
 
+        # Salir también con la X de la ventana
+        self.protocol("WM_DELETE_WINDOW", self.on_exit)
+
+        # La UI sólo vacía la cola de resultados; los ciclos corren en otro hilo
+        self.after(UI_POLL_MS, self._drain_updates)
+
     def _build_widgets(self) -> None:
         padding = {"padx": 10, "pady": 10}
 
@@ -47,7 +58,7 @@ class MainWindow(tk.Tk):
         btn_exit = ttk.Button(
             frame_buttons,
             text="Salir",
-            command=self.destroy
+            command=self.on_exit
         )
 
         btn_start.pack(side=tk.LEFT, **padding)
@@ -61,53 +72,68 @@ class MainWindow(tk.Tk):
         lbl_status = ttk.Label(frame_status, textvariable=self.status_var)
         lbl_session = ttk.Label(frame_status, textvariable=self.session_var)
         lbl_frame = ttk.Label(frame_status, textvariable=self.last_frame_var)
+        lbl_rate = ttk.Label(frame_status, textvariable=self.rate_var)
 
         lbl_status.pack(anchor="w", pady=5)
         lbl_session.pack(anchor="w", pady=5)
         lbl_frame.pack(anchor="w", pady=5)
+        lbl_rate.pack(anchor="w", pady=5)
 
     # ================== Callbacks de botones ==================
 
     def on_start(self) -> None:
-        """Callback del botón 'Iniciar asistente'."""
-        self.app_core.start()
-        self.status_var.set("Estado: ejecutándose")
-
-        if self.app_core.current_session_id is not None:
-            self.session_var.set(
-                f"Sesión actual: {self.app_core.current_session_id}"
-            )
-
-        if not self._loop_running:
-            self._loop_running = True
-            # Programar el primer tick del loop
-            self.after(self.app_core.main_loop_interval_ms, self._loop_tick)
+        """Callback del botón 'Iniciar asistente' (no bloquea: la sesión se crea en el hilo)."""
+        if self.app_core.start():
+            self.status_var.set("Estado: iniciando...")
 
     def on_stop(self) -> None:
-        """Callback del botón 'Detener asistente'."""
+        """Callback del botón 'Detener asistente' (el hilo termina el ciclo en curso)."""
+        if self.app_core.is_running:
+            self.app_core.stop()
+            self.status_var.set("Estado: deteniéndose...")
+
+    def on_exit(self) -> None:
+        """Detiene el asistente, deja que cierre la sesión y cierra la ventana."""
         self.app_core.stop()
-        self.status_var.set("Estado: detenido")
-        self._loop_running = False
-        self.session_var.set("Sesión actual: -")
+        self.app_core.join(timeout=2.0)
+        self.destroy()
 
-    # ================== Bucle tipo "Main Loop" ==================
+    # ================== Resultados del hilo de trabajo ==================
 
-    def _loop_tick(self) -> None:
+    def _drain_updates(self) -> None:
         """
-        Este método se llama periódicamente usando Tkinter.after y simula
-        el ciclo principal del asistente. Aquí se ejecuta run_single_cycle()
-        y se actualiza la UI con el último frame.
+        Vacía la cola por lotes (como mucho UI_BATCH_MAX mensajes por pasada).
+        Los estados se aplican en orden; de los frames sólo se muestra el último.
         """
-        if not self.app_core.is_running:
-            self._loop_running = False
-            return
-
-        frame_id: Optional[int] = self.app_core.run_single_cycle()
-        if frame_id is not None:
-            self.last_frame_var.set(f"Último frame almacenado: {frame_id}")
-
-        # Reprogramar el siguiente ciclo
-        self.after(self.app_core.main_loop_interval_ms, self._loop_tick)
+        last_cycle = None
+        for _ in range(UI_BATCH_MAX):
+            try:
+                update = self.app_core.updates.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(update, CycleResult):
+                last_cycle = update
+                self._cycles += 1
+            elif isinstance(update, StatusUpdate):
+                self._apply_status(update)
+
+        if last_cycle is not None and last_cycle.frame_id is not None:
+            self.last_frame_var.set(f"Último frame almacenado: {last_cycle.frame_id}")
+
+        now = time.monotonic()
+        if now - self._rate_since >= 1.0:
+            self.rate_var.set(f"Ciclos por segundo: {self._cycles / (now - self._rate_since):.1f}")
+            self._cycles, self._rate_since = 0, now
+
+        self.after(UI_POLL_MS, self._drain_updates)
+
+    def _apply_status(self, update: StatusUpdate) -> None:
+        if update.is_running:
+            self.status_var.set("Estado: ejecutándose")
+            self.session_var.set(f"Sesión actual: {update.session_id}")
+        else:
+            self.status_var.set(f"Estado: detenido {update.message}".rstrip())
+            self.session_var.set("Sesión actual: -")
 
 
 def run_app() -> None:
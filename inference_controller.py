@@ -0,0 +1,171 @@
+"""
+Closed-loop control of the inference cadence.
+
+Every CONTROL_INTERVAL_S the controller looks at the detect times measured
+since the last tick (p90), the CPU temperature and frequency from sysfs and
+the recent scene activity, and moves one knob one step:
+
+    hot / slow   -> smaller input size, or (already smallest) a larger stride
+    idle scene   -> larger stride (less heat while nothing changes)
+    headroom     -> smaller stride first, then a larger input size
+    active scene -> back towards the base stride once latency allows
+
+Each decision (including "hold") is kept in `decisions` and handed to
+`on_decision`; `on_change(stride, imgsz)` is called when a knob moves.
+"""
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from config import (
+    CONTROL_INTERVAL_S, CONTROL_TARGET_DETECT_MS, CONTROL_HEADROOM, CONTROL_MAX_STRIDE,
+    CONTROL_TEMP_HOT_C, CONTROL_TEMP_COOL_C, CONTROL_THROTTLE_FREQ_RATIO,
+    CONTROL_IDLE_ACTIVITY, CONTROL_SYSFS_ROOT
+)
+
+
+class SysfsSensors:
+    """CPU temperature and frequency; `root` can point at a fake tree in tests."""
+
+    TEMP = "sys/class/thermal/thermal_zone0/temp"                 # millidegrees C
+    FREQ = "sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"  # kHz
+    FREQ_MAX = "sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq"
+
+    def __init__(self, root: str = CONTROL_SYSFS_ROOT):
+        self.root = root
+
+    def _read(self, rel: str):
+        try:
+            with open(os.path.join(self.root, rel)) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None  # not a Pi / no cpufreq driver: that input is ignored
+
+    def temp_c(self):
+        raw = self._read(self.TEMP)
+        return raw / 1000.0 if raw is not None else None
+
+    def freq_ratio(self):
+        cur, top = self._read(self.FREQ), self._read(self.FREQ_MAX)
+        return cur / top if cur and top else None
+
+
+class InferenceController:
+    def __init__(self, base_stride: int, sizes=(), sensors=None,
+                 target_ms: float = CONTROL_TARGET_DETECT_MS, interval_s: float = CONTROL_INTERVAL_S,
+                 max_stride: int = CONTROL_MAX_STRIDE, on_change=None, on_decision=None,
+                 clock=time.monotonic):
+        self.base_stride = max(1, int(base_stride))
+        self.max_stride = max(self.base_stride, int(max_stride))
+        self.sizes = tuple(sorted(sizes))    # empty: the input size cannot be changed
+        self.sensors = sensors or SysfsSensors()
+        self.target_ms = target_ms
+        self.interval_s = interval_s
+        self.on_change = on_change
+        self.on_decision = on_decision
+        self.clock = clock
+
+        self.stride = self.base_stride
+        self.imgsz = self.sizes[-1] if self.sizes else None
+
+        self._detect_ms = []
+        self._frames = 0
+        self._changed = 0
+        self._next_tick = clock() + interval_s
+        self.decisions = deque(maxlen=50)
+        self.changes = 0
+
+    # ---------------- inputs (inference stage) ----------------
+
+    def observe(self, detect_ms=None, changed: bool = False):
+        """Per processed frame: its detect time (None when inference was skipped) and scene change."""
+        if detect_ms is not None:
+            self._detect_ms.append(detect_ms)
+        self._frames += 1
+        self._changed += bool(changed)
+
+    def maybe_update(self):
+        """Run a control step if the interval has passed; returns the decision or None."""
+        now = self.clock()
+        if now < self._next_tick:
+            return None
+        self._next_tick = now + self.interval_s
+        return self.step()
+
+    # ---------------- control step ----------------
+
+    def step(self) -> dict:
+        p90 = float(np.percentile(self._detect_ms, 90)) if self._detect_ms else None
+        activity = self._changed / self._frames if self._frames else None
+        self._detect_ms, self._frames, self._changed = [], 0, 0
+
+        temp = self.sensors.temp_c()
+        ratio = self.sensors.freq_ratio()
+        # A low clock only means throttling when warm (the governor also clocks down when idle)
+        throttled = ratio is not None and ratio < CONTROL_THROTTLE_FREQ_RATIO \
+            and temp is not None and temp >= CONTROL_TEMP_COOL_C
+        hot = throttled or (temp is not None and temp >= CONTROL_TEMP_HOT_C)
+        cool = not throttled and (temp is None or temp < CONTROL_TEMP_COOL_C)
+        slow = p90 is not None and p90 > self.target_ms
+        fast = p90 is not None and p90 < self.target_ms * CONTROL_HEADROOM
+        idle = activity is not None and activity < CONTROL_IDLE_ACTIVITY
+
+        stride, imgsz = self.stride, self.imgsz
+        if hot or slow:
+            reason = "hot" if hot else "slow"
+            if not self._resize(-1):
+                self.stride = min(self.max_stride, self.stride + 1)
+        elif idle and cool and self.stride < self.max_stride:
+            reason = "idle"
+            self.stride += 1
+        elif fast and cool:
+            reason = "headroom"
+            if self.stride > self.base_stride:
+                self.stride -= 1
+            else:
+                self._resize(+1)
+        elif not idle and cool and self.stride > self.base_stride and p90 is not None:
+            reason = "active"
+            self.stride -= 1
+        else:
+            reason = "hold"
+
+        changed = (stride, imgsz) != (self.stride, self.imgsz)
+        if not changed and reason != "hold":
+            reason = f"{reason} (at limit)"
+        decision = {
+            "reason": reason,
+            "stride": self.stride,
+            "imgsz": self.imgsz,
+            "p90_ms": round(p90, 1) if p90 is not None else None,
+            "temp_c": round(temp, 1) if temp is not None else None,
+            "freq_ratio": round(ratio, 3) if ratio is not None else None,
+            "activity": round(activity, 3) if activity is not None else None,
+        }
+        self.decisions.append(decision)
+        if changed:
+            self.changes += 1
+            if self.on_change is not None:
+                self.on_change(self.stride, self.imgsz)
+        if self.on_decision is not None:
+            self.on_decision(decision, changed)
+        return decision
+
+    def _resize(self, direction: int) -> bool:
+        if not self.sizes:
+            return False
+        i = self.sizes.index(self.imgsz) + direction
+        if not 0 <= i < len(self.sizes):
+            return False
+        self.imgsz = self.sizes[i]
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "stride": self.stride,
+            "imgsz": self.imgsz,
+            "changes": self.changes,
+            "last": self.decisions[-1] if self.decisions else None,
+        }
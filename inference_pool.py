@@ -0,0 +1,299 @@
+"""
+Multi-process inference: worker processes each own a model instance.
+
+Frames travel through one multiprocessing.shared_memory block split into
+fixed-size slots (one copy in, no pickling of pixels); only the slot index
+goes through the task queue and only the small box arrays come back.
+Results are handed out in frame order, whatever order the workers finish in.
+
+    pool = InferencePool(workers=2, threads=2)
+    pool.submit(seq, frame)               # blocks while every slot is busy
+    res = pool.next_result(timeout=0.5)   # PoolResult, in seq order
+    ... res.frame / res.xywh / res.conf / res.cls ...
+    res.release()                         # slot can be reused
+    pool.close()
+
+res.frame is a view of the shared block: valid until release(). close()
+waits for handed-out results to be released before unmapping the block.
+"""
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import INFER_WORKERS, INFER_THREADS, INFER_POOL_SLOTS, FRAME_WIDTH, FRAME_HEIGHT
+
+
+def _worker_main(shm_name: str, shape: tuple, slots: int, threads: int, warmup: int, tasks, results):
+    """Worker process: attach the frame slots, load the model, infer on request."""
+    if threads:
+        # numpy is already loaded with this module (it only maps the slots here),
+        # but the engine runtime (torch / onnxruntime / OpenVINO) is imported by
+        # vision's backend when the model loads below, so its OpenMP pool reads these
+        for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+            os.environ[var] = str(threads)
+
+    import vision
+    vision.INFER_THREADS = threads or vision.INFER_THREADS
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=shm.buf)
+    try:
+        try:
+            engine = vision.warm_up(warmup)
+        except Exception as e:
+            results.put(("failed", repr(e)))
+            return
+        results.put(("ready", engine.name, dict(engine.names)))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot = task
+            t0 = time.perf_counter()
+            try:
+                xywh, conf, cls = engine.infer(frames[slot])
+                results.put((seq, slot, xywh, conf, cls, (time.perf_counter() - t0) * 1000.0, None))
+            except Exception as e:
+                results.put((seq, slot, None, None, None, 0.0, repr(e)))
+    finally:
+        del frames
+        shm.close()
+
+
+class PoolResult:
+    """One frame coming out of the pool (in submit order); `frame` is valid until release()."""
+
+    __slots__ = ("seq", "frame", "xywh", "conf", "cls", "infer_ms", "latency_ms", "skipped",
+                 "_pool", "_slot", "_t0")
+
+    def __init__(self, pool, seq: int, slot: int, skipped: bool):
+        self._pool = pool
+        self._slot = slot
+        self._t0 = time.perf_counter()
+        self.seq = seq
+        self.frame = pool._frames[slot]
+        self.skipped = skipped          # submitted with infer=False (no boxes)
+        self.xywh = self.conf = self.cls = None
+        self.infer_ms = 0.0             # model time inside the worker
+        self.latency_ms = 0.0           # submit -> result, including queueing
+
+    def _finished(self):
+        self.latency_ms = (time.perf_counter() - self._t0) * 1000.0
+
+    def release(self):
+        if self._slot is not None:
+            self._pool._free_slot(self._slot)
+            self._slot = None
+
+
+class InferencePool:
+    def __init__(self, workers: int = INFER_WORKERS, threads: int = INFER_THREADS,
+                 slots: int | None = None, shape: tuple = (FRAME_HEIGHT, FRAME_WIDTH, 3),
+                 warmup: int = 1, start_timeout: float = 120.0):
+        self.workers = max(1, int(workers))
+        self.threads = int(threads)
+        self.shape = tuple(shape)
+        self.slots = slots or max(2, INFER_POOL_SLOTS * self.workers)
+
+        stride = int(np.prod(self.shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=stride * self.slots)
+        self._frames = np.ndarray((self.slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+
+        self._free = deque(range(self.slots))
+        self._order = deque()           # seqs in submit order
+        self._done = {}                 # seq -> PoolResult ready to hand out
+        self._pending = {}              # seq -> PoolResult waiting for a worker
+        self._cond = threading.Condition()
+        self._closed = False
+        self.error = None
+        self.engine = None              # backend name and labels, reported by the workers
+        self.names = {}
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0               # submit() timed out waiting for a slot
+        self.slot_wait_s = 0.0
+
+        # spawn: workers must not inherit the parent's threads, camera or DB handles
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._procs = [
+            ctx.Process(target=_worker_main, name=f"infer-{i}", daemon=True,
+                        args=(self._shm.name, self.shape, self.slots, self.threads, warmup,
+                              self._tasks, self._results))
+            for i in range(self.workers)
+        ]
+        for proc in self._procs:
+            proc.start()
+        self._wait_ready(start_timeout)
+
+        self._collector = threading.Thread(target=self._collect, name="infer-collect", daemon=True)
+        self._collector.start()
+
+    def _wait_ready(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.workers:
+            try:
+                msg = self._results.get(timeout=0.5)
+            except queue.Empty:
+                msg = None
+            if msg is not None and msg[0] == "ready":
+                _, self.engine, self.names = msg
+                ready += 1
+                continue
+            if msg is not None and msg[0] == "failed":
+                error = f"Inference worker failed to load the model: {msg[1]}"
+            elif any(not p.is_alive() for p in self._procs):
+                error = "Inference worker exited during startup"
+            elif time.monotonic() > deadline:
+                error = "Inference workers did not start in time"
+            else:
+                continue
+            self.close()
+            raise RuntimeError(error)
+
+    # ---------------- producer side ----------------
+
+    def submit(self, seq: int, frame, infer: bool = True, timeout: float | None = None) -> bool:
+        """
+        Copy `frame` into a free slot and queue it (infer=False passes the frame
+        through in order without running the model). Returns False on timeout
+        or once close() has started.
+        """
+        t0 = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._free or self._closed:
+                if self._closed:
+                    return False
+                self._raise_if_failed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(min(0.5, remaining) if remaining is not None else 0.5)
+            slot = self._free.popleft()
+            self.slot_wait_s += time.perf_counter() - t0
+
+        np.copyto(self._frames[slot], frame)
+        res = PoolResult(self, seq, slot, skipped=not infer)
+        with self._cond:
+            self._order.append(seq)
+            self.submitted += 1
+            if infer:
+                self._pending[seq] = res
+            else:
+                self._done[seq] = res
+                self._cond.notify_all()
+        if infer:
+            self._tasks.put((seq, slot))
+        return True
+
+    def _free_slot(self, slot: int):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    # ---------------- consumer side ----------------
+
+    def _collect(self):
+        while not self._closed:
+            try:
+                seq, slot, xywh, conf, cls, infer_ms, error = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._cond:
+                res = self._pending.pop(seq, None)
+                if res is None:
+                    continue
+                if error is not None:
+                    self.error = RuntimeError(f"Inference worker failed on frame {seq}: {error}")
+                res.xywh, res.conf, res.cls, res.infer_ms = xywh, conf, cls, infer_ms
+                res._finished()
+                self._done[seq] = res
+                self.completed += 1
+                self._cond.notify_all()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise self.error
+        dead = [p.name for p in self._procs if not p.is_alive()]
+        if dead and not self._closed:
+            self.error = RuntimeError(f"Inference worker(s) exited: {', '.join(dead)}")
+            raise self.error
+
+    def next_result(self, timeout: float | None = None) -> PoolResult | None:
+        """The oldest submitted frame once its result is in (None on timeout or after close())."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                self._raise_if_failed()
+                if self._order and self._order[0] in self._done:
+                    return self._done.pop(self._order.popleft())
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(min(0.5, remaining) if remaining is not None else 0.5)
+
+    def in_flight(self) -> int:
+        with self._cond:
+            return len(self._order)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "threads": self.threads,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "in_flight": len(self._order),
+                "free_slots": len(self._free),
+                "rejected": self.rejected,
+                "slot_wait_s": round(self.slot_wait_s, 3),
+            }
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stop the workers and free the shared block. Results not handed out are
+        dropped; handed-out ones get up to `timeout` seconds to be released.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+
+        with self._cond:
+            for res in [*self._pending.values(), *self._done.values()]:
+                self._free.append(res._slot)
+                res._slot = None
+            self._pending.clear()
+            self._done.clear()
+            self._order.clear()
+            # A consumer may still be reading a result's frame view
+            if not self._cond.wait_for(lambda: len(self._free) == self.slots, timeout=timeout):
+                self.error = RuntimeError(f"{self.slots - len(self._free)} pool result(s) never released")
+
+        # The name goes now; the mapping only once no result view can still touch it
+        self._frames = None
+        self._shm.unlink()
+        try:
+            self._shm.close()
+        except BufferError:
+            pass   # unreleased views: unmapped when they are garbage-collected
@@ -26,3 +26,39 @@ def log_spoken(label):
 def log_saved(path):
     """Log saved frame paths."""
     logger.info(f"FRAME_SAVED: {path}")
+
+
+def log_startup(phases, errors=None):
+    """Log startup phase timings (ms) and any non-fatal startup errors."""
+    logger.info(f"STARTUP: {phases}")
+    for name, error in (errors or {}).items():
+        logger.warning(f"STARTUP {name} failed: {error}")
+
+
+def log_control(decision, changed):
+    """Log an inference controller decision (knob moves at INFO, holds at DEBUG)."""
+    if changed:
+        logger.info(f"CONTROL: {decision}")
+    else:
+        logger.debug(f"CONTROL: {decision}")
+
+
+def log_stats(stats):
+    """Log pipeline statistics (per-stage input depth, stall / busy time, drops)."""
+    logger.info(f"STATS: {stats}")
+
+
+def log_audio_sink(name, fallback_reason=None):
+    """Log the speech output in use (WARNING when it is a fallback)."""
+    if fallback_reason:
+        logger.warning(f"AUDIO_SINK: {name} ({fallback_reason})")
+    else:
+        logger.info(f"AUDIO_SINK: {name}")
+
+
+def log_metrics_endpoint(address, error=None):
+    """Log the metrics endpoint address (WARNING when it could not be opened)."""
+    if error is not None:
+        logger.warning(f"METRICS: endpoint {address} unavailable, running without it ({error})")
+    else:
+        logger.info(f"METRICS: http://{address}/metrics")
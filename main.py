@@ -1,115 +1,468 @@
 import time
+_IMPORT_T0 = time.perf_counter()   # startup timings include module imports
 
-from camera import open_camera, get_frame
-from vision import detect
+import contextlib
+import threading
+
+from frame_source import open_source, FrameRecorder
+from archiver import CaptureArchiver
+from event_bus import EventBus
+from db_maintenance import DatabaseMaintenance
+from vision import (
+    detect_array, labels_of, to_records, set_labels, set_max_imgsz, adaptive_detector,
+    DETECTION_DTYPE, get_model, warm_up
+)
+from inference_pool import InferencePool
+from inference_controller import InferenceController
 from dedupe import DedupeSpeaker
-from tts_piper import speak
-from logger_setup import log_detected, log_spoken
+from tts_piper import (
+    speak, stop_playback, prewarm, set_vocabulary, cache_stats, last_completed, last_first_audio_ms,
+    shutdown as shutdown_tts
+)
+from pipeline import Stage
+from speech_scheduler import SpeechScheduler
+from scene_description import describe, POSITIONS
+from scene_gate import SceneGate
+from tracker import IoUTracker
+from logger_setup import log_detected, log_spoken, log_stats, log_startup, log_control, log_metrics_endpoint
+from metrics import span, observe, registry as metrics_registry, measure_overhead, MetricsServer
 from va_db import VADatabase
+from startup import Startup
 from config import (
-    INFER_EVERY_N_FRAMES, CONF_THRES,
+    INFER_EVERY_N_FRAMES, INFER_WORKERS, ADAPTIVE_INFER, ADAPTIVE_IMGSZ, CONTROL_ENABLED, GATE_ENABLED,
+    STATS_LOG_SECONDS, TTS_PREWARM, METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    FRAME_SOURCE, REPLAY_REALTIME, RECORD_PATH, CAPTURE_ENABLED, CAPTURE_ON_NEW_LABEL,
+    SPEECH_COALESCE, CLASS_PRIORITY, EVENT_BUS_ENABLED, DB_MAINTENANCE_ENABLED, STARTUP_READY_TEXT, STARTUP_WARMUP_RUNS,
     DB_ENABLED, APP_VERSION, DEFAULT_MODEL_ID, DEVICE_NOTES
 )
 
 
 def main():
-    db = VADatabase() if DB_ENABLED else None
-    session_id = None
+    imports_ms = round((time.perf_counter() - _IMPORT_T0) * 1000.0, 1)
+
+    def open_db():
+        if not DB_ENABLED:
+            return None, None
+        database = VADatabase()
+        return database, database.create_session(APP_VERSION, DEFAULT_MODEL_ID, DEVICE_NOTES)
+
+    # ---------------- startup phase ----------------
+    # DB, model (+ one dummy inference), camera and Piper (voice load + the
+    # "ready" phrase) come up concurrently; TTS failing is not fatal. If a
+    # required task fails, the ones that came up are released before it raises
+    startup = Startup()
+    ready = startup.run({
+        "db": open_db,
+        # With INFER_WORKERS the model is loaded (and warmed up) in the worker processes
+        "model": (lambda: InferencePool(warmup=STARTUP_WARMUP_RUNS)) if INFER_WORKERS
+                 else (lambda: warm_up(STARTUP_WARMUP_RUNS)),
+        "camera": lambda: open_source(FRAME_SOURCE, realtime=REPLAY_REALTIME),
+        "tts": lambda: prewarm([STARTUP_READY_TEXT]),
+    }, optional=("tts",), cleanup={
+        "db": lambda opened: close_db(*opened),
+        "model": lambda pool: pool.close() if INFER_WORKERS else None,
+        "camera": lambda source: source.stop(),
+        "tts": lambda _: shutdown_tts(),
+    })
 
+    # From here on every resource registers its cleanup as soon as it is up,
+    # so a failure anywhere in setup or in the main loop releases all of them
+    with contextlib.ExitStack() as cleanup:
+        run(ready, startup, imports_ms, cleanup)
+
+
+def close_db(db, session_id, before_end=None):
+    if db and session_id is not None:
+        if before_end is not None:
+            before_end()
+        db.end_session(session_id)
     if db:
-        session_id = db.create_session(APP_VERSION, DEFAULT_MODEL_ID, DEVICE_NOTES)
+        db.close()
 
-    dedupe = DedupeSpeaker()
-    picam2 = open_camera()
 
-    frame_number = 0
+def run(ready, startup, imports_ms, cleanup):
+    db, session_id = ready["db"]
+    source = ready["camera"]
+    pool = ready["model"] if INFER_WORKERS else None
 
-    try:
-        while True:
-            frame = get_frame(picam2)
-            frame_number += 1
+    window = {"start": time.monotonic()}
 
-            # performance: run inference every N frames
-            if frame_number % INFER_EVERY_N_FRAMES != 0:
-                continue
+    def write_latency_summary():
+        # One latency_summary row per stage for the window since the last call
+        if METRICS_ENABLED and db and session_id is not None:
+            now = time.monotonic()
+            db.insert_latency_summary(session_id, now - window["start"], metrics_registry.take_window())
+            window["start"] = now
 
-            t0 = time.time()
-
-            # raw detections (label/conf/bbox) for DB
-            raw = detect(frame, return_raw=True)
-
-            # filter by confidence threshold
-            raw = [d for d in raw if float(d.get("conf", 0.0)) >= CONF_THRES]
-
-            detect_ms = int((time.time() - t0) * 1000)
-            labels = [d["label"] for d in raw]
-
-            log_detected(labels)
-
-            frame_id = None
-            if db and session_id is not None:
-                frame_id = db.insert_frame_event(
-                    session_id=session_id,
-                    frame_number=frame_number,
-                    detect_ms=detect_ms,
-                    objects_found=len(raw)
-                )
-                for d in raw:
-                    db.insert_detection(
-                        session_id=session_id,
-                        frame_id=frame_id,
-                        label=d["label"],
-                        confidence=float(d["conf"]),
-                        box_x=d.get("box_x"),
-                        box_y=d.get("box_y"),
-                        box_w=d.get("box_w"),
-                        box_h=d.get("box_h"),
-                    )
-
-            # speak logic (anti-repeat)
-            current = set(labels)
-            for label in current:
-                if not dedupe.should_speak(label, current):
-                    continue
+    # Registered first, so they run last: the session is closed after everything that writes to it
+    cleanup.callback(close_db, db, session_id, write_latency_summary)
+    cleanup.callback(shutdown_tts)
+    if pool is not None:
+        cleanup.callback(pool.close)
+    cleanup.callback(source.stop)
+    if pool is not None:
+        set_labels(pool.names)
+    phases = {"imports": imports_ms, **startup.timings}
+    log_startup(phases, startup.errors)
+    if db and session_id is not None:
+        db.set_session_startup(session_id, round(imports_ms + startup.timings["total"]), phases)
+        for name, error in startup.errors.items():
+            db.log_error(session_id, "STARTUP", "WARN", f"{name} failed during startup", str(error))
+
+    dedupe = DedupeSpeaker()
+    gate = SceneGate() if GATE_ENABLED else None
+    tracker = IoUTracker()
+    recorder = FrameRecorder(RECORD_PATH) if RECORD_PATH else None
+    if recorder is not None:
+        cleanup.callback(recorder.close)
 
-                text = label  # minimal: speak label only (keep behavior simple)
-                message_id = None
-                audio_event_id = None
+    archiver = None
+    if CAPTURE_ENABLED:
+        archiver = CaptureArchiver(
+            on_saved=db.set_frame_capture if db else None,
+            on_evicted=db.clear_frame_capture if db else None,
+        )
+        cleanup.callback(archiver.close)
 
+    # Phrases kept in the disk audio cache: every label the model can report,
+    # or the single-object sentences of the important classes. With
+    # TTS_PREWARM they are also synthesized in the background
+    if SPEECH_COALESCE:
+        phrases = [f"{describe([(label, None)])} {where}" for label in CLASS_PRIORITY for where in POSITIONS]
+    else:
+        phrases = list((pool.names if pool else get_model().names).values())
+    set_vocabulary(phrases)
+    if TTS_PREWARM:
+        threading.Thread(target=prewarm, args=(phrases,), name="tts-prewarm", daemon=True).start()
+
+    metrics_server = None
+    if METRICS_ENABLED:
+        measure_overhead()
+        if METRICS_PORT:
+            address = f"{METRICS_HOST}:{METRICS_PORT}"
+            try:
+                metrics_server = MetricsServer()
+            except OSError as e:
+                # The scrape endpoint is optional (port taken by another instance, ...)
+                log_metrics_endpoint(address, e)
                 if db and session_id is not None:
-                    message_id = db.insert_spoken_message(session_id, frame_id, text)
-                    audio_event_id = db.start_audio_event(session_id, message_id, output_device="USB Speaker")
-
-                try:
-                    speak(text)
-                    dedupe.mark_spoken(label)
-                    log_spoken(label)
-                    if db and audio_event_id is not None:
-                        db.finish_audio_event(audio_event_id, was_successful=1)
-                except Exception as e:
-                    if db and audio_event_id is not None:
-                        db.finish_audio_event(audio_event_id, was_successful=0, error_text=str(e))
-                    if db and session_id is not None:
-                        db.log_error(session_id, "TTS", "ERROR", "TTS failed", str(e))
-
-            time.sleep(0.01)
+                    db.log_error(session_id, "METRICS", "WARN", f"Metrics endpoint {address} unavailable", str(e))
+            else:
+                metrics_server.start()
+                cleanup.callback(metrics_server.stop)
+                log_metrics_endpoint(address)
 
-    except KeyboardInterrupt:
-        pass
-    except Exception as e:
+    bus = None
+    if EVENT_BUS_ENABLED:
+        bus = EventBus()
+        bus.start()
+        cleanup.callback(bus.close)
+
+    def report_error(component, short, details):
         if db and session_id is not None:
-            db.log_error(session_id, "RUNTIME", "ERROR", "Main loop crashed", str(e))
-        raise
-    finally:
+            db.log_error(session_id, component, "ERROR", short, details)
+        if bus is not None:
+            bus.publish("error", {"session_id": session_id, "component": component,
+                                  "severity": "ERROR", "message": short, "details": details})
+
+    stop = threading.Event()
+    scheduler = SpeechScheduler()
+    dedupe_lock = threading.Lock()  # dedupe is read by inference and updated by speech
+
+    last = {"seq": 0, "frame_id": None, "labels": set()}
+
+    # performance: without the scene gate, run inference every N frames; the
+    # controller moves that stride (and the input size) with latency and heat
+    base_stride = 1 if gate is not None else INFER_EVERY_N_FRAMES
+    controller = None
+    if CONTROL_ENABLED:
+        engine = get_model() if pool is None else None
+        sizes = [s for s in ADAPTIVE_IMGSZ if s <= engine.imgsz] if getattr(engine, "dynamic", False) else []
+
+        def on_change(stride, imgsz):
+            if sizes:
+                set_max_imgsz(imgsz)
+            if bus is not None:
+                bus.publish("control", {"session_id": session_id, **controller.decisions[-1]})
+
+        controller = InferenceController(base_stride, sizes, on_change=on_change, on_decision=log_control)
+    pending_ready = [STARTUP_READY_TEXT] if STARTUP_READY_TEXT else []
+
+    # ---------------- inference stage ----------------
+    # Capture runs on the frame source (camera ring thread or file replay);
+    # this stage leases the newest frame (its input wait = the stage's stall).
+    def next_frame():
+        stride = controller.stride if controller is not None else base_stride
+        after = last["seq"] + stride - 1
+        with span("capture_wait"):
+            frame = source.acquire(after_seq=after, timeout=0.5)
+        if frame is None:
+            if source.finished and (pool is None or pool.in_flight() == 0):
+                stop.set()  # end of a recorded session
+            return None
+        last["seq"] = frame.seq
+        return frame
+
+    def record(frame):
+        if recorder is not None:
+            recorder.write(frame.array, frame.timestamp)
+
+    def should_infer(frame):
+        # Static scene: skip YOLO and announce from the tracker's predicted boxes
+        if gate is None:
+            return True
+        with span("gate"):
+            return gate.should_infer(frame.downscaled(gate.step))
+
+    def inference_step(frame):
+        try:
+            record(frame)
+            with span("frame"):
+                process_frame(frame.seq, frame.array, should_infer(frame))
+        except Exception:
+            # Keep the frame that broke the loop for post-mortem analysis (not
+            # linked: last["frame_id"] belongs to an earlier frame)
+            if archiver is not None:
+                archiver.offer(frame.seq, frame.array, None, ["error"])
+            raise
+        finally:
+            frame.release()
+
+    def process_frame(number, frame, infer):
+        if not infer:
+            handle_skipped(number, frame)
+            return
+
+        t0 = time.perf_counter()
+
+        # compact detection records (already filtered by CONF_THRES)
+        dets = detect_array(frame)
+        detect_ms = (time.perf_counter() - t0) * 1000.0
+        observe("detect", detect_ms)
+        handle_detections(number, frame, dets, detect_ms)
+
+    # With INFER_WORKERS the stage is split: "submit" copies frames into the
+    # pool, "handle" takes results back in frame order and does the rest.
+    def submit_step(frame):
         try:
-            picam2.stop()
+            record(frame)
+            # Every slot busy for 0.5 s (handle stage stalled or gone) or the pool
+            # is closing: drop this frame, a newer one follows
+            pool.submit(frame.seq, frame.array, infer=should_infer(frame), timeout=0.5)
+        finally:
+            frame.release()
+
+    def handle_step(res):
+        try:
+            with span("frame"):
+                if res.skipped:
+                    handle_skipped(res.seq, res.frame)
+                else:
+                    observe("detect", res.infer_ms)
+                    observe("pool_latency", res.latency_ms)
+                    handle_detections(res.seq, res.frame, to_records(res.xywh, res.conf, res.cls), res.infer_ms)
         except Exception:
-            pass
+            if archiver is not None:
+                archiver.offer(res.seq, res.frame, None, ["error"])
+            raise
+        finally:
+            res.release()
+
+    def handle_skipped(number, frame):
+        if controller is not None:
+            controller.observe(None, changed=False)
+            controller.maybe_update()
+        predicted = tracker.predict(DETECTION_DTYPE)
+        with span("announce"):
+            announce(predicted, labels_of(predicted), last["frame_id"])
+        if archiver is not None:
+            # Not inferred: no frame_event row, so the JPEG is not linked
+            archiver.offer(number, frame, None)
+
+    def handle_detections(number, frame, dets, detect_ms):
+        with span("track"):
+            tracker.update(dets)
+        labels = labels_of(dets)
+
+        if controller is not None:
+            # With the gate an inferred frame is a changed scene; otherwise compare labels
+            controller.observe(detect_ms, changed=gate is not None or set(labels) != last["labels"])
+            controller.maybe_update()
+
+        log_detected(labels)
+
+        frame_id = None
+        if db and session_id is not None:
+            with span("persist"):
+                frame_id = db.insert_frame(session_id, number, int(detect_ms), dets, labels)
+
+        # Only build the per-object payload when someone is listening
+        if bus is not None and bus.has_subscribers:
+            bus.publish("detection", {
+                "session_id": session_id, "frame_id": frame_id, "frame_number": number,
+                "detect_ms": round(detect_ms, 1),
+                "objects": [
+                    {"label": label, "conf": round(conf, 3), "box": [x, y, w, h],
+                     "track_id": tid if tid >= 0 else None}
+                    for label, conf, x, y, w, h, tid in zip(
+                        labels, dets["conf"].tolist(), dets["box_x"].tolist(), dets["box_y"].tolist(),
+                        dets["box_w"].tolist(), dets["box_h"].tolist(), dets["track_id"].tolist())
+                ],
+            })
+
+        if archiver is not None:
+            new_label = CAPTURE_ON_NEW_LABEL and bool(set(labels) - last["labels"])
+            with span("archive"):
+                archiver.offer(number, frame, frame_id, ["new_label"] if new_label else ())
+
+        last["frame_id"], last["labels"] = frame_id, set(labels)
+        with span("announce"):
+            announce(dets, labels, frame_id)
+
+    def announce(dets, labels, frame_id):
+        # speak logic (anti-repeat per tracked object); playback happens on the speech stage
+        current = set(labels)
+        track_ids = dets["track_id"].tolist()
+        scheduler.update_present({(label, tid) for label, tid in zip(labels, track_ids) if tid >= 0})
+
+        boxes = zip(dets["box_x"].tolist(), dets["box_y"].tolist(), dets["box_w"].tolist(), dets["box_h"].tolist())
+        for label, track_id, box in zip(labels, track_ids, boxes):
+            if track_id < 0:
+                continue  # unconfirmed track: wait until it is seen again
+            if scheduler.is_queued((label, track_id)):
+                continue
+            with dedupe_lock:
+                if not dedupe.should_speak(label, current, track_id):
+                    continue
+            scheduler.submit(label, track_id, frame_id, box)
+
+        # Something far more important is waiting: cut the current utterance short
+        if scheduler.should_preempt():
+            stop_playback()
+
+    # ---------------- speech stage ----------------
+    def next_speech():
+        # First utterance: tell the user the assistant is up (inference is already running)
+        if pending_ready:
+            return pending_ready.pop()
+        # Everything pending goes into one sentence (best first)
+        return scheduler.next_batch(timeout=0.5, limit=None if SPEECH_COALESCE else 1) or None
+
+    def speech_step(batch):
+        if isinstance(batch, str):
+            try:
+                speak(batch)
+            except Exception as e:
+                report_error("TTS", "Ready announcement failed", str(e))
+            return
+
+        lead = batch[0]
+        observe("speech_queue", lead.queue_ms())
+        text = describe([(ann.label, ann.box) for ann in batch]) if SPEECH_COALESCE else lead.label
+        message_id = None
+        audio_event_id = None
+        preempted = False
 
         if db and session_id is not None:
-            db.end_session(session_id)
+            message_id = db.insert_spoken_message(session_id, lead.frame_id, text)
+            audio_event_id = db.start_audio_event(
+                session_id, message_id, output_device="USB Speaker",
+                queue_ms=lead.queue_ms(), dropped_count=lead.dropped_before
+            )
+
+        try:
+            with span("speak"):
+                speak(text)
+            preempted = not last_completed()
+            if not preempted:
+                with dedupe_lock:
+                    for ann in batch:
+                        dedupe.mark_spoken(ann.label, ann.track_id)
+                log_spoken(text)
+                if bus is not None:
+                    bus.publish("speech", {"session_id": session_id, "message_id": message_id,
+                                           "frame_id": lead.frame_id, "text": text,
+                                           "track_id": lead.track_id,
+                                           "track_ids": [ann.track_id for ann in batch]})
+            if db and audio_event_id is not None:
+                db.finish_audio_event(audio_event_id, was_successful=1, was_preempted=int(preempted),
+                                      first_audio_ms=last_first_audio_ms())
+        except Exception as e:
+            if db and audio_event_id is not None:
+                db.finish_audio_event(audio_event_id, was_successful=0, error_text=str(e),
+                                      first_audio_ms=last_first_audio_ms())
+            report_error("TTS", "TTS failed", str(e))
+            if archiver is not None:
+                archiver.trigger("error")
+        finally:
+            scheduler.done_batch(batch, preempted=preempted)
+
+    # Each stage reports the depth of (and drops from) its input
+    if pool is None:
+        stages = [Stage("inference", next_frame, inference_step, stop,
+                        depth=source.depth, dropped=lambda: source.dropped)]
+    else:
+        stages = [
+            Stage("submit", next_frame, submit_step, stop, depth=source.depth,
+                  dropped=lambda: source.dropped + pool.rejected),
+            Stage("inference", lambda: pool.next_result(timeout=0.5), handle_step, stop, depth=pool.in_flight),
+        ]
+    stages.append(Stage("speech", next_speech, speech_step, stop, depth=scheduler.depth,
+                        dropped=lambda: scheduler.dropped_overflow + scheduler.dropped_expired))
+
+    # Rollups / retention / vacuum only while nothing is waiting to be spoken or written
+    maintenance = None
+    if db and DB_MAINTENANCE_ENABLED:
+        maintenance = DatabaseMaintenance(
+            db.db_path,
+            is_idle=lambda: scheduler.depth() == 0 and db.writer_stats().get("pending", 0) == 0,
+        )
+
+    def stop_stages():
+        stop.set()
+        for stage in stages:
+            if stage.is_alive():
+                stage.join(timeout=5)
+        if maintenance is not None and maintenance.is_alive():
+            maintenance.stop()
+
+    cleanup.callback(stop_stages)
+    try:
+        source.start()
+        for stage in stages:
+            stage.start()
+        if maintenance is not None:
+            maintenance.start()
+
+        # Main thread only supervises: report stage stats until a stage fails
+        while not stop.wait(STATS_LOG_SECONDS):
+            write_latency_summary()
+            log_stats({
+                "capture": source.stats(),
+                "stages": [stage.stats() for stage in stages],
+                "speech": scheduler.stats(),
+                "archiver": archiver.stats() if archiver else {},
+                "tts_cache": cache_stats(),
+                "db_writer": db.writer_stats() if db else {},
+                "scene_gate": gate.stats() if gate else {},
+                "inference_pool": pool.stats() if pool else {},
+                "adaptive": adaptive_detector().stats() if ADAPTIVE_INFER and pool is None else {},
+                "controller": controller.stats() if controller else {},
+                "metrics": metrics_registry.snapshot() if METRICS_ENABLED else {},
+                "event_bus": bus.stats() if bus else {},
+                "db_maintenance": maintenance.stats() if maintenance else {},
+            })
+
+        failed = next((stage for stage in stages if stage.error is not None), None)
+        if failed is not None:
+            raise failed.error
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        report_error("RUNTIME", "Main loop crashed", str(e))
+        raise
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,225 @@
+"""
+Per-stage latency instrumentation.
+
+    from metrics import span, observe
+
+    with span("detect"):
+        dets = detect_array(frame)
+    observe("speech_queue", queue_ms)
+
+Every stage name gets a fixed-bucket histogram (milliseconds, monotonic
+clock). Histograms are cumulative for the metrics endpoint and also keep a
+window since the last take_window() call, used for the periodic SQLite
+summary rows (VADatabase.insert_latency_summary).
+
+MetricsServer serves them on localhost:
+    /metrics       Prometheus text format
+    /metrics.json  JSON snapshot (count / mean / p50 / p95 / p99 / max per stage)
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_HOST, METRICS_PORT
+
+# Upper bucket bounds in ms (an implicit +Inf bucket follows)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max", "_lock", "_prev_counts", "_prev_sum", "_window_max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+        self._prev_counts = list(self.counts)
+        self._prev_sum = 0.0
+        self._window_max = 0.0
+
+    def observe(self, ms: float):
+        i = bisect_left(BUCKETS_MS, ms)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += ms
+            if ms > self.max:
+                self.max = ms
+            if ms > self._window_max:
+                self._window_max = ms
+
+    def take_window(self) -> dict:
+        """Summary of the observations since the previous call."""
+        with self._lock:
+            counts = [c - p for c, p in zip(self.counts, self._prev_counts)]
+            total = self.sum - self._prev_sum
+            window_max = self._window_max
+            self._prev_counts = list(self.counts)
+            self._prev_sum = self.sum
+            self._window_max = 0.0
+        return summarize(counts, total, window_max)
+
+    def summary(self) -> dict:
+        with self._lock:
+            counts, total, peak = list(self.counts), self.sum, self.max
+        return summarize(counts, total, peak)
+
+
+def quantile(counts: list, q: float) -> float:
+    """Estimate a quantile from bucket counts (linear within the bucket)."""
+    n = sum(counts)
+    if not n:
+        return 0.0
+    rank = q * n
+    seen = 0
+    for i, c in enumerate(counts):
+        if c and seen + c >= rank:
+            lower = BUCKETS_MS[i - 1] if i > 0 else 0.0
+            upper = BUCKETS_MS[i] if i < len(BUCKETS_MS) else BUCKETS_MS[-1] * 2
+            return lower + (upper - lower) * (rank - seen) / c
+        seen += c
+    return float(BUCKETS_MS[-1])
+
+
+def summarize(counts: list, total_ms: float, max_ms: float) -> dict:
+    n = sum(counts)
+    # Quantiles are bucket estimates; never report them above the true max
+    return {
+        "count": n,
+        "mean_ms": round(total_ms / n, 3) if n else 0.0,
+        "p50_ms": round(min(quantile(counts, 0.50), max_ms), 3),
+        "p95_ms": round(min(quantile(counts, 0.95), max_ms), 3),
+        "p99_ms": round(min(quantile(counts, 0.99), max_ms), 3),
+        "max_ms": round(max_ms, 3),
+    }
+
+
+class _Span:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe((time.perf_counter_ns() - self.t0) / 1e6)
+
+
+class Registry:
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+        self.span_overhead_ns = None   # filled by measure_overhead()
+
+    def histogram(self, name: str) -> Histogram:
+        hist = self._hists.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, Histogram())
+        return hist
+
+    def span(self, name: str) -> _Span:
+        """Context manager timing its body into histogram `name`."""
+        return _Span(self.histogram(name))
+
+    def observe(self, name: str, ms: float):
+        self.histogram(name).observe(ms)
+
+    def names(self) -> list:
+        return sorted(self._hists)
+
+    def take_window(self) -> dict:
+        return {name: self._hists[name].take_window() for name in self.names()}
+
+    def snapshot(self) -> dict:
+        stages = {name: self._hists[name].summary() for name in self.names()}
+        out = {"stages": stages}
+        if self.span_overhead_ns is not None:
+            spans = sum(s["count"] for s in stages.values())
+            out["span_overhead_ns"] = self.span_overhead_ns
+            out["instrumentation_ms"] = round(spans * self.span_overhead_ns / 1e6, 3)
+        return out
+
+    def prometheus(self) -> str:
+        lines = ["# TYPE va_stage_latency_ms histogram"]
+        for name in self.names():
+            hist = self._hists[name]
+            with hist._lock:
+                counts, total, n = list(hist.counts), hist.sum, hist.count
+            cumulative = 0
+            for bound, c in zip(BUCKETS_MS + ("+Inf",), counts):
+                cumulative += c
+                lines.append(f'va_stage_latency_ms_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'va_stage_latency_ms_sum{{stage="{name}"}} {total:.3f}')
+            lines.append(f'va_stage_latency_ms_count{{stage="{name}"}} {n}')
+        if self.span_overhead_ns is not None:
+            lines.append("# TYPE va_span_overhead_ns gauge")
+            lines.append(f"va_span_overhead_ns {self.span_overhead_ns}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+span = registry.span
+observe = registry.observe
+
+
+def measure_overhead(samples: int = 20000) -> float:
+    """
+    Cost of one empty span (ns), measured on a scratch registry so the real
+    histograms are untouched. Stored on the global registry and returned.
+    """
+    scratch = Registry()
+    scratch.span("x")   # create the histogram outside the timed loop
+    t0 = time.perf_counter_ns()
+    for _ in range(samples):
+        with scratch.span("x"):
+            pass
+    per_span = round((time.perf_counter_ns() - t0) / samples, 1)
+    registry.span_overhead_ns = per_span
+    return per_span
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = registry.prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(registry.snapshot()).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass   # keep scrapes out of stderr
+
+
+class MetricsServer:
+    """Localhost-only HTTP endpoint for scraping the registry."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
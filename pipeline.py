@@ -0,0 +1,59 @@
+import threading
+import time
+
+
+class Stage(threading.Thread):
+    """
+    One pipeline stage on its own thread: `take()` waits for the next input
+    (None on timeout) and `work(item)` handles it.
+
+    Stages hand work to each other through their own structures (the capture
+    ring, the inference pool, the speech scheduler); `depth()` and
+    `dropped()` report that input. An exception in `work` is kept in `error`
+    and sets `stop_event`, taking the whole pipeline down.
+
+    Counters:
+        processed -> items handled by `work`
+        stall_s   -> time spent in `take` (waiting for input)
+        busy_s    -> time spent in `work`
+    """
+
+    def __init__(self, name: str, take, work, stop_event: threading.Event, depth=None, dropped=None):
+        super().__init__(name=name, daemon=True)
+        self.take = take
+        self.work = work
+        self.stop_event = stop_event
+        self.depth = depth
+        self.dropped = dropped
+        self.processed = 0
+        self.stall_s = 0.0
+        self.busy_s = 0.0
+        self.error = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                t_wait = time.monotonic()
+                item = self.take()
+                t_work = time.monotonic()
+                self.stall_s += t_work - t_wait
+                if item is None:
+                    continue
+                self.work(item)
+            except Exception as e:
+                # Record the failure and take the whole pipeline down with it
+                self.error = e
+                self.stop_event.set()
+                return
+            self.busy_s += time.monotonic() - t_work
+            self.processed += 1
+
+    def stats(self) -> dict:
+        return {
+            "stage": self.name,
+            "processed": self.processed,
+            "queue_depth": self.depth() if self.depth is not None else 0,
+            "dropped": self.dropped() if self.dropped is not None else 0,
+            "stall_s": round(self.stall_s, 3),
+            "busy_s": round(self.busy_s, 3),
+        }
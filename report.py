@@ -0,0 +1,168 @@
+"""
+Session reports from the edge database.
+
+Reads only the summary tables (session_summary, session_detect_ms,
+detection_minute), so answers stay fast however large the raw tables get.
+
+Usage:
+    python report.py sessions                  [--limit 20]
+    python report.py detect-ms   --session N
+    python report.py labels      --session N   [--by hour|minute|session]
+    python report.py tts         [--session N]
+Options:
+    --refresh        fold new rows into the summaries first (otherwise they are
+                     as of the last end_session / maintenance pass)
+    --format json    machine-readable output
+    --db PATH        database file (default: DB_PATH)
+"""
+import argparse
+import json
+import sys
+import time
+
+from config import DB_PATH
+from db_access import connect
+
+
+def _percentile(hist: list, q: float):
+    """hist: [(detect_ms, frames)] ordered by detect_ms."""
+    total = sum(frames for _, frames in hist)
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for value, frames in hist:
+        seen += frames
+        if seen > rank:
+            return value
+    return hist[-1][0]
+
+
+def sessions(con, limit: int = 20) -> list:
+    rows = con.execute(
+        """SELECT r.id, r.start_time_utc, r.end_time_utc, r.app_version,
+                  s.frames, s.objects, s.detect_ms_sum, s.audio_events, s.audio_failures
+           FROM run_session r LEFT JOIN session_summary s ON s.session_id = r.id
+           ORDER BY r.id DESC LIMIT ?""",
+        (limit,),
+    ).fetchall()
+    return [
+        {
+            "session_id": sid, "start_utc": start, "end_utc": end, "app_version": version,
+            "frames": frames or 0, "objects": objects or 0,
+            "detect_ms_mean": round(ms_sum / frames, 1) if frames else None,
+            "tts_failure_rate": round(failures / events, 4) if events else None,
+        }
+        for sid, start, end, version, frames, objects, ms_sum, events, failures in rows
+    ]
+
+
+def detect_ms(con, session_id: int) -> dict:
+    hist = con.execute(
+        "SELECT detect_ms, frames FROM session_detect_ms WHERE session_id=? ORDER BY detect_ms",
+        (session_id,),
+    ).fetchall()
+    frames = sum(f for _, f in hist)
+    return {
+        "session_id": session_id,
+        "frames": frames,
+        "mean": round(sum(ms * f for ms, f in hist) / frames, 2) if frames else None,
+        "p50": _percentile(hist, 0.50),
+        "p90": _percentile(hist, 0.90),
+        "p95": _percentile(hist, 0.95),
+        "p99": _percentile(hist, 0.99),
+        "max": hist[-1][0] if hist else None,
+    }
+
+
+def labels(con, session_id: int, by: str = "hour") -> list:
+    # detection_minute keys are "YYYY-MM-DDTHH:MM"; its primary key covers this query
+    width = {"minute": 16, "hour": 13, "session": 0}[by]
+    bucket = f"substr(minute_utc, 1, {width})" if width else "''"
+    rows = con.execute(
+        f"""SELECT {bucket} AS period, object_label, SUM(detections), SUM(conf_sum), MAX(conf_max)
+            FROM detection_minute WHERE session_id=?
+            GROUP BY period, object_label
+            ORDER BY period, SUM(detections) DESC""",
+        (session_id,),
+    ).fetchall()
+    return [
+        {"period": period or None, "label": label, "detections": count,
+         "conf_mean": round(conf_sum / count, 3), "conf_max": round(conf_max, 3)}
+        for period, label, count, conf_sum, conf_max in rows
+    ]
+
+
+def tts(con, session_id: int | None = None) -> dict:
+    where, params = ("WHERE session_id=?", (session_id,)) if session_id is not None else ("", ())
+    events, failures, preempted, queue_sum = con.execute(
+        f"""SELECT COALESCE(SUM(audio_events), 0), COALESCE(SUM(audio_failures), 0),
+                   COALESCE(SUM(audio_preempted), 0), COALESCE(SUM(queue_ms_sum), 0)
+            FROM session_summary {where}""",
+        params,
+    ).fetchone()
+    return {
+        "session_id": session_id,
+        "audio_events": events,
+        "failures": failures,
+        "failure_rate": round(failures / events, 4) if events else None,
+        "preempted": preempted,
+        "queue_ms_mean": round(queue_sum / events, 1) if events else None,
+    }
+
+
+def _print_text(result):
+    rows = result if isinstance(result, list) else [result]
+    if not rows:
+        print("(no rows)")
+        return
+    keys = list(rows[0])
+    widths = {k: max(len(k), *(len(str(r[k])) for r in rows)) for k in keys}
+    print("  ".join(k.ljust(widths[k]) for k in keys))
+    for r in rows:
+        print("  ".join(str(r[k]).ljust(widths[k]) for k in keys))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Visual assistant session reports")
+    parser.add_argument("report", choices=("sessions", "detect-ms", "labels", "tts"))
+    parser.add_argument("--session", type=int, default=None, help="run_session id")
+    parser.add_argument("--by", choices=("hour", "minute", "session"), default="hour")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--refresh", action="store_true", help="update the summary tables first")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    if args.report in ("detect-ms", "labels") and args.session is None:
+        parser.error(f"{args.report} needs --session")
+
+    if args.refresh:
+        from va_db import VADatabase
+        VADatabase(args.db, write_behind=False).refresh_summaries(args.session)
+
+    t0 = time.perf_counter()
+    con = connect(args.db, readonly=True)
+    try:
+        if args.report == "sessions":
+            result = sessions(con, args.limit)
+        elif args.report == "detect-ms":
+            result = detect_ms(con, args.session)
+        elif args.report == "labels":
+            result = labels(con, args.session, args.by)
+        else:
+            result = tts(con, args.session)
+    finally:
+        con.close()
+    query_ms = round((time.perf_counter() - t0) * 1000.0, 2)
+
+    if args.format == "json":
+        print(json.dumps({"report": args.report, "query_ms": query_ms, "result": result}, indent=2))
+    else:
+        _print_text(result)
+        print(f"({query_ms} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
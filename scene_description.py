@@ -0,0 +1,69 @@
+"""
+One spoken sentence for a group of announcements:
+
+    [person@left, person@left, chair@left]        -> "two people and a chair on your left"
+    [person@left, car@right]                      -> "a person on your left, a car on your right"
+
+Objects keep the order they come in (highest priority first); positions are
+the thirds of the frame the box center falls in.
+"""
+from config import FRAME_WIDTH
+
+POSITIONS = ("on your left", "ahead", "on your right")
+
+_NUMBERS = ("zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten")
+
+# COCO labels whose plural is not label + "s"
+_PLURALS = {
+    "person": "people", "mouse": "mice", "knife": "knives", "sheep": "sheep",
+    "skis": "skis", "scissors": "scissors", "skateboard": "skateboards",
+}
+# Plural-only COCO labels: counted in pairs ("a pair of skis", "two pairs of scissors")
+_PAIRS = {"skis", "scissors"}
+
+
+def plural(label: str) -> str:
+    if label in _PLURALS:
+        return _PLURALS[label]
+    if label.endswith(("s", "sh", "ch", "x", "z")):
+        return label + "es"
+    if label.endswith("y") and label[-2:-1] not in "aeiou":
+        return label[:-1] + "ies"
+    return label + "s"
+
+
+def counted(label: str, count: int) -> str:
+    """'a chair', 'an apple', 'two people', '12 cars', 'a pair of skis'."""
+    if label in _PAIRS:
+        return f"{counted('pair', count)} of {label}"
+    if count == 1:
+        return ("an " if label[0] in "aeiou" else "a ") + label
+    number = _NUMBERS[count] if count < len(_NUMBERS) else str(count)
+    return f"{number} {plural(label)}"
+
+
+def position_of(box) -> str:
+    """Coarse horizontal position of a (box_x, box_y, box_w, box_h) box."""
+    center = (box[0] + box[2] / 2.0) / FRAME_WIDTH
+    return POSITIONS[min(2, max(0, int(center * 3)))]
+
+
+def _join(parts: list) -> str:
+    if len(parts) == 1:
+        return parts[0]
+    return ", ".join(parts[:-1]) + " and " + parts[-1]
+
+
+def describe(objects) -> str:
+    """Sentence for (label, box) pairs; box None = no position."""
+    groups = {}   # position -> {label: count}, in first-seen order
+    for label, box in objects:
+        where = position_of(box) if box is not None else ""
+        counts = groups.setdefault(where, {})
+        counts[label] = counts.get(label, 0) + 1
+
+    clauses = []
+    for where, counts in groups.items():
+        things = _join([counted(label, n) for label, n in counts.items()])
+        clauses.append(f"{things} {where}" if where else things)
+    return ", ".join(clauses)
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+
+from config import GATE_DOWNSCALE, GATE_PIXEL_DELTA, GATE_CHANGED_FRACTION, GATE_MAX_STALE_S
+
+
+class SceneGate:
+    """
+    Cheap scene-change check that runs before YOLO.
+
+    The caller passes a strided view of the frame (`frame.downscaled(gate.step)`,
+    no copy); it is reduced to grayscale and compared with the view of the last
+    frame that went through inference. Inference runs only when enough pixels
+    changed or when the last result is too old.
+    """
+
+    def __init__(self, step: int = GATE_DOWNSCALE, pixel_delta: int = GATE_PIXEL_DELTA,
+                 changed_fraction: float = GATE_CHANGED_FRACTION, max_stale_s: float = GATE_MAX_STALE_S):
+        self.step = max(1, int(step))
+        # Gray values are the sum of the 3 channels (0..765), so scale the threshold
+        self.delta = int(pixel_delta) * 3
+        self.changed_fraction = changed_fraction
+        self.max_stale_s = max_stale_s
+
+        self._ref = None          # gray view of the last inferred frame
+        self._last_run = 0.0      # monotonic time of the last inference
+        self.checks = 0
+        self.skips = 0
+        self.cost_s = 0.0
+
+    @staticmethod
+    def _gray(small):
+        # The channel sum is the only allocation
+        if small.ndim == 3:
+            return small.sum(axis=2, dtype=np.int16)
+        return small.astype(np.int16) * 3
+
+    def should_infer(self, small) -> bool:
+        """Return True when the scene changed enough (or is stale) to run inference."""
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        gray = self._gray(small)
+
+        if self._ref is None or self._ref.shape != gray.shape or now - self._last_run >= self.max_stale_s:
+            run = True
+        else:
+            changed = np.count_nonzero(np.abs(gray - self._ref) > self.delta)
+            run = changed >= self.changed_fraction * gray.size
+
+        if run:
+            self._ref = gray
+            self._last_run = now
+        else:
+            self.skips += 1
+
+        self.checks += 1
+        self.cost_s += time.perf_counter() - t0
+        return run
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "skips": self.skips,
+            "skip_ratio": round(self.skips / self.checks, 3) if self.checks else 0.0,
+            "avg_cost_ms": round(1000.0 * self.cost_s / self.checks, 3) if self.checks else 0.0,
+        }
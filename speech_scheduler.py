@@ -0,0 +1,199 @@
+import heapq
+import itertools
+import threading
+import time
+
+from config import (
+    FRAME_WIDTH, FRAME_HEIGHT, CLASS_PRIORITY, SPEECH_QUEUE_SIZE,
+    SPEECH_MAX_AGE_S, SPEECH_PREEMPT_RATIO
+)
+
+
+class Announcement:
+    __slots__ = ("label", "track_id", "frame_id", "box", "priority", "created", "dropped_before", "seq")
+
+    def __init__(self, label: str, track_id, frame_id, priority: float, box=None):
+        self.label = label
+        self.track_id = track_id
+        self.frame_id = frame_id
+        self.box = box            # (box_x, box_y, box_w, box_h), for the spoken position
+        self.priority = priority
+        self.created = time.monotonic()
+        self.dropped_before = 0   # announcements dropped while this one was queued
+        self.seq = None           # heap entry of this announcement (set by the scheduler)
+
+    @property
+    def key(self):
+        return (self.label, self.track_id)
+
+    def queue_ms(self) -> int:
+        return int((time.monotonic() - self.created) * 1000)
+
+
+def priority_of(label: str, box_x: int, box_y: int, box_w: int, box_h: int) -> float:
+    """
+    Rank an object for announcement: class importance scaled by how big it is,
+    how close it looks (bottom edge low in the frame) and how central it is.
+    """
+    area = (box_w * box_h) / float(FRAME_WIDTH * FRAME_HEIGHT)
+    nearness = min(1.0, max(0.0, (box_y + box_h) / float(FRAME_HEIGHT)))
+    center_x = (box_x + box_w / 2.0) / FRAME_WIDTH
+    centrality = 1.0 - min(1.0, abs(center_x - 0.5) * 2.0)
+    return CLASS_PRIORITY.get(label, 1.0) * (1.0 + 2.0 * area + nearness + 0.5 * centrality)
+
+
+class SpeechScheduler:
+    """
+    Priority queue of pending announcements between DedupeSpeaker and tts_piper.
+
+    - next() hands out the highest-priority announcement that is not too old;
+      next_batch() also takes every other live one, to be spoken as one sentence.
+    - update_present() drops pending announcements whose object is gone.
+    - should_preempt() tells the producer to cut the current playback short
+      when something much more important is waiting.
+    """
+
+    def __init__(self, capacity: int = SPEECH_QUEUE_SIZE, max_age_s: float = SPEECH_MAX_AGE_S,
+                 preempt_ratio: float = SPEECH_PREEMPT_RATIO):
+        self.capacity = max(1, int(capacity))
+        self.max_age_s = max_age_s
+        self.preempt_ratio = preempt_ratio
+        self._pending = {}            # key -> Announcement
+        self._heap = []               # (-priority, seq, key); stale entries are skipped
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.current = None           # highest-priority announcement being spoken
+        self._current_keys = set()    # every key in the utterance being spoken
+
+        self.submitted = 0
+        self.spoken = 0
+        self.dropped_gone = 0         # object left the scene before being spoken
+        self.dropped_expired = 0      # waited longer than max_age_s
+        self.dropped_overflow = 0     # lowest priority evicted when full
+        self.preempted = 0
+
+    def _count_drop(self, counter: str):
+        setattr(self, counter, getattr(self, counter) + 1)
+        for ann in self._pending.values():
+            ann.dropped_before += 1
+
+    def _drop(self, key, counter: str):
+        self._pending.pop(key, None)
+        self._count_drop(counter)
+
+    def is_queued(self, key) -> bool:
+        with self._cond:
+            return key in self._pending or key in self._current_keys
+
+    def submit(self, label: str, track_id, frame_id, box) -> bool:
+        """Queue an announcement; `box` is (box_x, box_y, box_w, box_h)."""
+        ann = Announcement(label, track_id, frame_id, priority_of(label, *box), box)
+        with self._cond:
+            if ann.key in self._pending or ann.key in self._current_keys:
+                return False
+
+            if len(self._pending) >= self.capacity:
+                lowest = min(self._pending.values(), key=lambda a: a.priority)
+                if lowest.priority >= ann.priority:
+                    self._count_drop("dropped_overflow")
+                    return False
+                self._drop(lowest.key, "dropped_overflow")
+
+            ann.seq = next(self._seq)
+            self._pending[ann.key] = ann
+            if len(self._heap) >= 4 * self.capacity:
+                # Mostly entries of dropped announcements: rebuild from what is pending
+                self._heap = [(-a.priority, a.seq, a.key) for a in self._pending.values() if a is not ann]
+                heapq.heapify(self._heap)
+            heapq.heappush(self._heap, (-ann.priority, ann.seq, ann.key))
+            self.submitted += 1
+            self._cond.notify_all()
+            return True
+
+    def update_present(self, present_keys: set):
+        """Forget pending announcements for objects that are no longer detected."""
+        with self._cond:
+            for key in [k for k in self._pending if k not in present_keys]:
+                self._drop(key, "dropped_gone")
+
+    def should_preempt(self) -> bool:
+        with self._cond:
+            if self.current is None or not self._pending:
+                return False
+            best = max(a.priority for a in self._pending.values())
+            return best >= self.current.priority * self.preempt_ratio
+
+    def _pop_live(self):
+        """Best pending announcement that is not too old, or None (lock held)."""
+        while self._heap:
+            _, seq, key = heapq.heappop(self._heap)
+            ann = self._pending.get(key)
+            if ann is None or ann.seq != seq:
+                # Already dropped, or dropped and submitted again: that
+                # announcement has its own entry at its own priority
+                continue
+            del self._pending[key]
+            if time.monotonic() - ann.created > self.max_age_s:
+                self._count_drop("dropped_expired")
+                continue
+            return ann
+        return None
+
+    def next(self, timeout: float | None = None) -> Announcement | None:
+        """Pop the best live announcement (blocks up to `timeout`)."""
+        batch = self.next_batch(timeout, limit=1)
+        return batch[0] if batch else None
+
+    def next_batch(self, timeout: float | None = None, limit: int | None = None) -> list:
+        """
+        Pop the best live announcement plus up to `limit` - 1 more, best
+        first (blocks up to `timeout` for the first one; [] on timeout).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                ann = self._pop_live()
+                if ann is not None:
+                    batch = [ann]
+                    while limit is None or len(batch) < limit:
+                        more = self._pop_live()
+                        if more is None:
+                            break
+                        batch.append(more)
+                    self.current = ann
+                    self._current_keys = {a.key for a in batch}
+                    return batch
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+    def done(self, ann: Announcement, preempted: bool = False):
+        self.done_batch([ann], preempted)
+
+    def done_batch(self, batch: list, preempted: bool = False):
+        with self._cond:
+            if self.current is not None and self.current in batch:
+                self.current = None
+                self._current_keys = set()
+            if preempted:
+                self.preempted += len(batch)
+            else:
+                self.spoken += len(batch)
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "spoken": self.spoken,
+                "dropped_gone": self.dropped_gone,
+                "dropped_expired": self.dropped_expired,
+                "dropped_overflow": self.dropped_overflow,
+                "preempted": self.preempted,
+            }
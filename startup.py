@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Startup:
+    """
+    Startup phase: run independent initialization tasks concurrently and
+    time each one.
+
+        startup = Startup()
+        results = startup.run({"db": open_db, "model": warm_up, ...}, optional=("tts",))
+        startup.timings   -> {"db": 41.0, "model": 2310.5, ..., "total": 2315.2} (ms)
+
+    A failing task re-raises from run() unless it is listed in `optional`,
+    in which case its result is None and the error is kept in `errors`.
+    Before re-raising, `cleanup[name](result)` releases every task that did
+    come up (open session, camera, worker processes), so nothing leaks.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def _timed(self, name: str, task):
+        t0 = time.perf_counter()
+        try:
+            return task()
+        finally:
+            with self._lock:
+                self.timings[name] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    def run(self, tasks: dict, optional=(), cleanup=None) -> dict:
+        t0 = time.perf_counter()
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="startup") as pool:
+            futures = {name: pool.submit(self._timed, name, task) for name, task in tasks.items()}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    self.errors[name] = e
+                    results[name] = None
+        self.timings["total"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+        for name, error in self.errors.items():
+            if name not in optional:
+                self._release(results, cleanup or {})
+                raise error
+        return results
+
+    def _release(self, results: dict, cleanup: dict):
+        for name, release in cleanup.items():
+            if name in self.errors or name not in results:
+                continue
+            try:
+                release(results[name])
+            except Exception as e:
+                # Best effort: the startup error is the one worth raising
+                self.errors.setdefault(f"{name}_cleanup", e)
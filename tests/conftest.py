@@ -0,0 +1,24 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCHEMA = os.path.join(ROOT, "db_scripts", "VAv1_DB_SQLitev3.sql")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fresh database with the full schema (script + VADatabase migrations)."""
+    from va_db import VADatabase
+
+    path = str(tmp_path / "va.db")
+    con = sqlite3.connect(path)
+    with open(SCHEMA, encoding="utf-8") as f:
+        con.executescript(f.read())
+    con.close()
+    VADatabase(path, write_behind=False)._dal.close()
+    return path
@@ -0,0 +1,88 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from db_access import DataAccess, connect, SQL_INSERT_SESSION, utc_iso
+from db_maintenance import DatabaseMaintenance, rollup_detections, refresh_summaries
+
+
+def _session(dal) -> int:
+    return dal.insert(SQL_INSERT_SESSION, (None, utc_iso(), "test", None, None))
+
+
+def _frames(dal, session_id: int, count: int, dets: int, days_ago: float = 0.0):
+    at = (datetime.now(timezone.utc) - timedelta(days=days_ago)).isoformat()
+    for n in range(count):
+        dal.insert_frame((None, session_id, n, at, 10, dets),
+                         [(session_id, "person", 0.5, 1, 2, 3, 4, None)] * dets)
+
+
+def _summary(dal, session_id: int):
+    return dal.query_one(
+        "SELECT frames, objects FROM session_summary WHERE session_id=?", (session_id,))
+
+
+def _rolled(dal, session_id: int) -> int:
+    (count,) = dal.query_one(
+        "SELECT COALESCE(SUM(detections), 0) FROM detection_minute WHERE session_id=?", (session_id,))
+    return count
+
+
+def test_new_rows_after_full_prune_are_summarized(db_path):
+    dal = DataAccess(db_path)
+    old = _session(dal)
+    _frames(dal, old, count=10, dets=2, days_ago=30)
+
+    maintenance = DatabaseMaintenance(db_path, retention_days=7, chunk_rows=4)
+    maintenance.run_once()
+    assert _summary(dal, old) == (10, 20)
+    assert maintenance.pruned_frames > 0
+
+    new = _session(dal)
+    _frames(dal, new, count=3, dets=2)
+    maintenance.run_once()
+
+    assert _summary(dal, new) == (3, 6)
+    assert _rolled(dal, new) == 6
+    assert _summary(dal, old) == (10, 20)
+    dal.close()
+
+
+def test_watermark_above_max_id_is_reset(db_path):
+    dal = DataAccess(db_path)
+    session_id = _session(dal)
+    _frames(dal, session_id, count=3, dets=2)
+    # State left behind by a prune that emptied the tables (ids restarted at 1)
+    dal.execute("UPDATE maintenance_state SET value=100")
+
+    con = connect(db_path, isolation_level=None)
+    assert rollup_detections(con) == 6
+    assert refresh_summaries(con) == 3
+    con.close()
+
+    assert _summary(dal, session_id) == (3, 6)
+    assert dal.query_one("SELECT value FROM maintenance_state WHERE name='rolled_detection_id'") == (6,)
+    dal.close()
+
+
+def test_concurrent_passes_do_not_double_count(db_path):
+    dal = DataAccess(db_path)
+    session_id = _session(dal)
+    _frames(dal, session_id, count=200, dets=3)
+
+    def run():
+        con = connect(db_path, isolation_level=None)
+        try:
+            rollup_detections(con, chunk_rows=7)
+            refresh_summaries(con, chunk_rows=7)
+        finally:
+            con.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert _rolled(dal, session_id) == 600
+    assert _summary(dal, session_id) == (200, 600)
+    dal.close()
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from inference_controller import InferenceController, SysfsSensors
+
+SIZES = (320, 416, 512, 640)
+
+
+def _write(root, rel, value):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{value}\n")
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """Fake sysfs tree: set(temp_c=..., freq_khz=..., max_khz=...) rewrites the files."""
+    root = str(tmp_path)
+
+    def set_state(temp_c=50.0, freq_khz=2400000, max_khz=2400000):
+        _write(root, SysfsSensors.TEMP, int(temp_c * 1000))
+        _write(root, SysfsSensors.FREQ, freq_khz)
+        _write(root, SysfsSensors.FREQ_MAX, max_khz)
+
+    set_state()
+    set_state.root = root
+    return set_state
+
+
+def _controller(sysfs, base_stride=1, sizes=SIZES, **kwargs):
+    return InferenceController(base_stride, sizes, sensors=SysfsSensors(sysfs.root),
+                               target_ms=200.0, interval_s=2.0, max_stride=4, **kwargs)
+
+
+def _feed(controller, detect_ms, frames=20, changed=True):
+    for _ in range(frames):
+        controller.observe(detect_ms, changed=changed)
+
+
+def test_sensors_read_fake_tree(sysfs):
+    sysfs(temp_c=72.5, freq_khz=1500000, max_khz=2400000)
+    sensors = SysfsSensors(sysfs.root)
+    assert sensors.temp_c() == pytest.approx(72.5)
+    assert sensors.freq_ratio() == pytest.approx(0.625)
+
+
+def test_missing_sensors_are_ignored(tmp_path):
+    sensors = SysfsSensors(str(tmp_path))
+    assert sensors.temp_c() is None
+    assert sensors.freq_ratio() is None
+
+    controller = InferenceController(1, SIZES, sensors=sensors, target_ms=200.0)
+    _feed(controller, 100.0)
+    assert controller.step()["reason"] == "headroom (at limit)"
+
+
+def test_hot_cpu_shrinks_input_then_raises_stride(sysfs):
+    sysfs(temp_c=82.0)
+    changes = []
+    controller = _controller(sysfs, on_change=lambda stride, imgsz: changes.append((stride, imgsz)))
+
+    for _ in range(len(SIZES) + 1):
+        _feed(controller, 100.0)
+        assert controller.step()["reason"] == "hot"
+
+    assert changes == [(1, 512), (1, 416), (1, 320), (2, 320), (3, 320)]
+    assert controller.decisions[-1]["temp_c"] == 82.0
+
+
+def test_throttled_clock_counts_as_hot_only_when_warm(sysfs):
+    sysfs(temp_c=75.0, freq_khz=1200000)
+    controller = _controller(sysfs)
+    _feed(controller, 100.0)
+    assert controller.step()["reason"] == "hot"
+
+    # Same low clock on a cool CPU is the governor idling, not throttling
+    sysfs(temp_c=45.0, freq_khz=1200000)
+    _feed(controller, 100.0)
+    assert controller.step()["reason"] == "headroom"
+
+
+def test_slow_detect_then_recovery(sysfs):
+    controller = _controller(sysfs, base_stride=2)
+    _feed(controller, 300.0)
+    decision = controller.step()
+    assert (decision["reason"], controller.imgsz) == ("slow", 512)
+    assert decision["p90_ms"] == 300.0
+
+    # Plenty of headroom on a cool CPU: the input size comes back up
+    _feed(controller, 50.0)
+    assert controller.step()["reason"] == "headroom"
+    assert (controller.stride, controller.imgsz) == (2, 640)
+
+
+def test_idle_scene_raises_stride_and_activity_brings_it_back(sysfs):
+    controller = _controller(sysfs)
+    _feed(controller, 150.0, changed=False)
+    assert controller.step()["reason"] == "idle"
+    assert controller.stride == 2
+
+    _feed(controller, 150.0, changed=True)
+    assert controller.step()["reason"] == "active"
+    assert controller.stride == 1
+
+
+def test_maybe_update_waits_for_the_interval(sysfs):
+    now = [0.0]
+    controller = _controller(sysfs, clock=lambda: now[0])
+    _feed(controller, 100.0)
+    assert controller.maybe_update() is None
+    now[0] = 2.5
+    assert controller.maybe_update() is not None
+    assert controller.maybe_update() is None
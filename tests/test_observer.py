@@ -0,0 +1,42 @@
+import os
+import sys
+
+from db_access import DataAccess, SQL_INSERT_SESSION, utc_iso
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "framework"))
+import observer  # noqa: E402
+
+
+def _frames(db_path, count: int):
+    dal = DataAccess(db_path)
+    session_id = dal.insert(SQL_INSERT_SESSION, (None, utc_iso(), "test", None, None))
+    for n in range(1, count + 1):
+        dal.insert_frame((None, session_id, n, utc_iso(), 10, 1),
+                         [(session_id, f"label{n}", 0.5, 1, 2, 3, 4, None)])
+    dal.close()
+
+
+def _detection(frame_id: int) -> dict:
+    return {"type": "detection", "frame_id": frame_id,
+            "objects": [{"label": f"label{frame_id}", "conf": 0.5, "track_id": None}]}
+
+
+def test_backlog_replay_is_limited(db_path, capsys):
+    _frames(db_path, 100)
+    feed = observer.DatabaseFeed(db_path, backlog_rows=10)
+    assert feed.poll() == 10
+    assert "frame=91 " in capsys.readouterr().out
+    feed.close()
+
+
+def test_socket_events_after_catch_up_are_printed_once(db_path, capsys, monkeypatch):
+    _frames(db_path, 5)
+    # Subscribed while frames 4 and 5 were being committed: both arrive on the socket too
+    monkeypatch.setattr(observer, "subscribe", lambda path: iter([_detection(n) for n in (4, 5, 6, 7)]))
+    feed = observer.DatabaseFeed(db_path, backlog_rows=3)
+    assert observer.follow_socket(feed)
+    feed.close()
+
+    out = capsys.readouterr().out
+    assert [f"frame={n} " in out for n in range(1, 8)] == [False, False, True, True, True, True, True]
+    assert out.count("frame=5 ") == 1
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from pipeline import Stage
+
+
+def test_stall_and_busy_time_are_split():
+    stop = threading.Event()
+    inputs = [None, None, "a", None, "b"]
+    handled = []
+
+    def take():
+        time.sleep(0.02)
+        if not inputs:
+            stop.set()
+            return None
+        return inputs.pop(0)
+
+    def work(item):
+        time.sleep(0.05)
+        handled.append(item)
+
+    stage = Stage("test", take, work, stop, depth=lambda: len(inputs), dropped=lambda: 3)
+    stage.start()
+    stage.join(timeout=5)
+
+    stats = stage.stats()
+    assert handled == ["a", "b"]
+    assert stats["processed"] == 2            # empty takes are not counted
+    assert stats["queue_depth"] == 0 and stats["dropped"] == 3
+    assert 0.1 <= stats["busy_s"] < 0.15      # two work() calls only
+    assert stats["stall_s"] >= 0.12           # six take() calls
+
+
+def test_work_error_stops_the_pipeline():
+    stop = threading.Event()
+
+    def work(item):
+        raise RuntimeError("boom")
+
+    stage = Stage("test", lambda: 1, work, stop)
+    stage.start()
+    stage.join(timeout=5)
+    assert stop.is_set()
+    assert str(stage.error) == "boom"
@@ -0,0 +1,22 @@
+from scene_description import counted, describe
+
+LEFT = (0, 0, 50, 50)
+
+
+def test_counted():
+    assert counted("chair", 1) == "a chair"
+    assert counted("apple", 1) == "an apple"
+    assert counted("person", 2) == "two people"
+    assert counted("bus", 3) == "three buses"
+    assert counted("car", 12) == "12 cars"
+
+
+def test_plural_only_labels_are_counted_in_pairs():
+    assert counted("skis", 1) == "a pair of skis"
+    assert counted("scissors", 1) == "a pair of scissors"
+    assert counted("scissors", 2) == "two pairs of scissors"
+
+
+def test_describe_groups_by_position():
+    objects = [("person", LEFT), ("person", LEFT), ("skis", LEFT), ("car", (600, 0, 40, 40))]
+    assert describe(objects) == "two people and a pair of skis on your left, a car on your right"
@@ -0,0 +1,19 @@
+import numpy as np
+
+from frame_source import SourceFrame
+from scene_gate import SceneGate
+
+
+def test_gate_compares_the_downscaled_view_of_the_frame():
+    gate = SceneGate(step=4, pixel_delta=10, changed_fraction=0.1, max_stale_s=60.0)
+    array = np.zeros((64, 64, 3), dtype=np.uint8)
+    frame = SourceFrame(0, 0.0, array)
+
+    view = frame.downscaled(gate.step)
+    assert view.shape == (16, 16, 3) and np.shares_memory(view, array)
+
+    assert gate.should_infer(frame.downscaled(gate.step))      # first frame
+    assert not gate.should_infer(frame.downscaled(gate.step))  # unchanged
+    array[:32] = 200
+    assert gate.should_infer(frame.downscaled(gate.step))
+    assert gate.stats()["skips"] == 1
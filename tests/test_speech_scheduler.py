@@ -0,0 +1,25 @@
+from speech_scheduler import SpeechScheduler
+
+NEAR = (200, 200, 240, 280)   # big, low in the frame, central
+FAR = (0, 0, 20, 20)          # small, top-left corner
+
+
+def test_resubmitted_key_keeps_its_new_priority():
+    scheduler = SpeechScheduler(capacity=4, max_age_s=10.0)
+    assert scheduler.submit("chair", 1, None, NEAR)
+    scheduler.update_present(set())                 # chair 1 left: its heap entry is now stale
+    assert scheduler.submit("chair", 1, None, FAR)  # back, now far away
+    assert scheduler.submit("bench", 2, None, NEAR)
+
+    batch = scheduler.next_batch(timeout=0, limit=None)
+    assert [ann.key for ann in batch] == [("bench", 2), ("chair", 1)]
+    assert scheduler.depth() == 0
+
+
+def test_stale_entries_do_not_pile_up():
+    scheduler = SpeechScheduler(capacity=2, max_age_s=10.0)
+    for _ in range(100):
+        scheduler.submit("dog", 1, None, NEAR)
+        scheduler.update_present(set())
+    assert len(scheduler._heap) <= 4 * scheduler.capacity + 1
+    assert scheduler.next_batch(timeout=0) == []
@@ -0,0 +1,27 @@
+import pytest
+
+from startup import Startup
+
+
+def _fail():
+    raise RuntimeError("camera not found")
+
+
+def test_required_failure_releases_what_came_up():
+    released = []
+    startup = Startup()
+    with pytest.raises(RuntimeError, match="camera not found"):
+        startup.run(
+            {"db": lambda: "session", "camera": _fail, "tts": lambda: "voice"},
+            optional=("tts",),
+            cleanup={name: released.append for name in ("db", "camera", "tts")},
+        )
+    assert sorted(released) == ["session", "voice"]
+
+
+def test_optional_failure_keeps_everything():
+    released = []
+    results = Startup().run({"db": lambda: "session", "tts": _fail}, optional=("tts",),
+                            cleanup={"db": released.append})
+    assert results == {"db": "session", "tts": None}
+    assert released == []
@@ -0,0 +1,40 @@
+import os
+
+from tts_cache import AudioCache
+
+
+def _files(path) -> int:
+    return sum(len(files) for _, _, files in os.walk(path))
+
+
+def test_only_persisted_entries_reach_the_disk(tmp_path):
+    cache = AudioCache(str(tmp_path), "voice", max_items=8)
+    cache.put("a chair ahead", b"RIFF1")
+    cache.put("two chairs and a person on your left", b"RIFF2", persist=False)
+    assert _files(tmp_path) == 1
+
+    restarted = AudioCache(str(tmp_path), "voice", max_items=8)
+    assert restarted.get("A chair  ahead") == b"RIFF1"
+    assert restarted.get("two chairs and a person on your left") is None
+
+
+def test_disk_quota_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), "voice", max_items=1, disk_quota_mb=2.5 / 1024)   # 2.5 KB
+    for name in ("a", "b", "c"):
+        cache.put(name, b"x" * 1024)
+    assert cache.get("a") is None          # oldest file went first
+    assert cache.get("b") == b"x" * 1024   # disk hit refreshes b
+    cache.put("d", b"x" * 1024)
+    assert cache.get("c") is None
+    assert cache.get("b") is not None and cache.get("d") is not None
+    assert cache.stats()["evicted"] == 2
+
+
+def test_other_voice_entries_are_removed_at_startup(tmp_path):
+    AudioCache(str(tmp_path), "old-voice-fp1234").put("a chair", b"RIFF")
+    (tmp_path / "flat_layout_entry.wav").write_bytes(b"RIFF")
+    (tmp_path / "notes.txt").write_text("kept")
+
+    cache = AudioCache(str(tmp_path), "new-voice-fp5678")
+    assert sorted(os.listdir(tmp_path)) == ["new-voice-fp5678", "notes.txt"]
+    assert cache.get("a chair") is None
@@ -0,0 +1,63 @@
+import sqlite3
+
+from db_access import connect, SQL_INSERT_SESSION, utc_iso
+from va_db import VADatabase
+
+
+def test_migrate_brings_old_database_up_to_the_script(db_path):
+    con = sqlite3.connect(db_path)
+    con.executescript("""
+        DROP INDEX ix_audio_event_outcome;
+        ALTER TABLE audio_event DROP COLUMN first_audio_ms;
+        ALTER TABLE audio_event DROP COLUMN was_preempted;
+        DROP TABLE latency_summary;
+    """)
+    con.close()
+
+    VADatabase(db_path, write_behind=False).close()
+
+    con = sqlite3.connect(db_path)
+    columns = {row[1]: row for row in con.execute("PRAGMA table_info(audio_event)")}
+    assert "first_audio_ms" in columns
+    assert columns["was_preempted"][3] == 1  # NOT NULL DEFAULT 0 kept
+    names = {row[0] for row in con.execute("SELECT name FROM sqlite_master")}
+    assert {"latency_summary", "ix_audio_event_outcome"} <= names
+    con.close()
+
+
+def test_write_behind_moves_past_ids_taken_by_another_writer(db_path):
+    db = VADatabase(db_path, write_behind=True)
+    session_id = db.create_session("test", None, None)
+    db.flush()
+
+    # Another process inserts the id the writer would hand out next
+    other = connect(db_path)
+    other.execute(SQL_INSERT_SESSION, (session_id + 1, utc_iso(), "other", None, None))
+    other.commit()
+
+    lost = db.create_session("test", None, None)
+    db.flush()
+    assert lost == session_id + 1
+    assert db.writer_stats()["id_conflicts"] == 1
+
+    kept = db.create_session("test", None, None)
+    db.flush()
+    assert kept > session_id + 1
+    (app_version,) = other.execute("SELECT app_version FROM run_session WHERE id=?", (kept,)).fetchone()
+    assert app_version == "test"
+    other.close()
+    db.close()
+
+
+def test_evicting_an_old_capture_keeps_the_newer_link(db_path):
+    db = VADatabase(db_path, write_behind=False)
+    session_id = db.create_session("test", None, None)
+    frame_id = db.insert_frame_event(session_id, 1, 10, 0)
+    db.set_frame_capture(frame_id, "old.jpg")
+    db.set_frame_capture(frame_id, "new.jpg")
+
+    db.clear_frame_capture(frame_id, "old.jpg")
+    assert db._dal.query_one("SELECT capture_path FROM frame_event WHERE id=?", (frame_id,)) == ("new.jpg",)
+    db.clear_frame_capture(frame_id, "new.jpg")
+    assert db._dal.query_one("SELECT capture_path FROM frame_event WHERE id=?", (frame_id,)) == (None,)
+    db.close()
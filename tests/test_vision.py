@@ -0,0 +1,54 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+import vision
+
+
+@pytest.fixture
+def model_row(db_path, monkeypatch):
+    con = sqlite3.connect(db_path)
+    con.execute("INSERT INTO model(id, model_name, model_version, model_format, file_path)"
+                " VALUES(7, 'YOLOv8-nano', '0.1', 'ONNX', '/models/from_db.onnx')")
+    con.commit()
+    con.close()
+    monkeypatch.setattr(vision, "DB_PATH", db_path)
+    monkeypatch.setattr(vision, "DEFAULT_MODEL_ID", 7)
+    monkeypatch.setattr(vision, "DB_ENABLED", True)
+    monkeypatch.setattr(vision, "MODEL_PATH_EXPLICIT", False)
+
+
+def test_model_row_picks_engine_and_file(model_row):
+    assert vision.resolve_engine("auto") == ("onnxruntime", "/models/from_db.onnx")
+
+
+def test_explicit_model_path_wins_over_the_row(model_row, monkeypatch):
+    monkeypatch.setattr(vision, "MODEL_PATH_EXPLICIT", True)
+    monkeypatch.setattr(vision, "MODEL_PATH", "/models/override.pt")
+    assert vision.resolve_engine("auto") == ("ultralytics", "/models/override.pt")
+    assert vision.resolve_engine("auto", "/models/arg_openvino_model") == ("openvino", "/models/arg_openvino_model")
+
+
+def test_explicit_backend_keeps_the_row_file(model_row):
+    assert vision.resolve_engine("ultralytics") == ("ultralytics", "/models/from_db.onnx")
+
+
+def test_missing_database_falls_back_to_model_path(model_row, monkeypatch, tmp_path):
+    monkeypatch.setattr(vision, "DB_PATH", str(tmp_path / "missing.db"))
+    monkeypatch.setattr(vision, "MODEL_PATH", "/models/yolov8n.pt")
+    assert vision.resolve_engine("auto") == ("ultralytics", "/models/yolov8n.pt")
+    assert not (tmp_path / "missing.db").exists()
+
+
+def test_confidences_are_stored_rounded(db_path, monkeypatch):
+    from va_db import VADatabase
+
+    monkeypatch.setattr(vision, "_LABELS", np.array(["person"], dtype=object))
+    dets = vision.to_records(np.array([[50.0, 50.0, 20.0, 40.0]], np.float32),
+                             np.array([0.9], np.float32), np.array([0]))
+    db = VADatabase(db_path, write_behind=False)
+    session_id = db.create_session("test", None, None)
+    db.insert_frame(session_id, 1, 10, dets, vision.labels_of(dets))
+    assert db._dal.query_one("SELECT confidence_0_1 FROM detection") == (0.9,)
+    db.close()
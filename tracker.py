@@ -0,0 +1,139 @@
+import time
+
+import numpy as np
+
+from config import TRACK_IOU_THRES, TRACK_MAX_MISSES, TRACK_MIN_HITS, TRACK_MAX_AGE_S
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two (N, 4) / (M, 4) arrays of top-left xywh boxes."""
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = iw * ih
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+class _Track:
+    __slots__ = ("id", "cls", "conf", "box", "vel", "hits", "misses", "updated")
+
+    def __init__(self, track_id: int, cls: int, conf: float, box, now: float):
+        self.id = track_id
+        self.cls = cls
+        self.conf = conf
+        self.box = np.asarray(box, dtype=np.float32)   # top-left x, y, w, h
+        self.vel = np.zeros(2, dtype=np.float32)       # px/s of the top-left corner
+        self.hits = 1
+        self.misses = 0
+        self.updated = now
+
+    def predicted(self, now: float):
+        box = self.box.copy()
+        box[:2] += self.vel * (now - self.updated)
+        return box
+
+
+class IoUTracker:
+    """
+    Lightweight multi-object tracker for the detection records of vision.detect_array.
+
+    Boxes are matched greedily to existing tracks of the same class by IoU
+    against each track's predicted position. Positions follow a constant-velocity
+    alpha-beta filter (a fixed-gain Kalman filter), so predict() can extrapolate
+    boxes on frames where inference was skipped.
+    """
+
+    def __init__(self, iou_thres: float = TRACK_IOU_THRES, max_misses: int = TRACK_MAX_MISSES,
+                 min_hits: int = TRACK_MIN_HITS, max_age_s: float = TRACK_MAX_AGE_S,
+                 alpha: float = 0.6, beta: float = 0.2):
+        self.iou_thres = iou_thres
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.max_age_s = max_age_s
+        self.alpha = alpha
+        self.beta = beta
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, dets, now: float | None = None):
+        """
+        Associate a DETECTION_DTYPE array with tracks and write the ids into
+        dets["track_id"] (in place; unconfirmed tracks keep -1). Returns dets.
+        """
+        now = time.monotonic() if now is None else now
+        boxes = np.stack([dets["box_x"], dets["box_y"], dets["box_w"], dets["box_h"]], axis=1).astype(np.float32)
+        matched_tracks = set()
+        det_track = [None] * len(dets)
+
+        if self.tracks and len(dets):
+            predicted = np.stack([t.predicted(now) for t in self.tracks])
+            iou = iou_matrix(predicted, boxes)
+            # Only same-class pairs may match
+            track_cls = np.array([t.cls for t in self.tracks])
+            iou[track_cls[:, None] != dets["cls"][None, :]] = 0.0
+
+            # Greedy assignment, best pairs first
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                ti, di = divmod(int(flat), len(dets))
+                if iou[ti, di] < self.iou_thres:
+                    break
+                if ti in matched_tracks or det_track[di] is not None:
+                    continue
+                matched_tracks.add(ti)
+                det_track[di] = self.tracks[ti]
+                self._correct(self.tracks[ti], boxes[di], float(dets["conf"][di]), predicted[ti], now)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+
+        for di, track in enumerate(det_track):
+            if track is None:
+                track = _Track(self._next_id, int(dets["cls"][di]), float(dets["conf"][di]), boxes[di], now)
+                self._next_id += 1
+                self.tracks.append(track)
+                det_track[di] = track
+
+        self.tracks = [
+            t for t in self.tracks
+            if t.misses <= self.max_misses and now - t.updated <= self.max_age_s
+        ]
+
+        if len(dets):
+            dets["track_id"] = [t.id if t.hits >= self.min_hits else -1 for t in det_track]
+        return dets
+
+    def _correct(self, track: _Track, box, conf: float, predicted, now: float):
+        dt = max(now - track.updated, 1e-3)
+        residual = box - predicted
+        track.box = predicted + self.alpha * residual
+        track.vel += self.beta * residual[:2] / dt
+        track.conf = conf
+        track.hits += 1
+        track.misses = 0
+        track.updated = now
+
+    def predict(self, dtype, now: float | None = None):
+        """
+        Predicted boxes of all confirmed, live tracks as a `dtype` record array
+        (vision.DETECTION_DTYPE); used on frames where inference was skipped.
+        """
+        now = time.monotonic() if now is None else now
+        live = [
+            t for t in self.tracks
+            if t.hits >= self.min_hits and t.misses == 0 and now - t.updated <= self.max_age_s
+        ]
+        out = np.empty(len(live), dtype=dtype)
+        if not live:
+            return out
+        boxes = np.stack([t.predicted(now) for t in live]).astype(np.int32)
+        out["cls"] = [t.cls for t in live]
+        out["conf"] = [t.conf for t in live]
+        out["box_x"], out["box_y"], out["box_w"], out["box_h"] = boxes.T
+        out["track_id"] = [t.id for t in live]
+        return out
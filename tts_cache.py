@@ -0,0 +1,205 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_fingerprint(*paths) -> str:
+    """
+    Short hash identifying a voice: model size/mtime plus the full config contents.
+    Any change to the voice or its settings produces a different cache namespace.
+    """
+    h = hashlib.sha1()
+    for path in paths:
+        h.update(path.encode("utf-8"))
+        try:
+            st = os.stat(path)
+            h.update(f"{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+            if path.endswith(".json"):
+                with open(path, "rb") as f:
+                    h.update(f.read())
+        except OSError:
+            # Missing files still get a stable (path-only) fingerprint
+            pass
+    return h.hexdigest()[:16]
+
+
+def normalize(text: str) -> str:
+    """Cache identity of a text: whitespace collapsed, lower case."""
+    return " ".join(text.split()).lower()
+
+
+class AudioCache:
+    """
+    Synthesized audio keyed by (text, voice fingerprint).
+
+    - In memory: LRU with a fixed number of entries.
+    - On disk: one file per entry under `cache_dir/<voice_id>/`, survives
+      restarts. Only entries put with persist=True are written there; above
+      `disk_quota_mb` the least recently used files are deleted, and the
+      directories of other voice fingerprints are removed at startup.
+    """
+
+    def __init__(self, cache_dir: str, voice_id: str, max_items: int = 256, disk_quota_mb: float = 32):
+        self.root_dir = cache_dir
+        self.cache_dir = os.path.join(cache_dir, voice_id)
+        self.voice_id = voice_id
+        self.max_items = max_items
+        self.quota_bytes = int(disk_quota_mb * 1024 * 1024)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._mem = OrderedDict()  # key -> audio bytes
+        self._files = OrderedDict()  # path -> size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError:
+            # Read-only or missing BASE_DIR (dev machine): memory-only cache
+            self.cache_dir = None
+            return
+        self._remove_stale()
+        self._scan_existing()
+
+    def _remove_stale(self):
+        """Delete entries of other voice fingerprints (and of the old flat layout)."""
+        for name in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, name)
+            if name == self.voice_id:
+                continue
+            try:
+                if os.path.isdir(path) and len(name) == len(self.voice_id):
+                    for entry in os.listdir(path):
+                        if entry.endswith((".wav", ".tmp")):
+                            os.remove(os.path.join(path, entry))
+                    os.rmdir(path)
+                elif name.endswith((".wav", ".tmp")):
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _scan_existing(self):
+        """Account for entries from earlier runs, oldest access first."""
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".tmp"):
+                # Left by a crash mid-write
+                os.remove(path)
+            elif name.endswith(".wav"):
+                found.append((st.st_mtime, path, st.st_size))
+        for _, path, size in sorted(found):
+            self._files[path] = size
+            self._disk_bytes += size
+        self._enforce_quota()
+
+    def _enforce_quota(self):
+        with self._lock:
+            doomed = []
+            while self._disk_bytes > self.quota_bytes and len(self._files) > 1:
+                path, size = self._files.popitem(last=False)
+                self._disk_bytes -= size
+                doomed.append(path)
+        for path in doomed:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.evicted += 1
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.voice_id}|{normalize(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str | None:
+        return os.path.join(self.cache_dir, f"{key}.wav") if self.cache_dir else None
+
+    def _remember(self, key: str, audio: bytes):
+        self._mem[key] = audio
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def get(self, text: str) -> bytes | None:
+        key = self._key(text)
+        with self._lock:
+            audio = self._mem.get(key)
+            if audio is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    audio = f.read()
+            except OSError:
+                audio = None
+            if audio:
+                with self._lock:
+                    self._remember(key, audio)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    if path in self._files:
+                        self._files.move_to_end(path)
+                try:
+                    # Access time for the next run's eviction order
+                    os.utime(path)
+                except OSError:
+                    pass
+                return audio
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, audio: bytes, persist: bool = True):
+        key = self._key(text)
+        with self._lock:
+            self._remember(key, audio)
+
+        path = self._path(key) if persist else None
+        if not path:
+            return
+        # Write-then-rename so a crash never leaves a truncated entry behind
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(audio)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(audio) - self._files.pop(path, 0)
+            self._files[path] = len(audio)
+        self._enforce_quota()
+
+    def contains(self, text: str) -> bool:
+        """Check presence without touching hit/miss counters."""
+        key = self._key(text)
+        with self._lock:
+            if key in self._mem:
+                return True
+        path = self._path(key)
+        return bool(path and os.path.exists(path))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._mem),
+                "disk_files": len(self._files),
+                "disk_mb": round(self._disk_bytes / (1024 * 1024), 2),
+                "evicted": self.evicted,
+            }
@@ -1,43 +1,500 @@
+import io
+import json
 import subprocess
 import os
-from datetime import datetime
+import select
+import threading
+import time
+import wave
+from collections import deque
+
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_ITEMS, TTS_CACHE_DISK_MB, TTS_STREAM, AUDIO_CHUNK_MS
+from tts_cache import AudioCache, file_fingerprint, normalize
+from audio_sink import make_sink
+from metrics import span, observe
 
 # Piper TTS binary and English voice model paths
 PIPER_BIN = "/opt/ai_assistant/tools/piper_cli/piper"
 PIPER_MODEL = "/opt/ai_assistant/models/piper/voice.onnx"
 PIPER_CONFIG = "/opt/ai_assistant/models/piper/voice.onnx.json"
 
+# Persistent worker settings
+PIPER_OUTPUT_DIR = f"/tmp/piper_{os.getpid()}"
+PIPER_TIMEOUT_S = 10.0        # max time to synthesize one utterance
+PIPER_MAX_RESTARTS = 5        # consecutive failures before backing off
+PIPER_RETRY_AFTER_S = 30.0    # back-off before trying to restart again
+PIPER_READ_BYTES = 4096       # raw PCM read size (~90 ms at 22.05 kHz)
+# Logged by Piper on stderr once all the audio of an utterance has been written
+PIPER_DONE_MARKER = b"Real-time factor"
+
+
+def _voice_rate(config_path: str) -> int:
+    """Sample rate of the voice (audio.sample_rate in its .onnx.json)."""
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            return int(json.load(f)["audio"]["sample_rate"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 22050
+
+
+class PiperWorker:
+    """
+    Long-lived Piper process that keeps the voice model loaded.
+
+    Piper runs in --output_dir mode: every line written to stdin is synthesized
+    into a new WAV inside PIPER_OUTPUT_DIR and its path is printed on stdout.
+    The worker is restarted automatically when it crashes or times out.
+    """
+
+    drain_stderr = True   # background thread keeps the stderr tail
+
+    def __init__(self, timeout: float = PIPER_TIMEOUT_S, output_dir: str = PIPER_OUTPUT_DIR):
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.proc = None
+        self.restarts = 0
+        self.failures = 0          # consecutive failed requests
+        self.last_ok = None        # monotonic time of the last successful synthesis
+        self.last_failure = None   # monotonic time of the last failed request
+        self._stdout_buf = b""
+        self._stderr_tail = deque(maxlen=20)
+        self._lock = threading.Lock()
+
+    # ---------------- process lifecycle ----------------
+
+    def _command(self) -> list:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return [
+            PIPER_BIN,
+            "--model", PIPER_MODEL,
+            "--config", PIPER_CONFIG,
+            "--output_dir", self.output_dir
+        ]
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self._command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0
+        )
+        self._stdout_buf = b""
+
+        # Drain stderr so Piper never blocks on a full pipe; keep the tail for errors
+        if self.drain_stderr:
+            threading.Thread(target=self._drain_stderr, args=(self.proc,), daemon=True).start()
+
+    def stop(self):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+            proc.wait()
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def healthy(self) -> bool:
+        """Process is running and the last requests did not keep failing."""
+        return self.is_alive() and self.failures < PIPER_MAX_RESTARTS
+
+    def _refuse_while_failing(self):
+        """Raise instead of restarting an unhealthy worker during its back-off (lock held)."""
+        if not self.healthy() and self._backing_off():
+            raise RuntimeError(f"Piper keeps failing: {self._error_text()}")
+
+    def _backing_off(self) -> bool:
+        return (
+            self.failures >= PIPER_MAX_RESTARTS
+            and self.last_failure is not None
+            and time.monotonic() - self.last_failure < PIPER_RETRY_AFTER_S
+        )
+
+    def _drain_stderr(self, proc):
+        for line in proc.stderr:
+            self._stderr_tail.append(line.decode("utf-8", errors="ignore").rstrip())
+
+    def _error_text(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def _ensure_running(self):
+        """(Re)start the process if needed; call with the lock held."""
+        if not self.is_alive():
+            if self.proc is not None or self.failures:
+                self.restarts += 1
+            self.stop()
+            self.start()
+
+    def _failed(self):
+        # Leave the process dead; the next request restarts it
+        self.failures += 1
+        self.last_failure = time.monotonic()
+        self.stop()
+
+    def prepare(self) -> bool:
+        """Start Piper now, so the first utterance does not wait for the model load."""
+        with self._lock:
+            if self.healthy():
+                return True
+            if self._backing_off():
+                return self.is_alive()
+            try:
+                self._ensure_running()
+            except OSError:
+                self._failed()
+                return False
+            return True
+
+    # ---------------- requests ----------------
+
+    def _read_line(self, deadline: float) -> bytes:
+        """Read one stdout line without blocking past `deadline`."""
+        fd = self.proc.stdout.fileno()
+        while b"\n" not in self._stdout_buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Piper did not answer within {self.timeout:.1f}s")
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 4096)
+            if not chunk:
+                raise RuntimeError(f"Piper exited unexpectedly: {self._error_text()}")
+            self._stdout_buf += chunk
+        line, self._stdout_buf = self._stdout_buf.split(b"\n", 1)
+        return line
+
+    def synthesize(self, text: str) -> str:
+        """Synthesize `text` and return the path of the generated WAV file."""
+        # Piper treats each stdin line as one utterance
+        line = " ".join(text.split())
+        if not line:
+            raise ValueError("Nothing to synthesize")
+
+        with self._lock:
+            self._refuse_while_failing()
+
+            try:
+                self._ensure_running()
+                self.proc.stdin.write((line + "\n").encode("utf-8"))
+                self.proc.stdin.flush()
+                wav = self._read_line(time.monotonic() + self.timeout).decode("utf-8").strip()
+            except (OSError, TimeoutError, RuntimeError):
+                self._failed()
+                raise
+
+            self.failures = 0
+            self.last_ok = time.monotonic()
+            return wav
+
+
+class PiperStream(PiperWorker):
+    """
+    Long-lived Piper process in --output_raw mode: 16-bit mono PCM on stdout
+    while it synthesizes, so playback can start with the first chunk.
+
+    Raw output has no utterance boundaries. Piper logs "Real-time factor: ..."
+    on stderr once an utterance's audio has been written; that line, with
+    stdout drained, ends the utterance. stderr is therefore read here instead
+    of by a background thread.
+    """
+
+    drain_stderr = False
+
+    def __init__(self, timeout: float = PIPER_TIMEOUT_S):
+        super().__init__(timeout)
+        self.rate = _voice_rate(PIPER_CONFIG)
+        self.drained = 0           # utterances cut short whose remaining audio was discarded
+        self._stderr_buf = b""
+        self._marker_seen = False  # end-of-utterance line of the current utterance already read
+
+    def _command(self) -> list:
+        return [PIPER_BIN, "--model", PIPER_MODEL, "--config", PIPER_CONFIG, "--output_raw"]
+
+    def start(self):
+        super().start()
+        self._stderr_buf = b""
+
+    def _stderr_done(self, data: bytes) -> bool:
+        """Keep the stderr tail; True once the end-of-utterance line arrived."""
+        self._stderr_buf += data
+        *lines, self._stderr_buf = self._stderr_buf.split(b"\n")
+        done = False
+        for line in lines:
+            self._stderr_tail.append(line.decode("utf-8", errors="ignore").rstrip())
+            done = done or PIPER_DONE_MARKER in line
+        return done
+
+    def _utterance(self, done: bool = False):
+        """
+        Yield the PCM of the utterance being synthesized (whole samples only).
+        done=True: its end-of-utterance line was already read, only drain stdout.
+        """
+        out_fd, err_fd = self.proc.stdout.fileno(), self.proc.stderr.fileno()
+        pending = b""
+        self._marker_seen = done
+        while True:
+            # After the marker every sample is already in the pipe: only read what is there
+            ready, _, _ = select.select([out_fd, err_fd], [], [], 0 if done else self.timeout)
+            if not ready:
+                if done:
+                    return
+                raise TimeoutError(f"Piper produced no audio for {self.timeout:.1f}s")
+            if err_fd in ready:
+                data = os.read(err_fd, 4096)
+                if not data:
+                    raise RuntimeError(f"Piper exited unexpectedly: {self._error_text()}")
+                done = self._stderr_done(data) or done
+                self._marker_seen = done
+            if out_fd in ready:
+                chunk = os.read(out_fd, PIPER_READ_BYTES)
+                if not chunk:
+                    raise RuntimeError(f"Piper exited unexpectedly: {self._error_text()}")
+                pending += chunk
+                whole = len(pending) & ~1
+                if whole:
+                    yield pending[:whole]
+                    pending = pending[whole:]
+
+    def stream(self, text: str):
+        """Yield PCM chunks for `text` as Piper produces them."""
+        line = " ".join(text.split())
+        if not line:
+            raise ValueError("Nothing to synthesize")
+
+        with self._lock:
+            self._refuse_while_failing()
+
+            finished = False
+            try:
+                self._ensure_running()
+                self.proc.stdin.write((line + "\n").encode("utf-8"))
+                self.proc.stdin.flush()
+                yield from self._utterance()
+                finished = True
+            except (OSError, RuntimeError) as e:
+                self._failed()
+                finished = True
+                if isinstance(e, RuntimeError):
+                    raise
+                # Same contract as _generate(): TTS failures surface as RuntimeError
+                raise RuntimeError(str(e)) from e
+            finally:
+                if not finished:
+                    # Playback was cut short: discard the rest of this utterance so
+                    # the next one starts clean (synthesis is faster than real time)
+                    try:
+                        for _ in self._utterance(done=self._marker_seen):
+                            pass
+                        self.drained += 1
+                    except (OSError, RuntimeError):
+                        self._failed()
+
+            self.failures = 0
+            self.last_ok = time.monotonic()
+
+
+# One Piper process either way: raw PCM streaming (VA_TTS_STREAM=1), or WAV files
+_worker = PiperStream() if TTS_STREAM else PiperWorker()
+_cache = AudioCache(TTS_CACHE_DIR, file_fingerprint(PIPER_MODEL, PIPER_CONFIG), TTS_CACHE_MAX_ITEMS,
+                    TTS_CACHE_DISK_MB)
+# Texts from set_vocabulary() / prewarm(): the only ones written to the disk
+# cache. Coalesced sentences ("two chairs and a person on your left") are
+# combinatorial and stay in the in-memory LRU
+_vocabulary = set()
+
+
+def set_vocabulary(texts):
+    """Texts worth keeping in the disk cache (labels, one-object sentences)."""
+    _vocabulary.update(normalize(text) for text in texts)
+
+
+def _persist(text: str) -> bool:
+    return normalize(text) in _vocabulary
+
+
+def _generate(text: str) -> bytes:
+    """Synthesize `text` with the Piper worker and return the WAV bytes."""
+    if TTS_STREAM:
+        return _wav_bytes(_worker.rate, b"".join(_worker.stream(text)))
+    try:
+        wav = _worker.synthesize(text)
+        try:
+            with open(wav, "rb") as f:
+                audio = f.read()
+        finally:
+            os.remove(wav)
+    except (OSError, TimeoutError) as e:
+        # Keep the historical contract: TTS failures surface as RuntimeError
+        raise RuntimeError(str(e)) from e
+    return audio
+
+
+def _wav_bytes(rate: int, pcm: bytes, channels: int = 1, sampwidth: int = 2) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sampwidth)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def _wav_pcm(audio: bytes):
+    """(rate, channels, sampwidth, pcm) of WAV bytes."""
+    try:
+        with wave.open(io.BytesIO(audio), "rb") as w:
+            return w.getframerate(), w.getnchannels(), w.getsampwidth(), w.readframes(w.getnframes())
+    except (EOFError, wave.Error) as e:
+        raise RuntimeError(f"Unreadable WAV audio ({len(audio)} bytes): {e}") from e
+
+
+def _chunks(pcm: bytes, size: int):
+    for i in range(0, len(pcm), size):
+        yield pcm[i:i + size]
+
+
+class _Playback:
+    """The utterance being played, so another thread can cut it short."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sink = None
+        self.interrupted = False
+        self.completed = True        # last utterance played to the end
+        self.first_audio_ms = None
+
+    def begin(self, sink):
+        # Sink and flag change together: a stop() either lands on this utterance or sees nothing playing
+        with self._lock:
+            self.sink, self.interrupted = sink, False
+
+    def end(self) -> bool:
+        """Forget the sink; False if stop() interrupted the utterance."""
+        with self._lock:
+            self.sink = None
+            self.completed = not self.interrupted
+            return self.completed
+
+    def stop(self) -> bool:
+        with self._lock:
+            if self.sink is None:
+                return False
+            self.interrupted = True
+            self.sink.stop()
+            return True
+
+
+_playback = _Playback()
+_sink = None
+
+
+def _get_sink():
+    global _sink
+    if _sink is None:
+        _sink = make_sink()
+    return _sink
+
 
 def speak(text: str) -> None:
     """
     Convert text to speech using offline Piper TTS and play the audio.
+    Cached audio plays from memory; otherwise (TTS_STREAM) Piper's PCM is
+    played while it is being synthesized.
+    last_completed() tells whether stop_playback() cut it short.
     """
-    # Generate a unique filename to avoid collisions between TTS calls
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    wav = f"/tmp/tts_{ts}.wav"
-
-    cmd = [
-        PIPER_BIN,
-        "--model", PIPER_MODEL,
-        "--config", PIPER_CONFIG,
-        "--output_file", wav
-    ]
-
-    # Run Piper and pass text through stdin
-    result = subprocess.run(
-        cmd,
-        input=text.encode("utf-8"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-
-    # Fail fast if TTS generation fails
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr.decode("utf-8", errors="ignore"))
-
-    # Play generated audio and clean up temporary file
-    subprocess.run(["aplay", "-q", wav], check=False)
-    try:
-        os.remove(wav)
-    except OSError:
-        pass
+    t0 = time.perf_counter()
+    _playback.first_audio_ms = None
+    _playback.completed = False
+    sink = _get_sink()
+
+    audio = _cache.get(text)
+    streamed = None
+    if audio is None and TTS_STREAM:
+        rate, channels, sampwidth = _worker.rate, 1, 2
+        chunks = streamed = _worker.stream(text)
+        parts = []
+    else:
+        if audio is None:
+            with span("tts_synth"):
+                audio = _generate(text)
+            _cache.put(text, audio, persist=_persist(text))
+        rate, channels, sampwidth, pcm = _wav_pcm(audio)
+        step = channels * sampwidth
+        chunks = _chunks(pcm, max(step, rate * AUDIO_CHUNK_MS // 1000 * step))
+
+    completed = False
+    with span("tts_play"):
+        try:
+            sink.start(rate, channels, sampwidth)
+            _playback.begin(sink)
+            for chunk in chunks:
+                if _playback.first_audio_ms is None:
+                    _playback.first_audio_ms = (time.perf_counter() - t0) * 1000.0
+                    observe("tts_first_audio", _playback.first_audio_ms)
+                if streamed is not None:
+                    parts.append(chunk)
+                if not sink.write(chunk):
+                    break
+        except BaseException:
+            sink.stop()
+            raise
+        finally:
+            completed = _playback.end()
+            if streamed is not None:
+                streamed.close()   # discards the rest of the utterance if playback was cut short
+            sink.finish()
+
+    if streamed is not None and completed:
+        _cache.put(text, _wav_bytes(rate, b"".join(parts)), persist=_persist(text))
+
+
+def last_completed() -> bool:
+    """False if the last speak() was interrupted by stop_playback()."""
+    return _playback.completed
+
+
+def last_first_audio_ms() -> float | None:
+    """Time from speak() to the first chunk handed to the sink, for the last utterance."""
+    return _playback.first_audio_ms
+
+
+def stop_playback() -> bool:
+    """Interrupt the utterance currently playing (used for preemption)."""
+    return _playback.stop()
+
+
+def prewarm(texts) -> int:
+    """
+    Synthesize every text that is not cached yet (no playback). These texts
+    are the vocabulary kept in the disk cache. Returns how many entries were generated.
+    """
+    texts = list(texts)
+    set_vocabulary(texts)
+    generated = 0
+    for text in texts:
+        if _cache.contains(text):
+            continue
+        try:
+            _cache.put(text, _generate(text))
+            generated += 1
+        except (RuntimeError, ValueError):
+            continue
+    # Everything cached: still load the voice now rather than on the first uncached sentence
+    _worker.prepare()
+    return generated
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the synthesized-audio cache."""
+    return _cache.stats()
+
+
+def shutdown() -> None:
+    """Stop the background Piper process (call on application exit)."""
+    _worker.stop()
@@ -1,115 +1,376 @@
 import sqlite3
-from datetime import datetime, timezone
-from config import DB_PATH, LANGUAGE_CODE
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from config import DB_PATH, LANGUAGE_CODE, DB_WRITE_BEHIND, DB_BATCH_SIZE, DB_FLUSH_MS, CONF_DECIMALS
+from metrics import span
+from db_maintenance import rollup_detections, refresh_summaries
+from db_access import (
+    DataAccess, connect, utc_iso as _utc_iso,
+    SQL_INSERT_SESSION, SQL_END_SESSION, SQL_INSERT_FRAME, SQL_INSERT_DETECTION, SQL_SELECT_MODEL
+)
+
+
+# Tables whose ids are handed back to callers (pre-allocated in write-behind mode)
+_ID_TABLES = ("run_session", "frame_event", "spoken_message", "audio_event")
+
+_STOP = object()
+
+# Single schema source: new databases are created from this script, existing
+# ones are brought up to date from it by VADatabase._migrate()
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_scripts", "VAv1_DB_SQLitev3.sql")
+
+
+class _WriteBehind(threading.Thread):
+    """
+    Background writer owning one persistent WAL connection.
+
+    Statements are queued by the caller and committed in groups: a batch is
+    flushed when it reaches `batch_size` statements or when its oldest
+    statement is `flush_ms` old. Consecutive statements with the same SQL run
+    through one executemany(), and queue order is preserved so foreign keys
+    (frame_event before its detections) always hold.
+
+    Row ids are allocated here from MAX(id) at startup, so this must be the
+    only process inserting into those tables. After each commit MAX(id) is
+    re-read: if another writer has reached the allocated range, allocation
+    moves past its rows. Rows that already collided are lost and counted in
+    `id_conflicts`.
+    """
+
+    def __init__(self, db_path: str, batch_size: int, flush_ms: int):
+        super().__init__(name="db-writer", daemon=True)
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(0, int(flush_ms)) / 1000.0
+        self.batches = 0
+        self.errors = 0
+        self.id_conflicts = 0
+        self.last_error = None
+
+        self.con = connect(db_path, check_same_thread=False)
+
+        self._next_id = {table: self._max_id(table) + 1 for table in _ID_TABLES}
+        self._id_lock = threading.Lock()
+        self._queue = queue.Queue()
+
+    def _max_id(self, table: str) -> int:
+        (max_id,) = self.con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+        return max_id
+
+    def _check_ids(self):
+        """Move allocation past rows another writer inserted into our id range."""
+        for table in _ID_TABLES:
+            max_id = self._max_id(table)
+            with self._id_lock:
+                if max_id >= self._next_id[table]:
+                    self._next_id[table] = max_id + 1
+                    self.last_error = f"{table}: id {max_id} written by another process"
+
+    def allocate(self, table: str) -> int:
+        with self._id_lock:
+            new_id = self._next_id[table]
+            self._next_id[table] = new_id + 1
+            return new_id
+
+    def submit(self, sql: str, params: tuple):
+        self._queue.put((sql, params))
+
+    def submit_many(self, sql: str, rows: list):
+        for params in rows:
+            self._queue.put((sql, params))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self.join()
+        self.con.close()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def run(self):
+        batch = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._commit(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._commit(batch)
+                batch = []
+                item.set()
+                continue
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_s
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._commit(batch)
+                batch = []
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        with span("db_commit"):
+            self._commit_batch(batch)
+            self._check_ids()
+
+    def _commit_batch(self, batch):
+        try:
+            with self.con:
+                for sql, group in itertools.groupby(batch, key=lambda item: item[0]):
+                    self.con.executemany(sql, [params for _, params in group])
+            self.batches += 1
+        except sqlite3.Error:
+            # One bad row must not lose the whole batch: replay it statement by statement
+            for sql, params in batch:
+                try:
+                    with self.con:
+                        self.con.execute(sql, params)
+                except sqlite3.Error as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                    if any(f"{table}.id" in self.last_error for table in _ID_TABLES):
+                        self.id_conflicts += 1  # _check_ids() re-reads MAX(id) after this batch
 
-def _utc_iso():
-    return datetime.now(timezone.utc).isoformat()
 
 class VADatabase:
-    def __init__(self, db_path: str = DB_PATH):
+    def __init__(self, db_path: str = DB_PATH, write_behind: bool = DB_WRITE_BEHIND):
         self.db_path = db_path
+        self._writer = None
+        # Synchronous mode and reads: one persistent connection per calling thread
+        self._dal = DataAccess(db_path)
+        self._migrate()
+        if write_behind:
+            self._writer = _WriteBehind(db_path, DB_BATCH_SIZE, DB_FLUSH_MS)
+            self._writer.start()
+
+    def _migrate(self):
+        """
+        Bring an existing database up to SCHEMA_PATH: columns missing from its
+        tables are added first (indexes in the script may use them), then the
+        script itself creates any missing table, index or state row.
+        """
+        con = self._dal.con
+        if not con.execute("SELECT 1 FROM sqlite_master WHERE name='run_session'").fetchone():
+            return  # schema not installed yet
+        with open(SCHEMA_PATH, encoding="utf-8") as f:
+            script = f.read()
+
+        target = sqlite3.connect(":memory:")
+        target.executescript(script)
+        tables = [row[0] for row in target.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for table in tables:
+            existing = {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+            if not existing:
+                continue  # new table: created by the script below
+            for _, name, decl, notnull, default, _ in target.execute(f"PRAGMA table_info({table})"):
+                if name not in existing:
+                    if notnull:
+                        decl += " NOT NULL"
+                    if default is not None:
+                        decl += f" DEFAULT {default}"
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+        target.close()
+        con.commit()
+        con.executescript(script)
+
+    def _insert(self, table: str, sql: str, params: tuple) -> int:
+        """INSERT returning the new row id; the first placeholder is the id column."""
+        with span("db_write"):
+            if self._writer is not None:
+                new_id = self._writer.allocate(table)
+                self._writer.submit(sql, (new_id, *params))
+                return new_id
+
+            return self._dal.insert(sql, (None, *params))
+
+    def _write_many(self, sql: str, rows: list):
+        """Same statement for many rows (one transaction in synchronous mode)."""
+        if not rows:
+            return
+        with span("db_write"):
+            if self._writer is not None:
+                self._writer.submit_many(sql, rows)
+                return
+            self._dal.executemany(sql, rows)
+
+    def _write(self, sql: str, params: tuple):
+        """Statement whose result the caller does not need."""
+        with span("db_write"):
+            if self._writer is not None:
+                self._writer.submit(sql, params)
+                return
+            self._dal.execute(sql, params)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until queued writes are committed (no-op in synchronous mode)."""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
 
-    def _connect(self):
-        con = sqlite3.connect(self.db_path, timeout=30)
-        con.execute("PRAGMA foreign_keys = ON;")
-        return con
+    def close(self):
+        """Flush and stop the background writer, then close the per-thread connections."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._dal.close()
+
+    def writer_stats(self) -> dict:
+        if self._writer is None:
+            return {}
+        return {
+            "pending": self._writer.pending(),
+            "batches": self._writer.batches,
+            "errors": self._writer.errors,
+            "id_conflicts": self._writer.id_conflicts,
+            "last_error": self._writer.last_error,
+        }
+
+    def get_model(self, model_id: int):
+        """Return (model_format, file_path) for a `model` row, or None."""
+        return self._dal.query_one(SQL_SELECT_MODEL, (model_id,))
 
     def create_session(self, app_version: str, model_id, device_notes: str | None) -> int:
-        con = self._connect()
-        try:
-            cur = con.cursor()
-            cur.execute(
-                "INSERT INTO run_session(start_time_utc, app_version, model_id, device_notes) VALUES(?,?,?,?)",
-                (_utc_iso(), app_version, model_id, device_notes),
-            )
-            con.commit()
-            return cur.lastrowid
-        finally:
-            con.close()
+        return self._insert("run_session", SQL_INSERT_SESSION, (_utc_iso(), app_version, model_id, device_notes))
+
+    def set_session_startup(self, session_id: int, startup_ms: int, phases: dict):
+        """Time to ready (ms) and per-phase timings (JSON) of this run."""
+        self._write(
+            "UPDATE run_session SET startup_ms=?, startup_phases=? WHERE id=?",
+            (int(startup_ms), json.dumps(phases), session_id),
+        )
 
     def end_session(self, session_id: int):
-        con = self._connect()
+        self._write(SQL_END_SESSION, (_utc_iso(), session_id))
+        self.flush()
+        self.refresh_summaries(session_id)
+
+    def refresh_summaries(self, session_id: int | None = None):
+        """Bring detection_minute / session_summary / session_detect_ms up to date (report.py)."""
+        con = connect(self.db_path, isolation_level=None)
         try:
-            con.execute("UPDATE run_session SET end_time_utc=? WHERE id=?", (_utc_iso(), session_id))
-            con.commit()
+            rollup_detections(con)
+            refresh_summaries(con, session_id=session_id)
         finally:
             con.close()
 
     def insert_frame_event(self, session_id: int, frame_number: int, detect_ms: int, objects_found: int) -> int:
-        con = self._connect()
-        try:
-            cur = con.cursor()
-            cur.execute(
-                """INSERT INTO frame_event(session_id, frame_number, captured_at_utc, detect_ms, objects_found)
-                   VALUES(?,?,?,?,?)""",
-                (session_id, frame_number, _utc_iso(), int(detect_ms), int(objects_found)),
-            )
-            con.commit()
-            return cur.lastrowid
-        finally:
-            con.close()
+        return self._insert(
+            "frame_event", SQL_INSERT_FRAME,
+            (session_id, frame_number, _utc_iso(), int(detect_ms), int(objects_found)),
+        )
+
+    def insert_frame(self, session_id: int, frame_number: int, detect_ms: int, dets, labels: list) -> int:
+        """
+        frame_event row plus its detections (vision.DETECTION_DTYPE records,
+        `labels` = vision.labels_of(dets)) in one go: queued together in
+        write-behind mode, one transaction otherwise.
+        """
+        frame = (session_id, frame_number, _utc_iso(), int(detect_ms), len(labels))
+        rows = self._detection_rows(session_id, dets, labels)
+        with span("db_write"):
+            if self._writer is not None:
+                frame_id = self._writer.allocate("frame_event")
+                self._writer.submit(SQL_INSERT_FRAME, (frame_id, *frame))
+                self._writer.submit_many(SQL_INSERT_DETECTION, [(r[0], frame_id, *r[1:]) for r in rows])
+                return frame_id
+            return self._dal.insert_frame((None, *frame), rows)
+
+    @staticmethod
+    def _detection_rows(session_id: int, dets, labels: list) -> list:
+        """db_access detection rows (without frame_id) for a record array."""
+        return list(zip(
+            [session_id] * len(labels), labels,
+            [round(conf, CONF_DECIMALS) for conf in dets["conf"].tolist()],
+            dets["box_x"].tolist(), dets["box_y"].tolist(),
+            dets["box_w"].tolist(), dets["box_h"].tolist(),
+            [t if t >= 0 else None for t in dets["track_id"].tolist()],
+        ))
+
+    def set_frame_capture(self, frame_id: int, path: str | None):
+        """Link (or unlink, with None) an archived JPEG to its frame_event row."""
+        self._write("UPDATE frame_event SET capture_path=? WHERE id=?", (path, frame_id))
+
+    def clear_frame_capture(self, frame_id: int, path: str):
+        """Unlink an evicted JPEG, unless the row already points at another file."""
+        self._write("UPDATE frame_event SET capture_path=NULL WHERE id=? AND capture_path=?", (frame_id, path))
 
     def insert_detection(self, session_id: int, frame_id: int, label: str, confidence: float,
-                         box_x=None, box_y=None, box_w=None, box_h=None):
-        con = self._connect()
-        try:
-            con.execute(
-                """INSERT INTO detection(session_id, frame_id, object_label, confidence_0_1, box_x, box_y, box_w, box_h)
-                   VALUES(?,?,?,?,?,?,?,?)""",
-                (session_id, frame_id, label, float(confidence), box_x, box_y, box_w, box_h),
-            )
-            con.commit()
-        finally:
-            con.close()
+                         box_x=None, box_y=None, box_w=None, box_h=None, track_id=None):
+        self._write(
+            SQL_INSERT_DETECTION,
+            (session_id, frame_id, label, round(float(confidence), CONF_DECIMALS), box_x, box_y, box_w, box_h, track_id),
+        )
+
+    def insert_detections(self, session_id: int, frame_id: int, dets, labels: list):
+        """
+        Bulk insert of a vision.DETECTION_DTYPE record array (one row per box).
+        `labels` is vision.labels_of(dets).
+        """
+        rows = self._detection_rows(session_id, dets, labels)
+        self._write_many(SQL_INSERT_DETECTION, [(r[0], frame_id, *r[1:]) for r in rows])
 
     def insert_spoken_message(self, session_id: int, frame_id: int | None, text: str) -> int:
-        con = self._connect()
-        try:
-            cur = con.cursor()
-            cur.execute(
-                """INSERT INTO spoken_message(session_id, frame_id, text_content, language_code, created_at_utc)
-                   VALUES(?,?,?,?,?)""",
-                (session_id, frame_id, text, LANGUAGE_CODE, _utc_iso()),
-            )
-            con.commit()
-            return cur.lastrowid
-        finally:
-            con.close()
+        return self._insert(
+            "spoken_message",
+            """INSERT INTO spoken_message(id, session_id, frame_id, text_content, language_code, created_at_utc)
+               VALUES(?,?,?,?,?,?)""",
+            (session_id, frame_id, text, LANGUAGE_CODE, _utc_iso()),
+        )
 
-    def start_audio_event(self, session_id: int, message_id: int, output_device: str | None = None) -> int:
-        con = self._connect()
-        try:
-            cur = con.cursor()
-            cur.execute(
-                """INSERT INTO audio_event(session_id, message_id, started_at_utc, was_successful, output_device)
-                   VALUES(?,?,?,?,?)""",
-                (session_id, message_id, _utc_iso(), 1, output_device),
-            )
-            con.commit()
-            return cur.lastrowid
-        finally:
-            con.close()
+    def start_audio_event(self, session_id: int, message_id: int, output_device: str | None = None,
+                          queue_ms: int | None = None, dropped_count: int | None = None) -> int:
+        return self._insert(
+            "audio_event",
+            """INSERT INTO audio_event(id, session_id, message_id, started_at_utc, was_successful, output_device,
+                                      queue_ms, dropped_count)
+               VALUES(?,?,?,?,?,?,?,?)""",
+            (session_id, message_id, _utc_iso(), 1, output_device, queue_ms, dropped_count),
+        )
 
-    def finish_audio_event(self, audio_event_id: int, was_successful: int = 1, error_text: str | None = None):
-        con = self._connect()
-        try:
-            con.execute(
-                "UPDATE audio_event SET ended_at_utc=?, was_successful=?, error_text=? WHERE id=?",
-                (_utc_iso(), int(was_successful), error_text, audio_event_id),
-            )
-            con.commit()
-        finally:
-            con.close()
+    def finish_audio_event(self, audio_event_id: int, was_successful: int = 1, error_text: str | None = None,
+                           was_preempted: int = 0, first_audio_ms: float | None = None):
+        self._write(
+            """UPDATE audio_event SET ended_at_utc=?, was_successful=?, error_text=?, was_preempted=?,
+                                     first_audio_ms=? WHERE id=?""",
+            (_utc_iso(), int(was_successful), error_text, int(was_preempted),
+             round(first_audio_ms) if first_audio_ms is not None else None, audio_event_id),
+        )
 
-    def log_error(self, session_id: int, component: str, severity: str, short: str, details: str | None = None):
-        con = self._connect()
-        try:
-            con.execute(
-                """INSERT INTO app_error(session_id, happened_at_utc, component_name, severity, short_message, long_details)
-                   VALUES(?,?,?,?,?,?)""",
-                (session_id, _utc_iso(), component, severity, short, details),
-            )
-            con.commit()
-        finally:
-            con.close()
+    def insert_latency_summary(self, session_id: int, window_s: float, stages: dict):
+        """One latency_summary row per stage; `stages` is metrics.registry.take_window()."""
+        now = _utc_iso()
+        rows = [
+            (session_id, now, float(window_s), name, s["count"],
+             s["mean_ms"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"])
+            for name, s in stages.items() if s["count"]
+        ]
+        self._write_many(
+            """INSERT INTO latency_summary(session_id, created_at_utc, window_s, stage, sample_count,
+                                          mean_ms, p50_ms, p95_ms, p99_ms, max_ms)
+               VALUES(?,?,?,?,?,?,?,?,?,?)""",
+            rows,
+        )
 
+    def log_error(self, session_id: int, component: str, severity: str, short: str, details: str | None = None):
+        self._write(
+            """INSERT INTO app_error(session_id, happened_at_utc, component_name, severity, short_message, long_details)
+               VALUES(?,?,?,?,?,?)""",
+            (session_id, _utc_iso(), component, severity, short, details),
+        )
@@ -1,8 +1,356 @@
 # vision.py
-from ultralytics import YOLO
+import ast
+import os
+import threading
+import time
+from contextlib import closing
 
-# Load YOLOv8 model once at startup to avoid reloading on every frame
-model = YOLO("/opt/ai_assistant/models/yolov8n.pt")
+import numpy as np
+
+from config import (
+    MODEL_PATH, MODEL_PATH_EXPLICIT, INFER_BACKEND, INFER_IMGSZ, INFER_THREADS, IOU_THRES, CONF_THRES, CONF_DECIMALS,
+    DEFAULT_MODEL_ID, DB_ENABLED, DB_PATH, FRAME_WIDTH, FRAME_HEIGHT,
+    ADAPTIVE_INFER, ADAPTIVE_BUDGET_MS, ADAPTIVE_IMGSZ, ADAPTIVE_FULL_EVERY,
+    ADAPTIVE_ROI_MARGIN, ADAPTIVE_ROI_MAX_AREA
+)
+from metrics import span
+
+# Same minimum confidence Ultralytics uses by default, so every engine reports
+# the same candidate boxes (CONF_THRES filtering happens on top of this)
+MIN_CONF = 0.25
+
+
+# ==================================================
+# Shared pre/post-processing for raw-tensor engines
+# ==================================================
+
+def letterbox(frame, size: int):
+    """
+    Resize keeping aspect ratio and pad to size x size (Ultralytics style).
+    Returns (NCHW float32 blob, scale, (pad_x, pad_y)).
+    """
+    import cv2
+
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    nw, nh = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+
+    # Camera frames are BGR-ordered (Picamera2 "RGB888"); the models expect RGB
+    blob = canvas[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+    return np.ascontiguousarray(blob), scale, (pad_x, pad_y)
+
+
+def _nms(boxes_xyxy, scores, iou_thres: float):
+    """Plain NumPy non-maximum suppression; returns kept indices (best first)."""
+    x1, y1, x2, y2 = boxes_xyxy.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+
+def decode_yolov8(output, scale: float, pad, conf_thres: float = MIN_CONF, iou_thres: float = IOU_THRES):
+    """
+    Decode a raw YOLOv8 head output of shape (1, 4 + num_classes, N).
+    Returns (xywh center boxes in frame pixels, conf, cls) as NumPy arrays.
+    """
+    pred = output[0].T                       # (N, 4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(cls)), cls]
+
+    keep = conf >= conf_thres
+    xywh, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+    if not len(conf):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+    # Undo letterbox padding and scaling
+    xywh = xywh.copy()
+    xywh[:, 0] = (xywh[:, 0] - pad[0]) / scale
+    xywh[:, 1] = (xywh[:, 1] - pad[1]) / scale
+    xywh[:, 2:] /= scale
+
+    # Class-aware NMS: offset boxes per class so different classes never overlap
+    xyxy = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, :2] + xywh[:, 2:] / 2], axis=1)
+    offsets = cls[:, None].astype(np.float32) * 4096.0
+    keep = _nms(xyxy + offsets, conf, iou_thres)
+    return xywh[keep], conf[keep], cls[keep]
+
+
+def _parse_names(raw) -> dict:
+    """Ultralytics stores class names as a dict literal in model metadata."""
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    return {int(k): str(v) for k, v in names.items()}
+
+
+# ==================================================
+# Engines
+# ==================================================
+
+class UltralyticsBackend:
+    """
+    PyTorch .pt weights, plus any export Ultralytics can load itself
+    (NCNN / OpenVINO model directories, TFLite).
+    """
+
+    name = "ultralytics"
+    dynamic = True   # any multiple of 32 per call
+
+    def __init__(self, path: str, imgsz: int = INFER_IMGSZ):
+        from ultralytics import YOLO
+
+        if INFER_THREADS:
+            import torch
+            torch.set_num_threads(INFER_THREADS)
+
+        self.model = YOLO(path, task="detect")
+        self.names = self.model.names
+        self.imgsz = imgsz
+
+    def infer(self, frame, imgsz: int | None = None):
+        r = self.model(frame, imgsz=imgsz or self.imgsz, conf=MIN_CONF, iou=IOU_THRES, verbose=False)[0]
+        boxes = r.boxes
+        return boxes.xywh.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(np.int64)
+
+
+class OnnxRuntimeBackend:
+    """Exported YOLOv8 .onnx model executed by onnxruntime on the CPU."""
+
+    name = "onnxruntime"
+
+    def __init__(self, path: str, imgsz: int = INFER_IMGSZ):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if INFER_THREADS:
+            opts.intra_op_num_threads = INFER_THREADS
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+
+        # Static exports fix the input size; dynamic ones accept the configured size
+        self.dynamic = not isinstance(inp.shape[2], int)
+        self.imgsz = imgsz if self.dynamic else inp.shape[2]
+        self.names = _parse_names(self.session.get_modelmeta().custom_metadata_map["names"])
+
+    def infer(self, frame, imgsz: int | None = None):
+        blob, scale, pad = letterbox(frame, (imgsz if self.dynamic else None) or self.imgsz)
+        output = self.session.run(None, {self.input_name: blob})[0]
+        return decode_yolov8(output, scale, pad)
+
+
+class OpenVinoBackend:
+    """Ultralytics OpenVINO export (directory with model .xml/.bin + metadata.yaml)."""
+
+    name = "openvino"
+    dynamic = False  # compiled for the exported size
+
+    def __init__(self, path: str, imgsz: int = INFER_IMGSZ):
+        import openvino as ov
+        import yaml
+
+        model_dir = path if os.path.isdir(path) else os.path.dirname(path)
+        xml = path if path.endswith(".xml") else next(
+            os.path.join(model_dir, f) for f in sorted(os.listdir(model_dir)) if f.endswith(".xml")
+        )
+
+        config = {"INFERENCE_NUM_THREADS": INFER_THREADS} if INFER_THREADS else {}
+        self.compiled = ov.Core().compile_model(xml, "CPU", config)
+        with open(os.path.join(model_dir, "metadata.yaml")) as f:
+            meta = yaml.safe_load(f)
+        self.names = _parse_names(meta["names"])
+        self.imgsz = int(meta.get("imgsz", [imgsz])[0])
+
+    def infer(self, frame, imgsz: int | None = None):
+        blob, scale, pad = letterbox(frame, self.imgsz)
+        output = self.compiled(blob)[0]
+        return decode_yolov8(output, scale, pad)
+
+
+BACKENDS = {
+    "ultralytics": UltralyticsBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+    "openvino": OpenVinoBackend,
+}
+
+# model.model_format values (and common aliases) -> engine
+_FORMAT_ALIASES = {
+    "pt": "ultralytics", "pytorch": "ultralytics", "torch": "ultralytics",
+    "ncnn": "ultralytics", "tflite": "ultralytics",
+    "onnx": "onnxruntime",
+}
+
+
+def _engine_for_path(path: str) -> str:
+    if path.endswith(".onnx"):
+        return "onnxruntime"
+    if path.endswith(".xml") or path.rstrip("/").endswith("_openvino_model"):
+        return "openvino"
+    return "ultralytics"
+
+
+def _model_row(model_id: int):
+    """(model_format, file_path) of a `model` row through a short read-only connection, or None."""
+    from db_access import connect, SQL_SELECT_MODEL
+    try:
+        with closing(connect(DB_PATH, readonly=True, timeout=1.0)) as con:
+            return con.execute(SQL_SELECT_MODEL, (model_id,)).fetchone()
+    except Exception:
+        return None
+
+
+def resolve_engine(backend: str = INFER_BACKEND, path: str | None = None):
+    """
+    Decide which engine and model file to use.
+
+    Explicit settings win: INFER_BACKEND other than "auto" for the engine and
+    `path` / VA_MODEL_PATH for the file. Whatever is left comes from the
+    `model` table row referenced by DEFAULT_MODEL_ID (model_format /
+    file_path), then from MODEL_PATH and its extension.
+    """
+    backend = (backend or "auto").lower()
+    if path is None and MODEL_PATH_EXPLICIT:
+        path = MODEL_PATH
+
+    if path is None and DB_ENABLED and DEFAULT_MODEL_ID is not None:
+        row = _model_row(DEFAULT_MODEL_ID)
+        if row is not None:
+            model_format, path = row
+            if backend == "auto":
+                backend = model_format.lower()
+    if path is None:
+        path = MODEL_PATH
+
+    backend = _FORMAT_ALIASES.get(backend, backend)
+    if backend == "auto":
+        backend = _engine_for_path(path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    return backend, path
+
+
+def load_backend(backend: str = INFER_BACKEND, path: str | None = None):
+    engine, path = resolve_engine(backend, path)
+    return BACKENDS[engine](path)
+
+
+# The model is loaded once, on first use (or explicitly by main's startup
+# phase), so importing this module stays cheap
+_model = None
+_model_lock = threading.Lock()
+_LABELS = None   # class id -> label lookup table, so label mapping is a single fancy-index
+
+
+def get_model():
+    """Load the inference backend on first call (thread-safe) and return it."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                loaded = load_backend()
+                set_labels(loaded.names)
+                _model = loaded
+    return _model
+
+
+def set_labels(names: dict):
+    """Install the class id -> label table (also used when the model lives in inference_pool workers)."""
+    global _LABELS
+    _LABELS = np.array([names[i] for i in range(max(names) + 1)], dtype=object)
+
+
+def warm_up(runs: int = 1):
+    """
+    Run dummy inferences on a blank frame so lazy allocations, kernel
+    selection and thread pools are paid before the first real frame.
+    """
+    engine = get_model()
+    blank = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    for _ in range(runs):
+        engine.infer(blank)
+    return engine
+
+
+def __getattr__(name):
+    # `vision.model` keeps working for existing callers, loading on first access
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ==================================================
+# Compact detection records
+# ==================================================
+
+# One row per box; feeds the DB and the speech logic without per-box objects
+DETECTION_DTYPE = np.dtype([
+    ("cls", np.int16),
+    ("conf", np.float32),
+    ("box_x", np.int32),   # top-left x
+    ("box_y", np.int32),   # top-left y
+    ("box_w", np.int32),
+    ("box_h", np.int32),
+    ("track_id", np.int32),  # filled by tracker.IoUTracker, -1 = untracked
+])
+
+
+def to_records(xywh, conf, cls, conf_thres: float = CONF_THRES):
+    """
+    Bulk post-processing of engine output: confidence filtering and conversion
+    from center xywh to top-left integer boxes, all on whole arrays.
+    """
+    keep = conf >= conf_thres
+    xywh = xywh[keep]
+
+    dets = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+    dets["cls"] = cls[keep]
+    dets["conf"] = conf[keep]
+    # astype truncates toward zero, same as int() did per box
+    dets["box_x"] = (xywh[:, 0] - xywh[:, 2] / 2).astype(np.int32)
+    dets["box_y"] = (xywh[:, 1] - xywh[:, 3] / 2).astype(np.int32)
+    dets["box_w"] = xywh[:, 2].astype(np.int32)
+    dets["box_h"] = xywh[:, 3].astype(np.int32)
+    dets["track_id"] = -1
+    return dets
+
+
+def labels_of(dets) -> list:
+    """Labels for a detection record array, in row order."""
+    if _LABELS is None:
+        get_model()
+    return _LABELS[dets["cls"]].tolist()
+
+
+def detect_array(frame, conf_thres: float = CONF_THRES):
+    """
+    Run object detection and return a DETECTION_DTYPE structured array,
+    already filtered by `conf_thres` (CONF_THRES by default).
+    With ADAPTIVE_INFER the frame goes through the AdaptiveDetector.
+    """
+    if ADAPTIVE_INFER:
+        return adaptive_detector().detect(frame, conf_thres)
+    with span("infer"):
+        engine = get_model()
+        if _max_imgsz and getattr(engine, "dynamic", False):
+            raw = engine.infer(frame, imgsz=min(_max_imgsz, engine.imgsz))
+        else:
+            raw = engine.infer(frame)
+    with span("postprocess"):
+        return to_records(*raw, conf_thres=conf_thres)
 
 
 def detect(frame, return_raw: bool = False):
@@ -19,45 +367,192 @@ def detect(frame, return_raw: bool = False):
               {"label": "person", "conf": 0.91, "box_x": 12, "box_y": 34, "box_w": 120, "box_h": 220},
               ...
             ]
+
+    New code should prefer detect_array(), which avoids per-box Python objects.
     """
-    results = model(frame, verbose=False)
+    # No CONF_THRES filtering here (historical behavior)
+    dets = detect_array(frame, conf_thres=MIN_CONF)
 
     # Backwards compatible mode (your current code expects this)
     if not return_raw:
-        detections = []
-        for r in results:
-            for box in r.boxes:
-                label = model.names[int(box.cls)]
-                detections.append(label)
-        return detections
+        return labels_of(dets)
 
     # Raw mode (for DB): include confidence and bounding box
-    raw = []
-    for r in results:
-        for box in r.boxes:
-            label = model.names[int(box.cls)]
-
-            # confidence is 0..1 and matches DB constraint (confidence_0_1 BETWEEN 0.0 AND 1.0)
-            conf = float(box.conf[0]) if box.conf is not None else 0.0
-
-            # Bounding box in xywh (center x/y, width, height)
-            xywh = box.xywh[0].tolist()  # [x_center, y_center, w, h]
-            x_c, y_c, w, h = [float(v) for v in xywh]
-
-            # Convert to top-left x,y plus width/height (integers)
-            x = int(x_c - (w / 2))
-            y = int(y_c - (h / 2))
-
-            raw.append(
-                {
-                    "label": label,
-                    "conf": conf,
-                    "box_x": x,
-                    "box_y": y,
-                    "box_w": int(w),
-                    "box_h": int(h),
-                }
-            )
-
-    return raw
+    return [
+        {"label": label, "conf": round(conf, CONF_DECIMALS), "box_x": x, "box_y": y, "box_w": w, "box_h": h}
+        for label, conf, x, y, w, h in zip(
+            labels_of(dets), dets["conf"].tolist(),
+            dets["box_x"].tolist(), dets["box_y"].tolist(),
+            dets["box_w"].tolist(), dets["box_h"].tolist(),
+        )
+    ]
+
+
+# ==================================================
+# Adaptive resolution and region-of-interest inference
+# ==================================================
+
+def _merge_rects(rects: list) -> list:
+    """Merge overlapping [x0, y0, x1, y1] rectangles until none overlap."""
+    rects = [list(r) for r in rects]
+    i = 0
+    while i < len(rects):
+        a = rects[i]
+        for j in range(i + 1, len(rects)):
+            b = rects[j]
+            if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                del rects[j]
+                i = -1  # the grown rectangle may now overlap earlier ones
+                break
+        i += 1
+    return rects
+
+
+class AdaptiveDetector:
+    """
+    Per-frame choice of input size and region:
+
+    - size: the largest of `sizes` whose predicted inference time fits
+      `budget_ms`, from a running estimate of ms per input pixel (engines
+      with a fixed input size always use it);
+    - region: a full-frame pass every `full_every` inferences, or when there
+      is nothing to follow; in between only crops around the previous
+      detections (grown by `margin`, overlapping crops merged) are inferred
+      and their boxes shifted back to full-frame coordinates.
+
+    New objects away from the current ones are therefore picked up at the
+    next full-frame pass.
+    """
+
+    def __init__(self, engine=None, budget_ms: float = ADAPTIVE_BUDGET_MS, sizes=ADAPTIVE_IMGSZ,
+                 full_every: int = ADAPTIVE_FULL_EVERY, margin: float = ADAPTIVE_ROI_MARGIN,
+                 max_area: float = ADAPTIVE_ROI_MAX_AREA):
+        self._engine = engine
+        self.budget_ms = budget_ms
+        self.sizes = tuple(sorted(sizes))
+        self.max_imgsz = None            # upper bound set from outside (e.g. a thermal controller)
+        self.full_every = max(1, int(full_every))
+        self.margin = margin
+        self.max_area = max_area
+
+        self.ms_per_mpx = None           # EWMA of inference ms per million input pixels
+        self.imgsz = None                # size picked for the last frame
+        self._since_full = 0
+        self._last = None                # previous detections, full-frame coordinates
+
+        self.full_passes = 0
+        self.roi_passes = 0
+        self.crops = 0
+
+    def _candidates(self, engine) -> list:
+        if not getattr(engine, "dynamic", False):
+            return [engine.imgsz]
+        top = min(engine.imgsz, self.max_imgsz or engine.imgsz)
+        return [s for s in self.sizes if s <= top] or [top]
+
+    def _pick_size(self, candidates: list) -> int:
+        if self.ms_per_mpx is None:
+            return candidates[-1]
+        fits = [s for s in candidates if self.ms_per_mpx * s * s / 1e6 <= self.budget_ms]
+        return fits[-1] if fits else candidates[0]
+
+    def _rois(self, shape):
+        """Crops around the previous detections, or None for a full-frame pass."""
+        if self._last is None or not len(self._last) or self._since_full + 1 >= self.full_every:
+            return None
+        h, w = shape[:2]
+        x, y = self._last["box_x"].astype(np.int64), self._last["box_y"].astype(np.int64)
+        bw, bh = self._last["box_w"].astype(np.int64), self._last["box_h"].astype(np.int64)
+        mx, my = (bw * self.margin).astype(np.int64) + 16, (bh * self.margin).astype(np.int64) + 16
+        rects = np.stack([
+            np.clip(x - mx, 0, w), np.clip(y - my, 0, h),
+            np.clip(x + bw + mx, 0, w), np.clip(y + bh + my, 0, h),
+        ], axis=1).tolist()
+        rects = [r for r in _merge_rects(rects) if r[2] > r[0] and r[3] > r[1]]
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        if not rects or area > self.max_area * w * h:
+            return None
+        return rects
+
+    @staticmethod
+    def _infer(engine, frame, size: int):
+        if getattr(engine, "dynamic", False):
+            return engine.infer(frame, imgsz=size)
+        return engine.infer(frame)
+
+    def detect(self, frame, conf_thres: float = CONF_THRES):
+        """Same contract as detect_array: DETECTION_DTYPE rows in full-frame coordinates."""
+        engine = self._engine or get_model()
+        candidates = self._candidates(engine)
+        size = self._pick_size(candidates)
+        rois = self._rois(frame.shape)
+
+        t0 = time.perf_counter()
+        if rois is None:
+            with span("infer"):
+                raw = self._infer(engine, frame, size)
+            pixels = size * size
+            self._since_full = 0
+            self.full_passes += 1
+        else:
+            xywh, conf, cls, pixels = [], [], [], 0
+            for x0, y0, x1, y1 in rois:
+                # Small crops are not blown up to the full size: round up to a multiple of 32
+                crop_size = size
+                if len(candidates) > 1:
+                    crop_size = min(size, max(candidates[0], -(-max(x1 - x0, y1 - y0) // 32) * 32))
+                with span("infer"):
+                    b, c, k = self._infer(engine, np.ascontiguousarray(frame[y0:y1, x0:x1]), crop_size)
+                b = np.array(b, dtype=np.float32, copy=True).reshape(-1, 4)
+                b[:, 0] += x0
+                b[:, 1] += y0
+                xywh.append(b)
+                conf.append(c)
+                cls.append(k)
+                pixels += crop_size * crop_size
+            raw = (np.concatenate(xywh), np.concatenate(conf), np.concatenate(cls))
+            self._since_full += 1
+            self.roi_passes += 1
+            self.crops += len(rois)
+        self._observe((time.perf_counter() - t0) * 1000.0, pixels)
+
+        with span("postprocess"):
+            dets = to_records(*raw, conf_thres=conf_thres)
+        self._last = dets
+        self.imgsz = size
+        return dets
+
+    def _observe(self, ms: float, pixels: int):
+        sample = ms / (pixels / 1e6)
+        self.ms_per_mpx = sample if self.ms_per_mpx is None else 0.7 * self.ms_per_mpx + 0.3 * sample
+
+    def stats(self) -> dict:
+        return {
+            "imgsz": self.imgsz,
+            "ms_per_mpx": round(self.ms_per_mpx, 2) if self.ms_per_mpx is not None else None,
+            "full_passes": self.full_passes,
+            "roi_passes": self.roi_passes,
+            "crops": self.crops,
+        }
+
+
+_adaptive = None
+_max_imgsz = None
+
+
+def adaptive_detector() -> AdaptiveDetector:
+    """The AdaptiveDetector used by detect_array when ADAPTIVE_INFER is on."""
+    global _adaptive
+    if _adaptive is None:
+        _adaptive = AdaptiveDetector()
+        _adaptive.max_imgsz = _max_imgsz
+    return _adaptive
+
 
+def set_max_imgsz(size: int | None):
+    """Cap the input size of detect_array at runtime (None = the model's size)."""
+    global _max_imgsz
+    _max_imgsz = size
+    if _adaptive is not None:
+        _adaptive.max_imgsz = size